@@ -0,0 +1,84 @@
+import time
+import numpy as np
+
+# ==========================================
+# RYTHME DE L'AFFICHAGE
+# ==========================================
+# La boucle principale tourne au rythme de la caméra, mais l'écran n'a pas
+# besoin d'être redessiné à chaque image :
+# - si une donnée affichée a changé (boîtes, comptage, température...)
+#   -> on redessine, au plus VIDEO_FPS fois par seconde
+# - sinon on se contente de fps_repos (la vidéo reste vivante)
+# Les images non affichées ne coûtent ni conversion couleur, ni dessin, ni imshow.
+
+class RythmeAffichage:
+
+    def __init__(self, fps=30, fps_repos=5):
+        self.intervalle = 1.0 / fps
+        self.intervalle_repos = 1.0 / fps_repos
+        self.dernier = 0.0
+        self.signature = None
+        self.nb_affichees = 0
+        self.nb_sautees = 0
+
+    def doit_afficher(self, signature, maintenant=None):
+        """signature : tuple des valeurs affichées (comparé à celui du dernier dessin)."""
+        if maintenant is None:
+            maintenant = time.monotonic()
+        ecart = maintenant - self.dernier
+        change = signature != self.signature
+        if ecart >= self.intervalle_repos or (change and ecart >= self.intervalle):
+            self.dernier = maintenant
+            self.signature = signature
+            self.nb_affichees += 1
+            return True
+        self.nb_sautees += 1
+        return False
+
+
+# ==========================================
+# CALQUES EN CACHE (DASHBOARD)
+# ==========================================
+# Le panneau du dashboard ne change que quand une de ses valeurs change
+# (température toutes les 2 s, seuils quand la tranche d'occupation change...).
+# On le dessine donc UNE fois dans une petite image + un masque, et à chaque
+# image on se contente d'une seule copie vectorisée NumPy.
+
+class CalqueCache:
+
+    def __init__(self, taille, position=(0, 0), opaque=True):
+        """
+        taille : (hauteur, largeur) du calque
+        position : coin haut-gauche (x, y) sur l'image
+        opaque : True si tout le calque recouvre l'image (fond plein) -> copie directe
+        """
+        h, w = taille
+        self.x, self.y = position
+        self.image = np.zeros((h, w, 3), dtype=np.uint8)
+        self.masque = np.zeros((h, w, 1), dtype=bool)
+        self.opaque = opaque
+        self.cle = None
+        self.nb_rendus = 0
+
+    def mettre_a_jour(self, cle, dessiner, *args):
+        """Appelle dessiner(image, *args) seulement si `cle` a changé."""
+        if cle == self.cle:
+            return False
+        self.cle = cle
+        self.image.fill(0)
+        dessiner(self.image, *args)
+        if not self.opaque:
+            # Masque = pixels réellement dessinés
+            np.any(self.image, axis=2, keepdims=True, out=self.masque)
+        self.nb_rendus += 1
+        return True
+
+    def composer(self, frame):
+        h, w = self.image.shape[:2]
+        zone = frame[self.y:self.y + h, self.x:self.x + w]
+        if self.opaque:
+            zone[...] = self.image[:zone.shape[0], :zone.shape[1]]
+        else:
+            np.copyto(zone, self.image[:zone.shape[0], :zone.shape[1]],
+                      where=self.masque[:zone.shape[0], :zone.shape[1]])
+
@@ -0,0 +1,676 @@
+import time
+import json
+import math
+import random
+import socket
+import struct
+import asyncio
+import argparse
+import warnings
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+from canal import CHAMPS, ID_CHAMP, CHAMP, encoder, _ABSENT
+from historique import ACTIONS
+
+# ==========================================
+# AGREGATEUR D'OCCUPATION DU BATIMENT
+# ==========================================
+# Chaque Pi (un "noeud" : une ou plusieurs pièces) POUSSE l'état de ses pièces vers un
+# agrégateur central, qui est le seul à connaître tout le bâtiment :
+#   noeud = NoeudBatiment(("192.168.1.10", PORT_NOEUDS), {12: "Salle 12"})
+#   noeud.demarrer()
+#   noeud.publier(12, personnes=4, temperature=21.5)    # dict mis à jour, jamais d'E/S
+#
+# Protocole (mêmes champs que canal.py), en UDP (défaut) ou en TCP :
+#   trame = <H longueur> <H pièce> <I seq> <d instant> <B drapeaux> <B nb de champs>
+#           puis nb x (<B id champ> <f valeur>) [+ <B longueur> nom, si trame complète]
+# - seuls les champs modifiés partent (delta), et toutes les trames d'un noeud sont
+#   regroupées dans un datagramme (ou un sendall) au plus toutes les intervalle_min s
+# - toutes les periode_complete s, une trame COMPLETE (tous les champs + nom) : elle sert
+#   de signe de vie, et en UDP une trame perdue ne laisse un état faux que jusque-là
+# - seq par pièce : l'agrégateur compte les trames perdues et marque la pièce
+#   "incomplète" jusqu'à la prochaine trame complète
+#
+# L'agrégateur (python batiment.py agregateur) garde TOUT en mémoire :
+# - état courant : un tableau NumPy (pièces x champs) -> les totaux du bâtiment sont
+#   quelques réductions NumPy, quel que soit le nombre de noeuds
+# - historique court : une photo de toutes les pièces par pas_historique (anneau)
+# et sert :
+# - du JSON en HTTP : /batiment, /pieces, /piece/12, /historique?champ=personnes&duree=600[&piece=12]
+# - le flux binaire de canal.py sur port_abonnes : l'écran InterfaceMonitoring s'y abonne
+#   (Abonne(("hote", PORT_ABONNES), requete="batiment") ou requete="piece 12")
+#
+# Test de charge sur une seule machine :
+#   python batiment.py agregateur
+#   python batiment.py noeuds --nb 300 --processus 4 --frequence 5
+
+PORT_NOEUDS = 9870      # UDP et TCP
+PORT_ABONNES = 9871     # Flux canal.py (écrans)
+PORT_HTTP = 9872        # Requêtes JSON
+TAILLE_DATAGRAMME = 1400  # Sous la MTU Ethernet : pas de fragmentation IP
+
+TRAME = struct.Struct("<HHIdBB")
+COMPLETE = 1
+I_PERSONNES = ID_CHAMP["personnes"]
+I_FONCTIONNE = ID_CHAMP["fonctionne"]
+I_ACTION = ID_CHAMP["action"]
+
+
+def encoder_trame(piece, seq, t, valeurs, nom=None):
+    """dict {champ: valeur} -> trame ; nom donné = trame complète."""
+    corps = b"".join(CHAMP.pack(ID_CHAMP[k], math.nan if v is None else v) for k, v in valeurs.items())
+    drapeaux = 0
+    if nom is not None:
+        octets = nom.encode()[:255]
+        corps += bytes([len(octets)]) + octets
+        drapeaux = COMPLETE
+    return TRAME.pack(TRAME.size - 2 + len(corps), piece, seq, t, drapeaux, len(valeurs)) + corps
+
+def decoder_trames(tampon):
+    """
+    Extrait les trames complètes : ([(pièce, seq, t, complète, ids, valeurs, nom)], octets restants).
+    ids / valeurs : listes parallèles (id de champ, valeur float, NaN = inconnue).
+    Une trame incohérente arrête le décodage (datagramme corrompu : le reste est jeté).
+    """
+    trames = []
+    debut = 0
+    while len(tampon) - debut >= TRAME.size:
+        longueur, piece, seq, t, drapeaux, nb = TRAME.unpack_from(tampon, debut)
+        fin = debut + 2 + longueur
+        if longueur < TRAME.size - 2 + nb * CHAMP.size:
+            return trames, b""
+        if len(tampon) < fin:
+            break
+        ids, valeurs = [], []
+        for i in range(nb):
+            id_champ, v = CHAMP.unpack_from(tampon, debut + TRAME.size + i * CHAMP.size)
+            if id_champ < len(CHAMPS):
+                ids.append(id_champ)
+                valeurs.append(v)
+        nom = None
+        if drapeaux & COMPLETE:
+            position = debut + TRAME.size + nb * CHAMP.size
+            taille = tampon[position] if position < fin else 0
+            nom = bytes(tampon[position + 1:position + 1 + taille]).decode(errors="replace")
+        trames.append((piece, seq, t, bool(drapeaux & COMPLETE), ids, valeurs, nom))
+        debut = fin
+    return trames, tampon[debut:]
+
+
+# ==========================================
+# NOEUD (SUR CHAQUE PI)
+# ==========================================
+class NoeudBatiment:
+
+    def __init__(self, adresse, pieces, protocole="udp", intervalle_min=0.2, periode_complete=5.0):
+        """
+        adresse : (hôte, port) de l'agrégateur
+        pieces : {numéro: nom} des pièces de ce noeud (numéros uniques dans le bâtiment)
+        protocole : "udp" (rien à maintenir, pertes rattrapées par les trames complètes) ou "tcp"
+        """
+        if protocole not in ("udp", "tcp"):
+            raise ValueError(f"Protocole inconnu : {protocole}")
+        self.adresse = adresse
+        self.pieces = dict(pieces)
+        self.protocole = protocole
+        self.intervalle_min = intervalle_min
+        self.periode_complete = periode_complete
+        self.etat = {p: {} for p in self.pieces}
+        self.envoye = {p: {} for p in self.pieces}
+        self.seq = {p: 0 for p in self.pieces}
+        self.lock = threading.Lock()
+        self.reveil = threading.Event()
+        self.arret = threading.Event()
+        self.sock = None
+        self.thread = None
+        self.prochaine_complete = 0.0
+        self.nb_envois = 0
+        self.nb_trames = 0
+        self.nb_octets = 0
+        self.nb_echecs = 0
+
+    def demarrer(self):
+        self.thread = threading.Thread(target=self._boucle, daemon=True)
+        self.thread.start()
+
+    def publier(self, piece, **valeurs):
+        """Appelé depuis la boucle principale : mise à jour d'un dict, jamais d'E/S."""
+        with self.lock:
+            etat = self.etat[piece]
+            change = any(etat.get(k, _ABSENT) != v for k, v in valeurs.items())
+            etat.update(valeurs)
+        if change:
+            self.reveil.set()
+
+    def _trames(self, complete):
+        t = time.time()
+        trames = []
+        with self.lock:
+            for piece, etat in self.etat.items():
+                envoye = self.envoye[piece]
+                diff = dict(etat) if complete else {k: v for k, v in etat.items()
+                                                    if envoye.get(k, _ABSENT) != v}
+                if not diff and not complete:
+                    continue
+                envoye.update(diff)
+                self.seq[piece] += 1
+                trames.append(encoder_trame(piece, self.seq[piece], t, diff,
+                                            self.pieces[piece] if complete else None))
+        return trames
+
+    def _boucle(self):
+        while not self.arret.is_set():
+            self.reveil.wait(max(0.0, self.prochaine_complete - time.monotonic()))
+            self.reveil.clear()
+            maintenant = time.monotonic()
+            complete = maintenant >= self.prochaine_complete
+            if complete:
+                self.prochaine_complete = maintenant + self.periode_complete
+            trames = self._trames(complete)
+            if trames:
+                self._emettre(trames)
+            # Rafale : les changements suivants partiront ensemble au prochain tour
+            self.arret.wait(self.intervalle_min)
+        if self.sock is not None:
+            self.sock.close()
+
+    def _emettre(self, trames):
+        try:
+            if self.protocole == "udp":
+                if self.sock is None:
+                    self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                paquet = b""
+                for trame in trames:
+                    if paquet and len(paquet) + len(trame) > TAILLE_DATAGRAMME:
+                        self.sock.sendto(paquet, self.adresse)
+                        self.nb_envois += 1
+                        paquet = b""
+                    paquet += trame
+                self.sock.sendto(paquet, self.adresse)
+            else:
+                if self.sock is None:
+                    self.sock = socket.create_connection(self.adresse, timeout=1.0)
+                    self.sock.settimeout(0.5)
+                self.sock.sendall(b"".join(trames))
+        except OSError:
+            self.nb_echecs += 1
+            if self.protocole == "tcp" and self.sock is not None:
+                self.sock.close()
+                self.sock = None
+            # Ce qui n'est pas parti repartira avec la prochaine trame complète (reconnexion)
+            self.prochaine_complete = 0.0
+            return
+        self.nb_envois += 1
+        self.nb_trames += len(trames)
+        self.nb_octets += sum(len(t) for t in trames)
+
+    def arreter(self):
+        self.arret.set()
+        self.reveil.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+
+# ==========================================
+# INDEX EN MEMOIRE (AGREGATEUR)
+# ==========================================
+class IndexPieces:
+
+    def __init__(self, nb_max=1024, duree_historique=600.0, pas_historique=1.0, delai_perte=12.0):
+        """
+        nb_max : nb de pièces suivies au plus (lignes des tableaux)
+        duree_historique / pas_historique : profondeur et résolution de l'historique court
+        delai_perte : sans trame depuis ce délai, la pièce est hors ligne (> periode_complete)
+        """
+        self.nb_max = nb_max
+        self.delai_perte = delai_perte
+        self.pas_historique = pas_historique
+        self.etat = np.full((nb_max, len(CHAMPS)), np.nan, dtype=np.float32)
+        self.t_maj = np.full(nb_max, -np.inf)         # time.monotonic() de la dernière trame
+        self.seq = np.zeros(nb_max, dtype=np.int64)
+        self.complet = np.zeros(nb_max, dtype=bool)   # Aucune trame perdue depuis la dernière complète
+        self.numeros = np.zeros(nb_max, dtype=np.int32)
+        self.ligne = {}                               # Numéro de pièce -> ligne des tableaux
+        self.noms = {}
+        self.nb = 0
+        nb_photos = max(1, int(duree_historique / pas_historique))
+        self.photos = np.full((nb_photos, nb_max, len(CHAMPS)), np.nan, dtype=np.float32)
+        self.t_photos = np.full(nb_photos, np.nan)
+        self.tete = 0
+        self.nb_trames = 0
+        self.nb_pertes = 0
+        self.nb_rejets = 0                            # Doublons, trames en retard, index plein
+        self.lock = threading.Lock()
+
+    def appliquer(self, trames, maintenant=None):
+        maintenant = time.monotonic() if maintenant is None else maintenant
+        with self.lock:
+            for piece, seq, _, complete, ids, valeurs, nom in trames:
+                i = self.ligne.get(piece)
+                if i is None:
+                    if self.nb >= self.nb_max:
+                        self.nb_rejets += 1
+                        continue
+                    i = self.ligne[piece] = self.nb
+                    self.numeros[i] = piece
+                    self.nb += 1
+                precedent = self.seq[i]
+                if seq <= precedent and not complete:
+                    # UDP : doublon ou trame arrivée après une plus récente
+                    self.nb_rejets += 1
+                    continue
+                if precedent and seq > precedent + 1:
+                    self.nb_pertes += seq - precedent - 1
+                    self.complet[i] = False
+                # seq < precedent sur une trame complète : le noeud a redémarré
+                self.seq[i] = seq
+                self.t_maj[i] = maintenant
+                if complete:
+                    self.etat[i] = np.nan
+                    self.complet[i] = True
+                    self.noms[piece] = nom
+                self.etat[i, ids] = valeurs
+                self.nb_trames += 1
+
+    def en_ligne(self, maintenant=None):
+        maintenant = time.monotonic() if maintenant is None else maintenant
+        return maintenant - self.t_maj[:self.nb] < self.delai_perte
+
+    def photographier(self, t=None):
+        """Une photo de toutes les pièces (hors ligne = NaN) dans l'anneau d'historique."""
+        with self.lock:
+            photo = self.photos[self.tete]
+            photo[:self.nb] = self.etat[:self.nb]
+            photo[:self.nb][~self.en_ligne()] = np.nan
+            self.t_photos[self.tete] = time.time() if t is None else t
+            self.tete = (self.tete + 1) % len(self.photos)
+
+    # --- Requêtes ---
+    def resume(self):
+        """Valeurs du bâtiment, mêmes champs que canal.py (flux des écrans)."""
+        with self.lock:
+            etat = self.etat[:self.nb][self.en_ligne()]
+        if not len(etat):
+            return {"personnes": 0, "fonctionne": 0}
+        valeurs = {"personnes": float(np.nansum(etat[:, I_PERSONNES])),
+                   "consommation": float(np.nansum(etat[:, ID_CHAMP["consommation"]])),
+                   # Un seul CVC en panne suffit à signaler le bâtiment
+                   "fonctionne": float(not (etat[:, I_FONCTIONNE] == 0).any())}
+        for champ in ("temperature", "humidite", "cible"):
+            colonne = etat[:, ID_CHAMP[champ]]
+            connues = colonne[~np.isnan(colonne)]
+            valeurs[champ] = round(float(connues.mean()), 2) if len(connues) else None
+        return valeurs
+
+    def batiment(self):
+        """Vue d'ensemble (JSON /batiment)."""
+        with self.lock:
+            vivant = self.en_ligne()
+            etat = self.etat[:self.nb][vivant]
+            incompletes = int((~self.complet[:self.nb] & vivant).sum())
+            hors_ligne = self.numeros[:self.nb][~vivant].tolist()
+            stats = {"trames": self.nb_trames, "pertes": self.nb_pertes, "rejets": self.nb_rejets}
+        personnes = etat[:, I_PERSONNES]
+        codes = etat[:, I_ACTION]
+        codes = codes[~np.isnan(codes)].astype(np.intp)
+        comptes = np.bincount(codes[(codes >= 0) & (codes < len(ACTIONS))], minlength=len(ACTIONS))
+        resume = self.resume()
+        return dict(resume, **{
+            "pieces": self.nb,
+            "en_ligne": int(vivant.sum()),
+            "hors_ligne": hors_ligne,
+            "incompletes": incompletes,
+            "pieces_occupees": int((personnes > 0).sum()),
+            "actions": {nom: int(n) for nom, n in zip(ACTIONS, comptes) if n},
+        }, **stats)
+
+    def _ligne_json(self, i, maintenant):
+        valeurs = {c: (None if math.isnan(v) else round(float(v), 2)) for c, v in zip(CHAMPS, self.etat[i])}
+        numero = int(self.numeros[i])
+        return dict(valeurs, piece=numero, nom=self.noms.get(numero),
+                    en_ligne=bool(maintenant - self.t_maj[i] < self.delai_perte),
+                    complet=bool(self.complet[i]), age_s=round(float(maintenant - self.t_maj[i]), 2))
+
+    def pieces(self):
+        maintenant = time.monotonic()
+        with self.lock:
+            return [self._ligne_json(i, maintenant) for i in range(self.nb)]
+
+    def piece(self, numero):
+        with self.lock:
+            i = self.ligne.get(numero)
+            return None if i is None else self._ligne_json(i, time.monotonic())
+
+    def valeurs_piece(self, numero):
+        """Champs d'une pièce au format canal.py (None = inconnu), {} si inconnue."""
+        with self.lock:
+            i = self.ligne.get(numero)
+            if i is None:
+                return {}
+            vivant = time.monotonic() - self.t_maj[i] < self.delai_perte
+            valeurs = {c: (None if math.isnan(v) else float(v)) for c, v in zip(CHAMPS, self.etat[i])}
+        if not vivant:
+            valeurs["fonctionne"] = 0
+        return valeurs
+
+    def historique(self, champ, duree, piece=None, agregat="somme"):
+        """
+        (instants, valeurs) des photos des `duree` dernières secondes, plus ancienne en premier.
+        piece=None : bâtiment entier, agrégé par "somme" (personnes, consommation) ou "moyenne".
+        """
+        n = min(len(self.photos), max(1, int(duree / self.pas_historique)))
+        with self.lock:
+            ordre = (np.arange(self.tete - n, self.tete)) % len(self.photos)
+            t = self.t_photos[ordre]
+            if piece is not None:
+                i = self.ligne.get(piece)
+                if i is None:
+                    return [], []
+                v = self.photos[ordre, i, ID_CHAMP[champ]]
+            else:
+                bloc = self.photos[ordre, :self.nb, ID_CHAMP[champ]]
+        if piece is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # Photo sans aucune pièce en ligne
+                v = np.nansum(bloc, axis=1) if agregat == "somme" else np.nanmean(bloc, axis=1)
+            v[np.isnan(bloc).all(axis=1)] = np.nan
+        garde = ~np.isnan(t)
+        return t[garde].tolist(), [None if math.isnan(x) else round(float(x), 2) for x in v[garde]]
+
+
+# ==========================================
+# AGREGATEUR (SERVICE CENTRAL)
+# ==========================================
+class _ProtocoleUDP(asyncio.DatagramProtocol):
+
+    def __init__(self, agregateur):
+        self.agregateur = agregateur
+
+    def datagram_received(self, donnees, adresse):
+        trames, _ = decoder_trames(donnees)
+        self.agregateur.index.appliquer(trames)
+        self.agregateur.nb_octets += len(donnees)
+
+
+class Agregateur:
+
+    def __init__(self, hote="0.0.0.0", port=PORT_NOEUDS, port_abonnes=PORT_ABONNES,
+                 port_http=PORT_HTTP, periode_abonnes=0.5, periode_vie=2.0, **options_index):
+        """
+        port : noeuds (UDP et TCP sur le même numéro)
+        port_abonnes : écrans (flux canal.py) ; port_http : requêtes JSON (None = aucun)
+        options_index : nb_max, duree_historique, pas_historique, delai_perte (IndexPieces)
+        """
+        self.hote = hote
+        self.port = port
+        self.port_abonnes = port_abonnes
+        self.port_http = port_http
+        self.periode_abonnes = periode_abonnes
+        self.periode_vie = periode_vie
+        self.index = IndexPieces(**options_index)
+        self.resume = {}                # Valeurs du bâtiment, recalculées à chaque tic
+        self.nb_abonnes = 0
+        self.nb_octets = 0
+        self.loop = None
+        self.thread = None
+        self.serveur_http = None
+        self.pret = threading.Event()
+        self.fin = None
+        self.clients = {}               # Tâche asyncio -> writer (noeuds TCP et écrans)
+
+    # --- Thread asyncio ---
+    def demarrer(self):
+        self.thread = threading.Thread(target=self._executer, daemon=True)
+        self.thread.start()
+        if not self.pret.wait(5):
+            raise RuntimeError("L'agrégateur n'a pas démarré")
+        if self.port_http is not None:
+            self.serveur_http = ThreadingHTTPServer((self.hote, self.port_http), _gestionnaire(self))
+            self.serveur_http.daemon_threads = True
+            threading.Thread(target=self.serveur_http.serve_forever, daemon=True).start()
+
+    def _executer(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._principal())
+        finally:
+            self.loop.close()
+
+    async def _principal(self):
+        self.fin = asyncio.Event()
+        transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _ProtocoleUDP(self), local_addr=(self.hote, self.port))
+        serveurs = [await asyncio.start_server(self._client_noeud, self.hote, self.port),
+                    await asyncio.start_server(self._client_abonne, self.hote, self.port_abonnes)]
+        self.pret.set()
+        tic = asyncio.ensure_future(self._tic())
+        try:
+            await self.fin.wait()
+        finally:
+            tic.cancel()
+            transport.close()
+            for s in serveurs:
+                s.close()
+            # Fermer les connexions réveille leurs tâches, qui se terminent d'elles-mêmes
+            for writer in self.clients.values():
+                writer.close()
+            if self.clients:
+                await asyncio.wait(list(self.clients), timeout=2.0)
+            for s in serveurs:
+                await s.wait_closed()
+
+    async def _tic(self):
+        prochaine_photo = time.monotonic()
+        while True:
+            self.resume = self.index.resume()
+            if time.monotonic() >= prochaine_photo:
+                prochaine_photo += self.index.pas_historique
+                self.index.photographier()
+            await asyncio.sleep(min(self.periode_abonnes, self.index.pas_historique))
+
+    async def _client_noeud(self, reader, writer):
+        self.clients[asyncio.current_task()] = writer
+        reste = b""
+        try:
+            while True:
+                donnees = await reader.read(65536)
+                if not donnees:
+                    break
+                self.nb_octets += len(donnees)
+                trames, reste = decoder_trames(reste + donnees)
+                self.index.appliquer(trames)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _client_abonne(self, reader, writer):
+        """Une ligne de requête ("batiment" ou "piece 12") puis les changements, format canal.py."""
+        self.clients[asyncio.current_task()] = writer
+        try:
+            ligne = await asyncio.wait_for(reader.readline(), 2.0)
+        except (asyncio.TimeoutError, ConnectionError):
+            ligne = b""
+        mots = ligne.decode(errors="replace").split()
+        numero = int(mots[1]) if len(mots) == 2 and mots[0] == "piece" and mots[1].isdigit() else None
+        envoye = {}
+        derniere = 0.0
+        self.nb_abonnes += 1
+        try:
+            while not self.fin.is_set():
+                valeurs = self.resume if numero is None else self.index.valeurs_piece(numero)
+                diff = {k: v for k, v in valeurs.items() if envoye.get(k, _ABSENT) != v}
+                maintenant = time.monotonic()
+                if diff or maintenant - derniere >= self.periode_vie:
+                    envoye.update(diff)
+                    writer.write(encoder(time.time(), diff))
+                    # Un écran figé ne doit pas retenir l'agrégateur : on l'abandonne
+                    await asyncio.wait_for(writer.drain(), 2.0)
+                    derniere = maintenant
+                await asyncio.sleep(self.periode_abonnes)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            pass
+        finally:
+            self.nb_abonnes -= 1
+            self.clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+    def arreter(self):
+        if self.serveur_http is not None:
+            self.serveur_http.shutdown()
+            self.serveur_http.server_close()
+        if self.loop is not None and self.fin is not None:
+            self.loop.call_soon_threadsafe(self.fin.set)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def ligne(self, debit=None):
+        b = self.index.batiment()
+        texte = (f"[batiment] {b['en_ligne']}/{b['pieces']} pièces en ligne, "
+                 f"{b['personnes']:.0f} personnes, {b['incompletes']} incomplètes, "
+                 f"{b['pertes']} trames perdues")
+        if debit is not None:
+            texte += f", {debit:.0f} trames/s"
+        return texte + f", {self.nb_abonnes} abonnés"
+
+
+def _gestionnaire(agregateur):
+    class Gestionnaire(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            index = agregateur.index
+            morceaux = url.path.strip("/").split("/")
+            try:
+                if url.path in ("/", "/batiment"):
+                    corps = index.batiment()
+                elif url.path == "/pieces":
+                    corps = index.pieces()
+                elif morceaux[0] == "piece" and len(morceaux) == 2:
+                    corps = index.piece(int(morceaux[1]))
+                elif url.path == "/historique":
+                    piece = int(params["piece"]) if "piece" in params else None
+                    t, v = index.historique(params.get("champ", "personnes"),
+                                            float(params.get("duree", 600)), piece,
+                                            params.get("agregat", "somme"))
+                    corps = {"t": t, "valeurs": v}
+                else:
+                    corps = None
+            except (KeyError, ValueError):
+                self.send_error(400)
+                return
+            if corps is None:
+                self.send_error(404)
+                return
+            donnees = json.dumps(corps, ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(donnees)))
+            self.end_headers()
+            self.wfile.write(donnees)
+
+        def log_message(self, *args):
+            pass  # Pas de ligne par requête dans la console
+    return Gestionnaire
+
+
+# ==========================================
+# NOEUDS SIMULES (TEST DE CHARGE)
+# ==========================================
+def simuler_noeuds(adresse, premier, nb, protocole="udp", frequence=5.0, duree=None, graine=None):
+    """nb noeuds d'une pièce chacun (numéros premier..premier+nb-1), valeurs qui dérivent."""
+    rng = random.Random(graine if graine is not None else premier)
+    noeuds = [NoeudBatiment(adresse, {premier + k: f"Salle {premier + k}"}, protocole,
+                            intervalle_min=1.0 / frequence) for k in range(nb)]
+    temperatures = [rng.uniform(19, 25) for _ in range(nb)]
+    personnes = [rng.randint(0, 8) for _ in range(nb)]
+    for noeud in noeuds:
+        noeud.demarrer()
+    fin = None if duree is None else time.monotonic() + duree
+    try:
+        while fin is None or time.monotonic() < fin:
+            for k, noeud in enumerate(noeuds):
+                temperatures[k] = min(30, max(15, temperatures[k] + rng.uniform(-0.1, 0.1)))
+                if rng.random() < 0.05:
+                    personnes[k] = max(0, personnes[k] + rng.choice([-1, 1]))
+                noeud.publier(premier + k, temperature=round(temperatures[k], 1),
+                              personnes=personnes[k], fonctionne=1,
+                              action=ACTIONS.index("CLIM ON" if temperatures[k] > 24 else "ZONE CONFORT"))
+            time.sleep(1.0 / frequence)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for noeud in noeuds:
+            noeud.arreter()
+    envois = sum(n.nb_envois for n in noeuds)
+    trames = sum(n.nb_trames for n in noeuds)
+    octets = sum(n.nb_octets for n in noeuds)
+    print(f"Noeuds {premier}-{premier + nb - 1} : {trames} trames en {envois} envois, "
+          f"{octets / max(1, trames):.0f} octets/trame, {sum(n.nb_echecs for n in noeuds)} échecs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrégateur d'occupation du bâtiment")
+    sous = parser.add_subparsers(dest="commande", required=True)
+    p = sous.add_parser("agregateur", help="Service central")
+    p.add_argument("--hote", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=PORT_NOEUDS)
+    p.add_argument("--port-abonnes", type=int, default=PORT_ABONNES)
+    p.add_argument("--port-http", type=int, default=PORT_HTTP)
+    p.add_argument("--nb-max", type=int, default=1024, help="Nb max de pièces")
+    p.add_argument("--duree-historique", type=float, default=600.0)
+    p.add_argument("--periode-log", type=float, default=5.0)
+    p = sous.add_parser("noeuds", help="Noeuds simulés (test de charge)")
+    p.add_argument("--agregateur", default="127.0.0.1", help="hote[:port]")
+    p.add_argument("--nb", type=int, default=100, help="Nb total de noeuds simulés")
+    p.add_argument("--processus", type=int, default=1, help="Répartis sur N processus")
+    p.add_argument("--premier", type=int, default=1, help="Numéro de la première pièce")
+    p.add_argument("--protocole", default="udp", choices=["udp", "tcp"])
+    p.add_argument("--frequence", type=float, default=5.0, help="Mises à jour par seconde et par noeud")
+    p.add_argument("--duree", type=float, help="Arrêt au bout de N secondes")
+    args = parser.parse_args()
+
+    if args.commande == "noeuds":
+        hote, _, port = args.agregateur.partition(":")
+        adresse = (hote, int(port) if port else PORT_NOEUDS)
+        import multiprocessing as mp
+        parts = [args.nb // args.processus + (k < args.nb % args.processus) for k in range(args.processus)]
+        debuts = [args.premier + sum(parts[:k]) for k in range(args.processus)]
+        ctx = mp.get_context("spawn")
+        processus = [ctx.Process(target=simuler_noeuds,
+                                 args=(adresse, debut, nb, args.protocole, args.frequence, args.duree))
+                     for debut, nb in zip(debuts, parts) if nb]
+        for pr in processus:
+            pr.start()
+        try:
+            for pr in processus:
+                pr.join()
+        except KeyboardInterrupt:
+            for pr in processus:
+                pr.join()
+        return
+
+    agregateur = Agregateur(args.hote, args.port, args.port_abonnes, args.port_http,
+                            nb_max=args.nb_max, duree_historique=args.duree_historique)
+    agregateur.demarrer()
+    print(f"Agrégateur : noeuds sur {args.port} (UDP/TCP), écrans sur {args.port_abonnes}, "
+          f"http://{args.hote}:{args.port_http}/batiment")
+    trames = agregateur.index.nb_trames
+    try:
+        while True:
+            time.sleep(args.periode_log)
+            debit = (agregateur.index.nb_trames - trames) / args.periode_log
+            trames = agregateur.index.nb_trames
+            print(agregateur.ligne(debit))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agregateur.arreter()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import time
+import cv2
+import numpy as np
+
+from affichage import CalqueCache
+
+# ==========================================
+# MICRO-BENCHMARK : COUT DU DESSIN PAR IMAGE
+# ==========================================
+# Compare, sur une image 640x480 :
+#   A. le dashboard de regulateur.py redessiné à chaque image (fond + 10 putText)
+#      contre le même dashboard en calque cache (1 copie, re-rendu toutes les 2 s)
+#   B. 20 étiquettes "Personne" en cv2.putText contre un collage NumPy pré-rendu
+#      (résultat sur PC : putText ~5 µs/étiquette, collage ~15 µs -> on garde putText)
+# Usage : python bench_affichage.py
+
+
+def dessiner_dashboard(img, temp, nb, saison, cible, s_on, s_off, fan, color, action_txt, action_color):
+    # Même dessin que regulateur.py
+    cv2.rectangle(img, (0, 0), (640, 120), (20, 20, 20), -1)
+    cv2.putText(img, "REEL", (10, 20), 0, 0.5, (200, 200, 200), 1)
+    cv2.putText(img, f"{temp:.1f} C", (10, 55), 0, 1.0, (255, 255, 255), 2)
+    cv2.putText(img, f"{nb} Pers.", (10, 90), 0, 0.7, (0, 255, 0), 2)
+    cv2.putText(img, "STRATEGIE", (200, 20), 0, 0.5, (200, 200, 200), 1)
+    cv2.putText(img, f"ON : {s_on}", (200, 45), 0, 0.5, (100, 255, 255), 1)
+    cv2.putText(img, f"BUT: {cible}", (200, 75), 0, 0.9, color, 2)
+    cv2.putText(img, f"OFF: {s_off}", (200, 100), 0, 0.5, (100, 255, 100), 1)
+    cv2.putText(img, f"MODE {saison}", (450, 20), 0, 0.5, (200, 200, 200), 1)
+    cv2.putText(img, action_txt, (420, 60), 0, 0.8, action_color, 2)
+    cv2.putText(img, f"FAN: {fan}", (450, 90), 0, 0.5, (200, 200, 200), 1)
+
+
+def chrono(fonction, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fonction(i)
+    return (time.perf_counter() - t0) / n * 1e6  # µs par image
+
+
+def main(n=2000, fps=30):
+    frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+
+    def infos(i):
+        # La température change toutes les 2 s (= 2 * fps images)
+        return (21.0 + (i // (2 * fps)) * 0.1, 3, "HIVER", 19.0, 18.5, 19.5, "MOYEN",
+                (0, 255, 255), "CHAUFFE", (0, 0, 255))
+
+    calque = CalqueCache((120, 640))
+
+    def direct(i):
+        dessiner_dashboard(frame, *infos(i))
+
+    def cache(i):
+        x = infos(i)
+        calque.mettre_a_jour(x, dessiner_dashboard, *x)
+        calque.composer(frame)
+
+    boites = [(20 + 25 * k, 150 + (k % 5) * 60) for k in range(20)]
+    # Etiquette pré-rendue + indices des pixels dessinés
+    (w, h), base = cv2.getTextSize("Personne", cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+    sprite = np.zeros((h + base + 4, w + 4, 3), dtype=np.uint8)
+    cv2.putText(sprite, "Personne", (1, h + 1), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    dy, dx = np.nonzero(sprite.any(axis=2))
+    pixels = sprite[dy, dx]
+
+    def labels_direct(i):
+        for x, y in boites:
+            cv2.putText(frame, "Personne", (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+    def labels_cache(i):
+        for x, y in boites:
+            frame[dy + y - h - 1, dx + x - 1] = pixels
+
+    print(f"Dashboard direct : {chrono(direct, n):8.1f} µs/image")
+    print(f"Dashboard cache  : {chrono(cache, n):8.1f} µs/image ({calque.nb_rendus} rendus sur {n} images)")
+    print(f"20 étiquettes putText : {chrono(labels_direct, n):8.1f} µs/image")
+    print(f"20 étiquettes cache   : {chrono(labels_cache, n):8.1f} µs/image")
+
+
+if __name__ == "__main__":
+    main()
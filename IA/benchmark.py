@@ -0,0 +1,225 @@
+import csv
+import json
+import time
+import argparse
+import threading
+import numpy as np
+
+from echange_images import TamponImages
+from detection import creer_detecteur
+from cascade import creer_cascade
+from mouvement import PorteMouvement
+from sources import ouvrir_source, Cadrage
+
+# ==========================================
+# BENCHMARK HORS-LIGNE DU PIPELINE DE DETECTION
+# ==========================================
+# Rejoue une vidéo ou un dossier d'images dans le MEME chemin que ai_worker
+# (Cadrage -> TamponImages -> porte mouvement -> détecteur -> latest_boxes) et sort un JSON :
+#   - FPS d'inférence et FPS du pipeline
+#   - latence capture -> mise à jour de latest_boxes (p50 / p90 / p99 / max)
+#   - temps CPU par image (tous threads du processus, hors processus enfant en mode "processus")
+#   - précision du comptage contre une vérité terrain
+#
+# Vérité terrain : CSV "index,personnes" (index = numéro d'image dans la source, à partir de 0)
+#
+# Exemples :
+#   python benchmark.py videos/salle.mp4 --cadence max --backend onnx --verite videos/salle.csv
+#   python benchmark.py images/ --cadence reel --mode processus --sortie resultats.json
+#   python benchmark.py videos/salle.mp4 --modele-rapide yolov8n.pt --verite videos/salle.csv  (cascade)
+
+
+def lire_verite(chemin):
+    verite = {}
+    with open(chemin, newline="") as f:
+        for ligne in csv.reader(f):
+            if not ligne or not ligne[0].strip().isdigit():
+                continue  # En-tête ou ligne vide
+            verite[int(ligne[0])] = int(ligne[1])
+    return verite
+
+
+def percentiles(valeurs_ms):
+    if not valeurs_ms:
+        return None
+    v = np.asarray(valeurs_ms)
+    return {
+        "p50": round(float(np.percentile(v, 50)), 2),
+        "p90": round(float(np.percentile(v, 90)), 2),
+        "p99": round(float(np.percentile(v, 99)), 2),
+        "max": round(float(v.max()), 2),
+    }
+
+
+def lancer(source, detecteur, porte, cadence, forme):
+    """Joue toute la source (images IA de forme `forme`), retourne les mesures brutes."""
+    tampon = TamponImages(forme)
+    t_capture = {}            # seq -> instant de capture
+    mises_a_jour = []         # (seq, instant de mise à jour, nb personnes)
+    durees_inference = []
+    fini = threading.Event()
+    traite = threading.Condition()
+    dernier_traite = [0]
+    erreur = []               # Exception du worker (le benchmark s'arrête au lieu d'attendre)
+
+    def worker():
+        try:
+            boucle_worker()
+        except Exception as e:
+            erreur.append(e)
+            with traite:
+                traite.notify_all()
+
+    def boucle_worker():
+        dernier_seq = 0
+        while True:
+            seq, img = tampon.attendre(dernier_seq, timeout=0.5)
+            if img is None:
+                if fini.is_set():
+                    break
+                continue
+            if porte is not None and not porte.doit_analyser(img):
+                tampon.liberer(seq)
+            else:
+                t0 = time.perf_counter()
+                try:
+                    dets = detecteur.detecter(img)
+                finally:
+                    tampon.liberer(seq)
+                durees_inference.append(time.perf_counter() - t0)
+                mises_a_jour.append((seq, time.perf_counter(), len(dets)))
+            dernier_seq = seq
+            with traite:
+                dernier_traite[0] = seq
+                traite.notify_all()
+
+    t = threading.Thread(target=worker, daemon=True)
+    t.start()
+
+    nb_images = 0
+    cpu0, t_debut = time.process_time(), time.perf_counter()
+    source.demarrer()
+    try:
+        while True:
+            image, _ = source.lire_double()  # Image IA (taille du modèle, ROI) comme ai_worker
+            if image is None:
+                break
+            t_image = time.perf_counter()
+            seq = tampon.publier(image, copie=False)
+            if seq is None:
+                continue
+            t_capture[seq] = t_image
+            nb_images += 1
+            if cadence == "max":
+                # Pas-à-pas : chaque image est vue par le worker (débit maximal, zéro perte)
+                with traite:
+                    while not traite.wait_for(lambda: dernier_traite[0] >= seq or erreur, timeout=1.0):
+                        if not t.is_alive():
+                            raise RuntimeError("Le worker d'inférence s'est arrêté")
+                if erreur:
+                    raise RuntimeError(f"Le worker d'inférence a échoué : {erreur[0]!r}") from erreur[0]
+    finally:
+        source.arreter()
+        with traite:
+            traite.wait_for(lambda: dernier_traite[0] >= tampon.seq or erreur, timeout=10)
+        fini.set()
+        tampon.fermer()
+        t.join(timeout=5)
+    if erreur:
+        raise RuntimeError(f"Le worker d'inférence a échoué : {erreur[0]!r}") from erreur[0]
+    duree = time.perf_counter() - t_debut
+    cpu = time.process_time() - cpu0
+
+    return {
+        "nb_images": nb_images,
+        "duree": duree,
+        "cpu": cpu,
+        "t_capture": t_capture,
+        "mises_a_jour": mises_a_jour,
+        "durees_inference": durees_inference,
+    }
+
+
+def precision(mises_a_jour, verite):
+    """Compare, pour chaque image annotée, le comptage disponible à ce moment-là."""
+    if not verite or not mises_a_jour:
+        return None
+    seqs = np.array([m[0] for m in mises_a_jour])
+    comptes = np.array([m[2] for m in mises_a_jour])
+    erreurs = []
+    for index, attendu in verite.items():
+        # seq = index + 1 ; dernier résultat issu d'une image <= celle-ci
+        k = np.searchsorted(seqs, index + 1, side="right") - 1
+        obtenu = comptes[k] if k >= 0 else 0
+        erreurs.append(obtenu - attendu)
+    erreurs = np.abs(np.array(erreurs))
+    return {
+        "images_annotees": int(len(erreurs)),
+        "erreur_moyenne": round(float(erreurs.mean()), 3),
+        "exact": round(float((erreurs == 0).mean()), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors-ligne du pipeline de détection")
+    parser.add_argument("source", help="Vidéo, dossier d'images ou 'webcam'")
+    parser.add_argument("--cadence", default="max", choices=["max", "reel"])
+    parser.add_argument("--modele", default="yolov8s.pt")
+    parser.add_argument("--modele-rapide", help="Active la cascade : ce modèle d'abord, --modele si doute")
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--mode", default="thread", choices=["thread", "processus"])
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--largeur-ia", type=int, default=640, help="Largeur de l'image IA (= imgsz du modèle)")
+    parser.add_argument("--roi", help="Zone analysée x,y,largeur,hauteur en fractions du champ")
+    parser.add_argument("--sans-porte", action="store_true", help="Désactive la porte mouvement")
+    parser.add_argument("--verite", help="CSV index,personnes")
+    parser.add_argument("--sortie", help="Fichier JSON (sinon stdout)")
+    args = parser.parse_args()
+
+    roi = tuple(float(v) for v in args.roi.split(",")) if args.roi else None
+    cadrage = Cadrage((640, 480), args.largeur_ia, roi)  # Toute image est ramenée à cadrage.forme_ia
+    source = ouvrir_source(args.source, cadence=args.cadence, cadrage=cadrage, affichage=False)
+    if args.modele_rapide:
+        detecteur = creer_cascade(args.mode, args.modele_rapide, args.modele, args.confidence,
+                                  forme=cadrage.forme_ia, backend=args.backend)
+    else:
+        detecteur = creer_detecteur(args.mode, args.modele, args.confidence, cadrage.forme_ia, args.backend)
+    porte = None if args.sans_porte else PorteMouvement()
+    try:
+        brut = lancer(source, detecteur, porte, args.cadence, cadrage.forme_ia)
+    finally:
+        detecteur.arreter()
+
+    latences = [(t_maj - brut["t_capture"][seq]) * 1000
+                for seq, t_maj, _ in brut["mises_a_jour"] if seq in brut["t_capture"]]
+    nb_inf = len(brut["durees_inference"])
+    resultat = {
+        "source": args.source,
+        "cadence": args.cadence,
+        "modele": args.modele,
+        "modele_rapide": args.modele_rapide,
+        "backend": args.backend,
+        "mode": args.mode,
+        "forme_ia": list(cadrage.forme_ia),
+        "porte_mouvement": porte is not None,
+        "nb_images": brut["nb_images"],
+        "nb_inferences": nb_inf,
+        "fps_pipeline": round(brut["nb_images"] / brut["duree"], 2) if brut["duree"] else 0,
+        "fps_inference": round(nb_inf / sum(brut["durees_inference"]), 2) if nb_inf else 0,
+        "latence_ms": percentiles(latences),
+        "inference_ms": percentiles([d * 1000 for d in brut["durees_inference"]]),
+        "cpu_ms_par_image": round(brut["cpu"] * 1000 / max(1, brut["nb_images"]), 2),
+        "precision": precision(brut["mises_a_jour"], lire_verite(args.verite) if args.verite else None),
+    }
+    if args.modele_rapide:
+        resultat["cascade"] = detecteur.etat()
+
+    texte = json.dumps(resultat, indent=2, ensure_ascii=False)
+    if args.sortie:
+        with open(args.sortie, "w") as f:
+            f.write(texte)
+    print(texte)
+
+
+if __name__ == "__main__":
+    main()
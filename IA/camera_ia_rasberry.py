@@ -1,126 +1,232 @@
 
 import time
-import cv2
+T_LANCEMENT = time.perf_counter()  # Origine des jalons de démarrage (imports compris)
 import threading
 import numpy as np
-from picamera2 import Picamera2
-from ultralytics import YOLO
+from echange_images import TamponImages
+from detection import creer_detecteur, prechauffer, tableau_detections, boites_entieres, AUCUNE_DETECTION
+from cascade import creer_cascade
+from mouvement import PorteMouvement
+from sources import ouvrir_source, Cadrage
+from suivi import SuiviPersonnes
+from ordonnanceur import Ordonnanceur
+from affichage import RythmeAffichage, CalqueCache
+from mesures import Instrumentation, dessiner_mesures
 
 # --- CONFIGURATION ---
 MODEL_TYPE = 'yolov8s.pt'  # Modèle Small (Précis mais lent)
 CONFIDENCE = 0.60          # 60% de confiance minimum
-VIDEO_FPS = 60             # Objectif fluidité vidéo
+VIDEO_FPS = 60             # Objectif fluidité vidéo (cadence max de l'affichage)
+HEADLESS = False           # True : Pi sans écran -> ni conversion couleur, ni dessin, ni fenêtre
+MODE_INFERENCE = "thread"  # "thread" ou "processus" (YOLO hors du GIL de l'affichage)
+BACKEND = "auto"           # "auto", "pytorch", "onnx", "openvino", "ncnn" (cf. exporter_modele.py)
+PORTE_MOUVEMENT = True     # Pas d'IA si la scène n'a pas bougé (refresh forcé toutes les 10 s)
+SOURCE = "picamera"        # "picamera", "webcam", "simulee", une vidéo ou un dossier d'images (rejeu)
+SUIVI = True               # Suivi des personnes : comptage stable + boîtes extrapolées
+CASCADE = False            # yolov8n d'abord, yolov8s si le nano hésite (valider le taux d'escalade avec benchmark.py)
+MODEL_RAPIDE = 'yolov8n.pt'
+LARGEUR_IA = 640           # Largeur de l'image IA (= imgsz du modèle, ex: 320 avec exporter_modele.py --imgsz 320)
+ROI = None                 # Zone analysée (x, y, largeur, hauteur) en fractions du champ, ex: (0.1, 0.2, 0.8, 0.8)
+AFFICHER_MESURES = False   # Calque des temps par étape (p50 / p95 / part du temps)
+PERIODE_LOG_MESURES = 30.0 # Une ligne de log des temps par étape toutes les N s (None = jamais)
+PORT_MESURES = 8765        # http://127.0.0.1:8765/ (texte) et /metrics (Prometheus) ; None = pas de serveur
+
+if not HEADLESS:
+    import cv2  # Fenêtre, conversion couleur et dessin seulement : pas chargé sur un Pi sans écran
 
 # Variables partagées entre les threads
-frame_buffer = None        # La dernière image capturée
-latest_boxes = []          # Les derniers carrés détectés
+cadrage = Cadrage((640, 480), LARGEUR_IA, ROI)  # Flux IA (petit, ROI) vs flux d'affichage
+tampon = TamponImages(cadrage.forme_ia)  # Anneau d'images numérotées capture -> IA
+suivi = SuiviPersonnes() if SUIVI else None
+ordo = Ordonnanceur(periode_regulation=None)  # Pas de régulation ici : seul l'écran fixe le besoin
+latest_boxes = AUCUNE_DETECTION  # Les derniers carrés détectés
 person_count = 0
-lock = threading.Lock()    # Sécurité pour éviter les conflits
-running = True
+mesures = Instrumentation(t_lancement=T_LANCEMENT)  # Temps par étape (capture, inférence, dessin...), sans allocation
+mesures.jalon("imports")
+lock = mesures.verrou("lock")  # Sécurité pour éviter les conflits (contention mesurée)
+arret = threading.Event()  # Demande d'arrêt propre de tous les workers
 
 # --- THREAD IA (L'ANALYSE EN ARRIÈRE-PLAN) ---
 def ai_worker():
-    global latest_boxes, person_count, frame_buffer
+    global latest_boxes, person_count
    
-    print(f"Chargement du modèle {MODEL_TYPE}...")
-    model = YOLO(MODEL_TYPE)
+    print(f"Chargement du modèle {MODEL_TYPE} (mode {MODE_INFERENCE})...")
+    if CASCADE:
+        detecteur = creer_cascade(MODE_INFERENCE, MODEL_RAPIDE, MODEL_TYPE, CONFIDENCE,
+                                  forme=cadrage.forme_ia, backend=BACKEND,
+                                  compte_reference=suivi.nb_vues if suivi is not None else None)
+    else:
+        detecteur = creer_detecteur(MODE_INFERENCE, MODEL_TYPE, CONFIDENCE, cadrage.forme_ia, BACKEND)
+    mesures.jalon("modele charge")
+    prechauffer(detecteur, cadrage.forme_ia)  # Pendant que la caméra démarre
+    mesures.jalon("prechauffage")
     print("IA Prête et en attente.")
    
-    while running:
-        img_for_ai = None
-       
-        # On récupère la dernière image disponible
-        with lock:
-            if frame_buffer is not None:
-                img_for_ai = frame_buffer.copy()
-       
-        if img_for_ai is not None:
+    porte = PorteMouvement() if PORTE_MOUVEMENT else None
+    dernier_seq = 0
+    try:
+        while not arret.is_set():
+            # L'ordonnanceur décide QUAND relancer l'IA (besoins + température du Pi)
+            ordo.attendre_creneau(arret)
+            # On attend une image NOUVELLE (pas de copie, pas de doublon)
+            t_etape = time.perf_counter()
+            seq, img_for_ai = tampon.attendre(dernier_seq, timeout=0.5)
+            t_image = time.monotonic()
+            if img_for_ai is None:
+                continue
+            t_etape = mesures.noter("attente image", t_etape)
+            if porte is not None and not porte.doit_analyser(img_for_ai, forcer=suivi is not None and suivi.a_verifier()):
+                # Scène inchangée : latest_boxes reste valable, on économise YOLO
+                tampon.liberer(seq)
+                dernier_seq = seq
+                mesures.noter("porte", t_etape)
+                continue
+            t_etape = mesures.noter("porte", t_etape)
+
             # L'IA travaille ici (ça prendra ~200ms)
-            # On force verbose=False pour gagner un peu de temps
-            results = model(img_for_ai, classes=[0], conf=CONFIDENCE, verbose=False)
+            t0 = time.monotonic()
+            try:
+                brut = detecteur.detecter(img_for_ai)
+            finally:
+                tampon.liberer(seq)
+            t_etape = mesures.noter("inference", t_etape)
+            dernier_seq = seq
+            detections = tableau_detections(cadrage.vers_affichage(brut))
            
-            temp_boxes = []
-            for r in results:
-                for box in r.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0]
-                    # On stocke les coordonnées
-                    temp_boxes.append((int(x1), int(y1), int(x2), int(y2)))
+            if suivi is not None:
+                # Un raté isolé de YOLO ne fait plus varier le comptage
+                detections = suivi.mettre_a_jour(detections, t_image)
+            mesures.noter("post-traitement", t_etape)
            
             # Mise à jour des résultats pour l'affichage
+            # Tableau figé publié tel quel : les lecteurs n'ont rien à copier
             with lock:
-                latest_boxes = temp_boxes
-                person_count = len(temp_boxes)
-        else:
-            time.sleep(0.01)
+                latest_boxes = detections
+                person_count = len(detections)
+            if "1re detection" not in mesures.jalons:
+                mesures.jalon("1re detection"); print(mesures.ligne_demarrage())
+            ordo.noter_inference(t0, time.monotonic(), len(detections))
+    finally:
+        detecteur.arreter()
+        if CASCADE:
+            print(detecteur.bilan())
+        if porte is not None:
+            print(f"IA évitée sur {porte.taux_saut():.0%} des images (scène immobile)")
+
+# --- CALQUES DE L'AFFICHAGE ---
+def dessiner_panneau(img, count_to_show):
+    cv2.rectangle(img, (0, 0), (300, 50), (0, 0, 0), -1)
+    cv2.putText(img, f"Pers: {count_to_show}", (10, 35),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+
+def dessiner_ligne_ia(img, cadence, duty_cycle):
+    cv2.putText(img, f"IA: {cadence:.1f} Hz ({duty_cycle:.0%})", (10, 15),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
 
 # --- PROGRAMME PRINCIPAL (AFFICHAGE VIDÉO) ---
 def main():
-    global frame_buffer, running
-   
-    print("Démarrage Caméra...")
-    picam2 = Picamera2()
    
-    config = picam2.create_video_configuration(
-        main={"size": (640, 480), "format": "RGB888"}
-    )
-    picam2.configure(config)
-    picam2.start()
-
-    WINDOW_NAME = "Smart Energy - Projet Smartherm"
-    cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
-
-    # Lancer l'IA en parallèle
+    # Lancer l'IA en parallèle : chargement + préchauffage du modèle pendant l'init de la caméra
     t = threading.Thread(target=ai_worker)
     t.daemon = True
     t.start()
 
+    print("Démarrage Caméra...")
+    source = ouvrir_source(SOURCE, cadrage=cadrage, affichage=not HEADLESS)
+    source.demarrer()
+    mesures.jalon("camera")
+
+    WINDOW_NAME = "Smart Energy - Projet Smartherm"
+    if not HEADLESS:
+        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+    ordo.noter_affichage(not HEADLESS)
+    rythme = RythmeAffichage(VIDEO_FPS)
+    panneau = CalqueCache((51, 301))
+    ligne_ia = CalqueCache((20, 640), position=(0, 455), opaque=False)
+    calque_mesures = CalqueCache((200, 300), position=(340, 0), opaque=False)
+    mesures.demarrer(periode_log=PERIODE_LOG_MESURES, port=PORT_MESURES)
+
     print("Système lancé. Vidéo fluide, IA en fond.")
 
     try:
         while True:
             # 1. Capture ultra rapide (BGR)
-            frame_rgb = picam2.capture_array()
-            frame_display = frame_rgb
-
-            # 3. Envoi à l'IA (on envoie l'image propre)
-            with lock:
-                frame_buffer = frame_rgb # L'IA préfère le RGB souvent
+            t_etape = time.perf_counter()
+            image_ia, frame_rgb = source.lire_double()  # frame_rgb = None sans écran
+            if image_ia is None: break  # Fin du rejeu
+            t_etape = mesures.noter("capture", t_etape)
+
+            # 3. Envoi à l'IA (zéro copie : on ne dessine que sur une copie, et seulement si on affiche)
+            tampon.publier(image_ia, copie=False)
+            t_etape = mesures.noter("publication", t_etape)
+            if not t.is_alive():
+                # Processus d'inférence perdu... : pas d'affichage d'un comptage figé
+                print("Thread IA arrêté : arrêt")
+                break
+            if HEADLESS:
+                continue
 
             # 4. Récupération des dessins (sans attendre l'IA)
-            boxes_to_draw = []
             count_to_show = 0
             with lock:
-                boxes_to_draw = list(latest_boxes)
+                boxes_to_draw = latest_boxes
                 count_to_show = person_count
+            if suivi is not None:
+                # Boîtes extrapolées entre deux passages de l'IA
+                boxes_to_draw = suivi.boites_predites(time.monotonic())
+            t_etape = mesures.noter("lecture resultats", t_etape)
+
+            # Affichage cadencé : on ne redessine que si c'est l'heure (ou si quelque chose a changé)
+            if not rythme.doit_afficher((count_to_show, boites_entieres(boxes_to_draw).tobytes())):
+                continue
+            frame_display = frame_rgb.copy()
+            t_etape = mesures.noter("copie", t_etape)
 
             # 5. Dessin manuel (Plus joli et plus rapide que r.plot())
-            for (x1, y1, x2, y2) in boxes_to_draw:
+            for (x1, y1, x2, y2) in boites_entieres(boxes_to_draw).tolist():
                 # Carré VERT (0, 255, 0) - Change ici si tu veux une autre couleur
                 # (Rappel: en OpenCV c'est Blue, Green, Red)
                 cv2.rectangle(frame_display, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                # putText direct : ~5 µs par étiquette, moins cher qu'un collage NumPy (cf. bench_affichage.py)
                 cv2.putText(frame_display, "Personne", (x1, y1-10),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-            # 6. Infos Textuelles
-            cv2.rectangle(frame_display, (0, 0), (300, 50), (0, 0, 0), -1)
-            cv2.putText(frame_display, f"Pers: {count_to_show}", (10, 35),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            if ROI is not None:
+                # Zone réellement analysée par l'IA
+                cv2.rectangle(frame_display, *cadrage.rectangle_roi(), (255, 255, 0), 1)
+
+            # 6. Infos Textuelles (calques redessinés seulement quand leur valeur change)
+            panneau.mettre_a_jour(count_to_show, dessiner_panneau, count_to_show)
+            panneau.composer(frame_display)
+            # Cadence de l'IA choisie par l'ordonnanceur + part du temps passée à inférer
+            infos_ia = (round(ordo.cadence, 1), round(ordo.duty_cycle(), 2))
+            ligne_ia.mettre_a_jour(infos_ia, dessiner_ligne_ia, *infos_ia)
+            ligne_ia.composer(frame_display)
+            if AFFICHER_MESURES:
+                # Redessiné seulement quand le résumé change (toutes les 2 s)
+                calque_mesures.mettre_a_jour(mesures.version, dessiner_mesures, mesures)
+                calque_mesures.composer(frame_display)
+            t_etape = mesures.noter("dessin", t_etape)
 
             # 7. Affichage
             cv2.imshow(WINDOW_NAME, frame_display)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
-                running = False
                 break
+            mesures.noter("imshow", t_etape)
 
     except KeyboardInterrupt:
-        running = False
         print("Arrêt...")
 
     finally:
-        picam2.stop()
-        cv2.destroyAllWindows()
-        t.join(timeout=1)
+        # Arrêt propre : on réveille l'IA, elle termine son image et ferme son détecteur
+        arret.set()
+        tampon.fermer()
+        t.join(timeout=5)
+        mesures.arreter()
+        print(mesures.ligne(mesures.fenetre("bilan")))
+        source.arreter()
+        if not HEADLESS:
+            cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
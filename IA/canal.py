@@ -0,0 +1,287 @@
+import os
+import time
+import math
+import socket
+import struct
+import threading
+
+# ==========================================
+# CANAL LOCAL VISION/REGULATION -> ECRAN
+# ==========================================
+# Publication / abonnement sur une socket Unix (même Pi, aucun réseau) :
+# - le processus de régulation PUBLIE (Publieur.publier(...) : ne bloque jamais)
+# - l'écran Tkinter s'ABONNE (Abonne : thread de lecture, Tk ne fait que recuperer())
+# Le même Abonne lit aussi l'agrégateur du bâtiment (batiment.py) en TCP :
+#   Abonne(("hote", PORT_ABONNES), requete="batiment")   ou   requete="piece 12"
+#
+# Format binaire compact, une trame =
+#   <H longueur> <d instant> <B nb de champs> puis nb x (<B id champ> <f valeur>)
+# Seuls les champs qui ONT CHANGE partent (un nouvel abonné reçoit tout l'état).
+# Une trame vide part toutes les periode_vie secondes : l'écran sait que le lien vit.
+# Les rafales sont regroupées : au plus une trame toutes les intervalle_min secondes.
+
+CHEMIN_CANAL = "/tmp/smarttherm.sock"
+CHAMPS = ("temperature", "humidite", "personnes", "cible", "seuil_on", "seuil_off",
+          "action", "consommation", "fonctionne")
+ID_CHAMP = {nom: i for i, nom in enumerate(CHAMPS)}
+_ABSENT = object()
+
+ENTETE = struct.Struct("<HdB")
+CHAMP = struct.Struct("<Bf")
+
+
+def encoder(t, valeurs):
+    """dict {champ: valeur} -> trame (None = NaN = valeur inconnue)."""
+    corps = b"".join(CHAMP.pack(ID_CHAMP[k], math.nan if v is None else v) for k, v in valeurs.items())
+    return ENTETE.pack(ENTETE.size - 2 + len(corps), t, len(valeurs)) + corps
+
+def decoder(tampon):
+    """
+    Extrait les trames complètes : ([(t, {champ: valeur})], octets restants).
+    Une trame incohérente arrête le décodage : octets restants = None (flux désynchronisé,
+    l'abonné se reconnecte) ; les trames valides qui la précèdent sont rendues.
+    """
+    trames = []
+    debut = 0
+    while len(tampon) - debut >= ENTETE.size:
+        longueur, t, nb = ENTETE.unpack_from(tampon, debut)
+        fin = debut + 2 + longueur
+        if longueur < ENTETE.size - 2 + nb * CHAMP.size:
+            return trames, None
+        if len(tampon) < fin:
+            break
+        valeurs = {}
+        for i in range(nb):
+            id_champ, v = CHAMP.unpack_from(tampon, debut + ENTETE.size + i * CHAMP.size)
+            if id_champ < len(CHAMPS):
+                valeurs[CHAMPS[id_champ]] = None if math.isnan(v) else v
+        trames.append((t, valeurs))
+        debut = fin
+    return trames, tampon[debut:]
+
+
+class Publieur:
+
+    def __init__(self, chemin=CHEMIN_CANAL, intervalle_min=0.1, periode_vie=2.0):
+        self.chemin = chemin
+        self.intervalle_min = intervalle_min
+        self.periode_vie = periode_vie
+        self.etat = {}
+        self.envoye = {}
+        self.clients = []
+        self.lock = threading.Lock()
+        self.reveil = threading.Event()
+        self.arret = threading.Event()
+        self.thread = None
+        self.nb_trames = 0
+
+    def demarrer(self):
+        if os.path.exists(self.chemin):
+            os.unlink(self.chemin)  # Socket laissée par un arrêt brutal
+        self.serveur = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.serveur.bind(self.chemin)
+        self.serveur.listen(4)
+        self.serveur.setblocking(False)
+        self.thread = threading.Thread(target=self._boucle, daemon=True)
+        self.thread.start()
+
+    def publier(self, **valeurs):
+        """Appelé depuis la boucle principale : mise à jour d'un dict, jamais d'E/S."""
+        with self.lock:
+            change = any(self.etat.get(k, _ABSENT) != v for k, v in valeurs.items())
+            self.etat.update(valeurs)
+        if change:
+            self.reveil.set()
+
+    def _accepter(self):
+        while True:
+            try:
+                client, _ = self.serveur.accept()
+            except (BlockingIOError, OSError):
+                return
+            # Un écran figé ne doit pas bloquer la régulation : on l'abandonne
+            client.settimeout(0.5)
+            with self.lock:
+                trame = encoder(time.time(), self.etat)
+            if self._envoyer(client, trame):
+                self.clients.append(client)
+
+    def _envoyer(self, client, trame):
+        try:
+            client.sendall(trame)
+            return True
+        except OSError:
+            client.close()
+            return False
+
+    def _boucle(self):
+        derniere = 0.0
+        while not self.arret.is_set():
+            self.reveil.wait(min(self.periode_vie, 0.25))
+            self.reveil.clear()
+            self._accepter()
+            with self.lock:
+                diff = {k: v for k, v in self.etat.items() if self.envoye.get(k, _ABSENT) != v}
+                self.envoye.update(diff)
+            maintenant = time.monotonic()
+            if not diff and maintenant - derniere < self.periode_vie:
+                continue
+            trame = encoder(time.time(), diff)
+            self.clients = [c for c in self.clients if self._envoyer(c, trame)]
+            self.nb_trames += 1
+            derniere = maintenant
+            # Rafale : les changements suivants attendront la prochaine trame
+            self.arret.wait(self.intervalle_min)
+
+    def arreter(self):
+        self.arret.set()
+        self.reveil.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        for c in self.clients:
+            c.close()
+        if self.thread is not None:
+            self.serveur.close()
+            if os.path.exists(self.chemin):
+                os.unlink(self.chemin)
+
+
+class Abonne:
+
+    def __init__(self, chemin=CHEMIN_CANAL, delai_perte=5.0, requete=None):
+        """
+        chemin : socket Unix, ou (hôte, port) de l'agrégateur du bâtiment
+        delai_perte : sans trame depuis ce délai, le lien est considéré perdu.
+        requete : ligne envoyée à la connexion (agrégateur : "batiment" ou "piece 12")
+        """
+        self.chemin = chemin
+        self.delai_perte = delai_perte
+        self.requete = requete
+        self.en_attente = {}
+        self.derniere_trame = None
+        self.lock = threading.Lock()
+        self.arret = threading.Event()
+        self.thread = None
+
+    def demarrer(self):
+        self.thread = threading.Thread(target=self._boucle, daemon=True)
+        self.thread.start()
+
+    def _boucle(self):
+        while not self.arret.is_set():
+            try:
+                famille = socket.AF_INET if isinstance(self.chemin, tuple) else socket.AF_UNIX
+                with socket.socket(famille, socket.SOCK_STREAM) as s:
+                    s.settimeout(2.0)
+                    s.connect(self.chemin)
+                    s.settimeout(1.0)
+                    if self.requete is not None:
+                        s.sendall(self.requete.encode() + b"\n")
+                    self._lire(s)
+            except OSError:
+                pass
+            self.arret.wait(1.0)  # Publieur absent : on réessaie
+
+    def _lire(self, s):
+        reste = b""
+        while not self.arret.is_set():
+            try:
+                donnees = s.recv(4096)
+            except socket.timeout:
+                continue
+            if not donnees:
+                return
+            try:
+                trames, reste = decoder(reste + donnees)
+            except struct.error:
+                trames, reste = [], None
+            if trames:
+                with self.lock:
+                    for _, valeurs in trames:
+                        self.en_attente.update(valeurs)
+                    self.derniere_trame = time.monotonic()
+            if reste is None:
+                # Trame corrompue (agrégateur distant...) : tampon jeté, nouvelle connexion
+                # -> le publieur renvoie tout l'état, le thread de lecture ne meurt pas
+                return
+
+    def recuperer(self):
+        """Changements accumulés depuis le dernier appel (rafales fusionnées), sans attente."""
+        with self.lock:
+            valeurs, self.en_attente = self.en_attente, {}
+        return valeurs
+
+    def connecte(self):
+        t = self.derniere_trame
+        return t is not None and time.monotonic() - t < self.delai_perte
+
+    def arreter(self):
+        self.arret.set()
+
+
+# ==========================================
+# SIMULATEUR (TEST DE L'ECRAN SANS LE PI)
+# ==========================================
+class Simulateur:
+    """Publie des valeurs plausibles : température qui dérive, occupation qui varie."""
+
+    def __init__(self, publieur, periode=1.0, graine=None):
+        import random
+        self.publieur = publieur
+        self.periode = periode
+        self.rng = random.Random(graine)
+        self.temperature = 22.0
+        self.personnes = 3
+        self.fonctionne = True
+        self.arret = threading.Event()
+        self.thread = None
+
+    def _pas(self):
+        self.temperature = max(18, min(28, self.temperature + self.rng.uniform(-0.3, 0.3)))
+        if self.rng.random() < 0.1:
+            self.personnes = max(0, min(20, self.personnes + self.rng.choice([-1, 1])))
+        consommation = 0.5 + self.personnes * 0.15 + self.rng.uniform(-0.05, 0.05)
+        self.publieur.publier(temperature=round(self.temperature, 1), personnes=self.personnes,
+                              consommation=round(consommation, 2), fonctionne=int(self.fonctionne))
+
+    def _boucle(self):
+        while not self.arret.is_set():
+            self._pas()
+            self.arret.wait(self.periode)
+
+    def demarrer(self):
+        self.thread = threading.Thread(target=self._boucle, daemon=True)
+        self.thread.start()
+
+    # Commandes de test (boutons de l'écran)
+    def basculer_panne(self):
+        self.fonctionne = not self.fonctionne
+        self._pas()
+
+    def ajouter_personne(self):
+        self.personnes = min(20, self.personnes + 1)
+        self._pas()
+
+    def retirer_personne(self):
+        self.personnes = max(0, self.personnes - 1)
+        self._pas()
+
+    def arreter(self):
+        self.arret.set()
+
+
+if __name__ == "__main__":
+    # Publieur simulé autonome : python canal.py, puis lancer l'écran
+    publieur = Publieur()
+    publieur.demarrer()
+    simulateur = Simulateur(publieur)
+    simulateur.demarrer()
+    print(f"Simulateur publié sur {CHEMIN_CANAL} (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulateur.arreter()
+        publieur.arreter()
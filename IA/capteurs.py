@@ -0,0 +1,325 @@
+import csv
+import time
+import threading
+from collections import namedtuple
+import numpy as np
+
+# ==========================================
+# CAPTEURS DE TEMPERATURE / HUMIDITE
+# ==========================================
+# Remplace dht_worker :
+# - PILOTES interchangeables : lire() -> (température, humidité), RuntimeError si
+#   lecture ratée (checksum du DHT : c'est courant, cf. tests/testemp.py)
+#     "dht11:D4", "dht22:D17"       -> adafruit_dht sur la broche board.Dxx
+#     "simule" / "simule:22.5"      -> capteur simulé (dérive lente + bruit + ratés)
+#     "rejeu:mesures.csv"           -> relit un CSV "temperature,humidite"
+# - Un THREAD par capteur : jamais plus d'une lecture / intervalle_min (2 s pour
+#   les DHT), nouvel essai avec attente croissante quand ça rate, ré-init si besoin
+# - FILTRE : médiane glissante + rejet des valeurs aberrantes (saut > seuil)
+# - FENETRE des dernières mesures lisible SANS verrou par la régulation et l'écran
+# - PIECE : fusion de plusieurs capteurs (médiane des mesures encore fraîches)
+
+# Mesure publiée : tuple immuable -> remplacer la référence suffit (lecture sans verrou)
+Mesure = namedtuple("Mesure", ["t", "temperature", "humidite"])
+
+
+# ==========================================
+# PILOTES
+# ==========================================
+class PiloteDHT:
+
+    def __init__(self, modele="DHT11", broche="D4"):
+        self.modele = modele.upper()
+        self.broche = broche
+        self.intervalle_min = 2.0   # Le DHT ne se relit pas plus vite (DHT11 et DHT22)
+        self.capteur = None
+
+    def ouvrir(self):
+        import board
+        import adafruit_dht
+        classe = adafruit_dht.DHT22 if self.modele == "DHT22" else adafruit_dht.DHT11
+        self.capteur = classe(getattr(board, self.broche))
+
+    def lire(self):
+        t = self.capteur.temperature
+        h = self.capteur.humidity
+        if t is None or h is None:
+            raise RuntimeError("Lecture vide")
+        return float(t), float(h)
+
+    def fermer(self):
+        if self.capteur is not None:
+            self.capteur.exit()
+            self.capteur = None
+
+    def __str__(self):
+        return f"{self.modele}@{self.broche}"
+
+
+class PiloteSimule:
+    """Pièce simulée : dérive lente, bruit de mesure, ratés et valeurs aberrantes."""
+
+    def __init__(self, temperature=22.0, humidite=50.0, intervalle_min=2.0,
+                 taux_rates=0.2, taux_aberrant=0.02, graine=None):
+        self.temperature = temperature
+        self.humidite = humidite
+        self.intervalle_min = intervalle_min
+        self.taux_rates = taux_rates
+        self.taux_aberrant = taux_aberrant
+        self.rng = np.random.default_rng(graine)
+
+    def ouvrir(self):
+        pass
+
+    def lire(self):
+        self.temperature += self.rng.normal(0, 0.05)
+        self.humidite = float(np.clip(self.humidite + self.rng.normal(0, 0.2), 20, 90))
+        tirage = self.rng.random()
+        if tirage < self.taux_rates:
+            raise RuntimeError("Checksum did not validate (simulé)")
+        if tirage < self.taux_rates + self.taux_aberrant:
+            return self.temperature + self.rng.choice([-15.0, 15.0]), self.humidite
+        return round(self.temperature + self.rng.normal(0, 0.2), 1), round(self.humidite, 1)
+
+    def fermer(self):
+        pass
+
+    def __str__(self):
+        return "simule"
+
+
+class PiloteRejeu:
+    """Relit un CSV "temperature,humidite" (une ligne par lecture, vide = raté)."""
+
+    def __init__(self, chemin, intervalle_min=2.0, boucle=True):
+        self.chemin = chemin
+        self.intervalle_min = intervalle_min
+        self.boucle = boucle
+        self.lignes = []
+        self.index = 0
+
+    def ouvrir(self):
+        with open(self.chemin, newline="") as f:
+            self.lignes = [l for l in csv.reader(f) if not (l and l[0].startswith("temp"))]
+        self.index = 0
+
+    def lire(self):
+        if self.index >= len(self.lignes):
+            if not self.boucle or not self.lignes:
+                raise RuntimeError("Fin du rejeu")
+            self.index = 0
+        ligne = self.lignes[self.index]
+        self.index += 1
+        try:
+            return float(ligne[0]), float(ligne[1])
+        except (ValueError, IndexError):
+            raise RuntimeError(f"Ligne {self.index} illisible")
+
+    def fermer(self):
+        pass
+
+    def __str__(self):
+        return f"rejeu:{self.chemin}"
+
+
+def ouvrir_pilote(spec):
+    """'dht11:D4', 'dht22:D17', 'simule[:temp]', 'rejeu:fichier.csv'"""
+    nom, _, arg = spec.partition(":")
+    nom = nom.lower()
+    if nom in ("dht11", "dht22"):
+        return PiloteDHT(nom, arg or "D4")
+    if nom == "simule":
+        return PiloteSimule(float(arg)) if arg else PiloteSimule()
+    if nom == "rejeu":
+        return PiloteRejeu(arg)
+    raise ValueError(f"Capteur inconnu : {spec}")
+
+
+# ==========================================
+# FENETRE GLISSANTE SANS VERROU
+# ==========================================
+class FenetreMesures:
+    """
+    Un seul écrivain (le thread du capteur), lecteurs sans verrou :
+    - derniere : référence vers une Mesure immuable (échange atomique sous le GIL)
+    - valeurs() : copie des tableaux, recommencée si l'écrivain est passé entre-temps
+    """
+
+    def __init__(self, taille=64):
+        self.taille = taille
+        self.t = np.zeros(taille, dtype=np.float64)
+        self.temperatures = np.zeros(taille, dtype=np.float32)
+        self.humidites = np.zeros(taille, dtype=np.float32)
+        self.nb = 0                 # Nombre total de mesures écrites
+        self.version = 0            # Impaire pendant une écriture (principe du "seqlock")
+        self.derniere = None
+
+    def ajouter(self, mesure):
+        i = self.nb % self.taille
+        self.version += 1
+        self.t[i] = mesure.t
+        self.temperatures[i] = mesure.temperature
+        self.humidites[i] = mesure.humidite
+        self.nb += 1
+        self.version += 1
+        self.derniere = mesure
+
+    def valeurs(self):
+        """(t, températures, humidités) dans l'ordre chronologique."""
+        while True:
+            version = self.version
+            if version % 2:
+                time.sleep(0)       # Écriture en cours : on laisse l'écrivain finir
+                continue
+            nb = self.nb
+            t, temp, hum = self.t.copy(), self.temperatures.copy(), self.humidites.copy()
+            if version == self.version:
+                break
+        n = min(nb, self.taille)
+        ordre = (np.arange(nb - n, nb) % self.taille)
+        return t[ordre], temp[ordre], hum[ordre]
+
+
+# ==========================================
+# CAPTEUR (THREAD + FILTRE)
+# ==========================================
+class Capteur:
+
+    def __init__(self, pilote, taille_mediane=5, seuil_aberrant=3.0, max_rejets=3,
+                 attente_max=60.0, taille_fenetre=64):
+        """
+        seuil_aberrant : écart (°C) à la médiane au-delà duquel une lecture est rejetée
+        max_rejets : rejets consécutifs avant d'accepter (vrai changement brutal)
+        attente_max : attente maximale entre deux essais quand le capteur rate
+        """
+        self.pilote = pilote
+        self.taille_mediane = taille_mediane
+        self.seuil_aberrant = seuil_aberrant
+        self.max_rejets = max_rejets
+        self.attente_max = attente_max
+        self.fenetre = FenetreMesures(taille_fenetre)
+        self.brutes = []            # Dernières lectures acceptées (pour la médiane)
+        self.rejets = 0
+        self.nb_lectures = 0
+        self.nb_rates = 0
+        self.nb_aberrantes = 0
+        self.thread = None
+
+    # --- Filtre ---
+    def _filtrer(self, temperature, humidite):
+        """Retourne la mesure filtrée, ou None si la lecture est rejetée."""
+        if self.brutes:
+            mediane = float(np.median([b[0] for b in self.brutes]))
+            if abs(temperature - mediane) > self.seuil_aberrant and self.rejets < self.max_rejets:
+                self.rejets += 1
+                self.nb_aberrantes += 1
+                return None
+        self.rejets = 0
+        self.brutes.append((temperature, humidite))
+        del self.brutes[:-self.taille_mediane]
+        tableau = np.array(self.brutes, dtype=np.float32)
+        t, h = np.median(tableau, axis=0)
+        return Mesure(time.monotonic(), round(float(t), 2), round(float(h), 1))
+
+    # --- Thread ---
+    def _boucle(self, arret):
+        intervalle = self.pilote.intervalle_min
+        attente = intervalle
+        ouvert = False
+        while not arret.is_set():
+            try:
+                if not ouvert:
+                    self.pilote.ouvrir()
+                    ouvert = True
+                temperature, humidite = self.pilote.lire()
+                self.nb_lectures += 1
+                mesure = self._filtrer(temperature, humidite)
+                if mesure is not None:
+                    self.fenetre.ajouter(mesure)
+                attente = intervalle
+            except RuntimeError:
+                # Raté classique du DHT : on réessaie, de plus en plus tard
+                self.nb_rates += 1
+                attente = min(self.attente_max, attente * 1.5)
+            except Exception as e:
+                # Capteur absent / débranché : on le rouvrira au prochain essai
+                print(f"Capteur {self.pilote} : {e!r}")
+                self.nb_rates += 1
+                if ouvert:
+                    self._fermer()
+                    ouvert = False
+                attente = min(self.attente_max, attente * 2)
+            # Jamais plus vite que intervalle_min, même après une erreur
+            arret.wait(max(attente, intervalle))
+        if ouvert:
+            self._fermer()
+
+    def _fermer(self):
+        try:
+            self.pilote.fermer()
+        except Exception:
+            pass
+
+    def demarrer(self, arret):
+        self.thread = threading.Thread(target=self._boucle, args=(arret,), daemon=True)
+        self.thread.start()
+
+    def joindre(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    # --- Lecture (sans verrou) ---
+    def derniere(self, age_max=None):
+        """Dernière mesure filtrée, None si aucune ou plus vieille que age_max (s)."""
+        mesure = self.fenetre.derniere
+        if mesure is None or (age_max is not None and time.monotonic() - mesure.t > age_max):
+            return None
+        return mesure
+
+    def etat(self):
+        mesure = self.fenetre.derniere
+        return {
+            "pilote": str(self.pilote),
+            "lectures": self.nb_lectures,
+            "rates": self.nb_rates,
+            "aberrantes": self.nb_aberrantes,
+            "age": None if mesure is None else round(time.monotonic() - mesure.t, 1),
+        }
+
+
+# ==========================================
+# PIECE (FUSION DE PLUSIEURS CAPTEURS)
+# ==========================================
+class Piece:
+
+    def __init__(self, capteurs, age_max=30.0):
+        """age_max : au-delà, la mesure d'un capteur est périmée et ignorée."""
+        self.capteurs = capteurs
+        self.age_max = age_max
+
+    def demarrer(self, arret):
+        for c in self.capteurs:
+            c.demarrer(arret)
+
+    def joindre(self, timeout=None):
+        for c in self.capteurs:
+            c.joindre(timeout)
+
+    def mesure(self):
+        """Mesure fusionnée (médiane des capteurs frais), None si tous sont périmés."""
+        fraiches = [m for m in (c.derniere(self.age_max) for c in self.capteurs) if m is not None]
+        if not fraiches:
+            return None
+        if len(fraiches) == 1:
+            return fraiches[0]
+        return Mesure(min(m.t for m in fraiches),
+                      round(float(np.median([m.temperature for m in fraiches])), 2),
+                      round(float(np.median([m.humidite for m in fraiches])), 1))
+
+    def etat(self):
+        return [c.etat() for c in self.capteurs]
+
+
+def creer_piece(specs, age_max=30.0, **options):
+    """Une pièce à partir de specs de pilotes, ex: ["dht11:D4", "dht22:D17"]."""
+    return Piece([Capteur(ouvrir_pilote(s), **options) for s in specs], age_max)
@@ -0,0 +1,151 @@
+import time
+import numpy as np
+
+from detection import creer_detecteur, detecter_lot, prechauffer
+
+# ==========================================
+# CASCADE NANO -> SMALL
+# ==========================================
+# yolov8n tourne sur chaque créneau de l'ordonnanceur ; yolov8s n'est appelé
+# que si le résultat du nano est douteux :
+# - une boîte JUSTE SOUS CONFIDENCE (dans [confidence - marge, confidence[)
+# - un comptage différent des pistes VUES au dernier passage du suivi (quelqu'un
+#   entre / sort) ; une piste qui n'est plus qu'extrapolée ne compte pas
+# Une boîte au-dessus de confidence est gardée telle quelle : elle ne change rien au
+# comptage, l'escalader ferait payer nano + small sur presque chaque image.
+# - une scène chargée (>= seuil_foule personnes : occlusions, petites silhouettes)
+# Sinon on garde les boîtes du nano, d'où ~la précision du small pour ~le coût du nano.
+# Ce n'est rentable que si le taux d'escalade reste bas (deux modèles en RAM) : le
+# mesurer avec benchmark.py --modele-rapide sur une vidéo de la salle avant d'activer
+# CASCADE dans les scripts.
+#
+# Le nano tourne avec un seuil abaissé (confidence - marge) pour VOIR les
+# boîtes limites ; seules celles >= confidence sont retournées.
+# Même interface que les autres détecteurs : detecter(image), detecter_lot(images),
+# prechauffer(forme, nb), arreter().
+# En lot, le nano passe sur toutes les images d'un coup et le small seulement sur
+# les images douteuses, elles aussi groupées.
+
+
+class DetecteurCascade:
+
+    def __init__(self, rapide, precis, confidence, marge=0.05, seuil_foule=6,
+                 compte_reference=None):
+        """
+        rapide / precis : détecteurs déjà créés (creer_detecteur)
+        marge : largeur de la bande "incertaine" sous confidence
+        compte_reference : fonction -> comptage de référence (ex. suivi.nb_vues)
+        """
+        self.rapide = rapide
+        self.precis = precis
+        self.confidence = confidence
+        self.marge = marge
+        self.seuil_foule = seuil_foule
+        self.compte_reference = compte_reference
+
+        self.nb_appels = 0
+        self.nb_escalades = 0
+        self.raisons = {"incertain": 0, "desaccord": 0, "foule": 0}
+        self.temps_rapide = 0.0
+        self.temps_precis = 0.0
+
+    def _raison_escalade(self, dets, reference=None):
+        conf = dets[:, 4]
+        surs = int((conf >= self.confidence).sum())
+        if surs >= self.seuil_foule:
+            return "foule"
+        if ((conf >= self.confidence - self.marge) & (conf < self.confidence)).any():
+            return "incertain"
+        if reference is None and self.compte_reference is not None:
+            reference = self.compte_reference()
+        if reference is not None and surs != reference:
+            return "desaccord"
+        return None
+
+    def detecter(self, image):
+        self.nb_appels += 1
+        t0 = time.perf_counter()
+        dets = self.rapide.detecter(image)
+        t1 = time.perf_counter()
+        self.temps_rapide += t1 - t0
+
+        raison = self._raison_escalade(dets)
+        if raison is None:
+            return dets[dets[:, 4] >= self.confidence]
+
+        self.nb_escalades += 1
+        self.raisons[raison] += 1
+        dets = self.precis.detecter(image)
+        self.temps_precis += time.perf_counter() - t1
+        return dets
+
+    def detecter_lot(self, images, references=None):
+        """references : comptage de référence par image (un suivi par caméra), None = compte_reference"""
+        self.nb_appels += len(images)
+        t0 = time.perf_counter()
+        resultats = detecter_lot(self.rapide, images)
+        t1 = time.perf_counter()
+        self.temps_rapide += t1 - t0
+
+        douteuses = []
+        for i, dets in enumerate(resultats):
+            raison = self._raison_escalade(dets, references[i] if references is not None else None)
+            if raison is None:
+                resultats[i] = dets[dets[:, 4] >= self.confidence]
+            else:
+                self.raisons[raison] += 1
+                douteuses.append(i)
+        if douteuses:
+            self.nb_escalades += len(douteuses)
+            precis = detecter_lot(self.precis, [images[i] for i in douteuses])
+            for i, dets in zip(douteuses, precis):
+                resultats[i] = dets
+            self.temps_precis += time.perf_counter() - t1
+        return resultats
+
+    def taux_escalade(self):
+        return self.nb_escalades / self.nb_appels if self.nb_appels else 0.0
+
+    def economie(self):
+        """Part du coût 'small sur chaque image' évitée (None tant que le small n'a pas tourné)."""
+        if not self.nb_escalades:
+            return None
+        cout_plein = self.nb_appels * self.temps_precis / self.nb_escalades
+        return 1.0 - (self.temps_rapide + self.temps_precis) / cout_plein
+
+    def etat(self):
+        economie = self.economie()
+        return {
+            "appels": self.nb_appels,
+            "escalades": self.nb_escalades,
+            "taux_escalade": round(self.taux_escalade(), 3),
+            "raisons": dict(self.raisons),
+            "economie": None if economie is None else round(economie, 3),
+        }
+
+    def prechauffer(self, forme, nb=2):
+        """Les DEUX modèles (le small serait sinon froid à la 1re escalade), hors statistiques."""
+        return prechauffer(self.rapide, forme, nb) + prechauffer(self.precis, forme, nb)
+
+    def bilan(self):
+        economie = self.economie()
+        texte = f"Cascade : small appelé sur {self.taux_escalade():.0%} des inférences {self.raisons}"
+        if economie is not None:
+            texte += f", {economie:.0%} du coût du small évité"
+        return texte
+
+    def arreter(self):
+        self.rapide.arreter()
+        self.precis.arreter()
+
+
+def creer_cascade(mode, model_rapide, model_precis, confidence, forme=(480, 640, 3),
+                  backend="auto", marge=0.05, lot=1, **options):
+    """Deux détecteurs (même mode / backend) enchaînés en cascade."""
+    rapide = creer_detecteur(mode, model_rapide, max(0.05, confidence - marge), forme, backend, lot)
+    try:
+        precis = creer_detecteur(mode, model_precis, confidence, forme, backend, lot)
+    except Exception:
+        rapide.arreter()
+        raise
+    return DetecteurCascade(rapide, precis, confidence, marge, **options)
@@ -0,0 +1,255 @@
+import os
+import json
+import shutil
+import time
+import datetime
+import threading
+from collections import deque
+import numpy as np
+import cv2
+
+# ==========================================
+# ENREGISTREUR DE CLIPS (AVANT / APRES UN EVENEMENT)
+# ==========================================
+# Comptage qui saute, changement de tranche de régulation, touche manuelle : on veut
+# revoir les secondes AVANT et APRES pour savoir si le détecteur s'est trompé.
+# - garder des images brutes en RAM est hors de question sur un Pi (900 Ko en 640x480)
+#   -> chaque image échantillonnée (fps) est réduite (largeur) puis encodée en JPEG
+#   (~15 Ko) dans un thread à part ; proposer() ne fait que déposer une référence
+# - les JPEG vivent dans UN tampon circulaire d'octets alloué au démarrage (budget) :
+#   la mémoire ne bouge plus, les plus vieilles images sont écrasées
+# - l'encodeur ne prend que la DERNIERE image déposée : s'il prend du retard, des images
+#   sont sautées (comptées), jamais accumulées -> coût CPU borné par fps
+# - declencher(raison) : le clip [t - avant, t + apres] est écrit sur disque (JPEG +
+#   evenement.json avec détections et mesures) par le même thread, une fois "apres" écoulé ;
+#   un déclenchement pendant un clip en cours s'y ajoute (un seul clip, raisons cumulées) ;
+#   declencher() ne réveille pas l'encodeur (il passe toutes les 1/fps s de toute façon) :
+#   appelable depuis un gestionnaire de signal sans prendre le moindre verrou
+# - RETENTION sur disque : après chaque clip écrit, les plus vieux dossiers de clips sont
+#   effacés au-delà de max_clips ou de disque_max octets (la carte SD ne se remplit pas)
+# - etat() / bilan() : mémoire occupée, durée couverte, coût d'encodage, images sautées
+
+
+def _boites(detections):
+    """Détections -> [[x1, y1, x2, y2, conf, id], ...] pour le JSON."""
+    if detections is None or not len(detections):
+        return []
+    return np.column_stack([detections["xyxy"], detections["conf"], detections["id"]]).round(2).tolist()
+
+
+class EnregistreurClips:
+
+    def __init__(self, dossier, budget=4 * 1024 * 1024, avant=10.0, apres=10.0, fps=5.0,
+                 largeur=320, qualite=70, rgb=True, contexte=None, mesures=None,
+                 max_clips=50, disque_max=200 * 1024 * 1024):
+        """
+        budget : octets du tampon circulaire de JPEG (alloué une fois)
+        avant / apres : secondes enregistrées avant et après un déclenchement
+        fps : images encodées par seconde au plus
+        largeur : largeur des images enregistrées (hauteur proportionnelle)
+        rgb : images reçues en RGB (True) ou déjà en BGR (False)
+        contexte : dict recopié dans evenement.json (repère des boîtes, ROI...)
+        mesures : Instrumentation (cf. mesures.py) pour chronométrer l'encodage
+        max_clips / disque_max : clips gardés dans dossier au plus (nombre, octets), les plus vieux effacés
+        """
+        self.dossier = dossier
+        self.memoire = np.empty(budget, dtype=np.uint8)
+        self.index = deque()        # (position absolue, longueur, t, detections, infos)
+        self.ecrit = 0              # Octets écrits depuis le début (position absolue)
+        self.octets = 0             # Octets des images encore dans le tampon
+        self.avant = avant
+        self.apres = apres
+        self.periode = 1.0 / fps
+        self.largeur = largeur
+        self.qualite = qualite
+        self.rgb = rgb
+        self.contexte = contexte or {}
+        self.mesures = mesures
+        self.max_clips = max_clips
+        self.disque_max = disque_max
+        self.lock = threading.Lock()  # Dépôt et index (encodeur) vs etat() (autres threads)
+        self.depot = None           # Dernière image proposée, pas encore encodée
+        self.prochaine = 0.0        # Instant de la prochaine image acceptée
+        self.evenements = deque()   # (t, raison) déposés par declencher()
+        self.en_cours = None        # [t, t_fin, raisons] du clip qui attend son "apres"
+        self.taille_jpeg = None
+        self.nb_encodees = 0
+        self.nb_sautees = 0
+        self.nb_trop_grandes = 0
+        self.duree_encodage = 0.0
+        self.max_encodage = 0.0
+        self.nb_clips = 0
+        self.nb_clips_vides = 0
+        self.nb_clips_effaces = 0
+        self.derniers_avant = None  # Secondes réellement disponibles avant le dernier clip
+        self.reveil = threading.Event()
+        self.arret = threading.Event()
+        self.thread = None
+
+    # --- Boucle capture (non bloquant) ---
+    def proposer(self, image, detections=None, infos=None, t=None):
+        """Dépose une référence à l'image (l'appelant ne doit plus la modifier). False si non retenue."""
+        t = time.time() if t is None else t
+        if t < self.prochaine:
+            return False
+        self.prochaine = max(self.prochaine + self.periode, t)
+        with self.lock:
+            if self.depot is not None:
+                self.nb_sautees += 1  # L'encodeur n'a pas suivi : la plus ancienne est perdue
+            self.depot = (image, t, detections, infos)
+        self.reveil.set()
+        return True
+
+    def declencher(self, raison, t=None):
+        """
+        Un simple append, sans Event.set() (qui prend un verrou) : appelable depuis un
+        gestionnaire de signal, même si le signal interrompt proposer() dans ce thread.
+        """
+        self.evenements.append((time.time() if t is None else t, raison))
+
+    # --- Thread d'encodage et d'écriture ---
+    def demarrer(self):
+        os.makedirs(self.dossier, exist_ok=True)
+        self._elaguer()  # Clips des lancements précédents
+        self.thread = threading.Thread(target=self._boucle, daemon=True)
+        self.thread.start()
+
+    def _boucle(self):
+        while not self.arret.is_set():
+            self.reveil.wait(self.periode)
+            self.reveil.clear()
+            with self.lock:
+                depot, self.depot = self.depot, None
+            if depot is not None:
+                self._encoder(*depot)
+            self._evenements(time.time())
+        # Arrêt : le clip en cours part avec ce qu'on a déjà
+        self._evenements(float("inf"))
+
+    def _encoder(self, image, t, detections, infos):
+        t_etape = time.perf_counter()
+        h, w = image.shape[:2]
+        if w > self.largeur:
+            image = cv2.resize(image, (self.largeur, h * self.largeur // w), interpolation=cv2.INTER_AREA)
+        if self.rgb:
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.qualite])
+        duree = time.perf_counter() - t_etape
+        if self.mesures is not None:
+            self.mesures.noter("encodage clip", t_etape)
+        self.nb_encodees += 1
+        self.duree_encodage += duree
+        self.max_encodage = max(self.max_encodage, duree)
+        self.taille_jpeg = image.shape[1::-1]
+        budget = len(self.memoire)
+        n = len(jpeg)
+        if not ok or n > budget:
+            self.nb_trop_grandes += 1
+            return
+        debut = self.ecrit
+        if debut % budget + n > budget:
+            debut += budget - debut % budget  # Une image ne chevauche jamais la fin du tampon
+        fin = debut + n
+        with self.lock:
+            # Images écrasées par celle-ci = plus vieilles que (fin - budget)
+            while self.index and self.index[0][0] < fin - budget:
+                self.octets -= self.index.popleft()[1]
+            self.ecrit = fin
+        # Seul ce thread lit et écrit les octets : pas besoin du verrou pour la copie
+        self.memoire[debut % budget:debut % budget + n] = jpeg.ravel()
+        with self.lock:
+            self.index.append((debut, n, t, detections, infos))
+            self.octets += n
+
+    def _evenements(self, maintenant):
+        while True:
+            # Déclenchements arrivés avant la fin du clip en cours : même clip
+            while self.evenements and (self.en_cours is None or self.evenements[0][0] <= self.en_cours[1]):
+                t, raison = self.evenements.popleft()
+                if self.en_cours is None:
+                    self.en_cours = [t, t + self.apres, [raison]]
+                elif raison not in self.en_cours[2]:
+                    self.en_cours[2].append(raison)
+            if self.en_cours is None or maintenant < self.en_cours[1]:
+                return
+            self._ecrire_clip(*self.en_cours)
+            self.en_cours = None
+
+    def _ecrire_clip(self, t_evenement, t_fin, raisons):
+        with self.lock:
+            images = [e for e in self.index if t_evenement - self.avant <= e[2] <= t_fin]
+        if not images:
+            self.nb_clips_vides += 1
+            return
+        nom = datetime.datetime.fromtimestamp(t_evenement).strftime("%Y-%m-%d_%H%M%S") + "_" + raisons[0]
+        dossier = os.path.join(self.dossier, nom)
+        os.makedirs(dossier, exist_ok=True)
+        budget = len(self.memoire)
+        lignes = []
+        for i, (debut, n, t, detections, infos) in enumerate(images):
+            fichier = f"{i:04d}.jpg"
+            with open(os.path.join(dossier, fichier), "wb") as f:
+                f.write(self.memoire[debut % budget:debut % budget + n].data)  # Vue, pas de copie
+            lignes.append({"fichier": fichier, "t": round(t, 3), "dt": round(t - t_evenement, 3),
+                           "detections": _boites(detections), **(infos or {})})
+        self.derniers_avant = t_evenement - images[0][2]
+        with open(os.path.join(dossier, "evenement.json"), "w") as f:
+            json.dump({"t": t_evenement, "raisons": raisons, "avant": round(self.derniers_avant, 3),
+                       "apres": round(images[-1][2] - t_evenement, 3), "taille_image": self.taille_jpeg,
+                       "contexte": self.contexte, "images": lignes}, f, indent=1, default=float)
+        self.nb_clips += 1
+        self._elaguer()
+
+    def _elaguer(self):
+        """Efface les plus vieux clips au-delà de max_clips / disque_max (thread d'encodage)."""
+        clips = []
+        for nom in os.listdir(self.dossier):
+            dossier = os.path.join(self.dossier, nom)
+            # Seulement nos dossiers (evenement.json) ; le nom commence par la date -> ordre chronologique
+            if os.path.isfile(os.path.join(dossier, "evenement.json")):
+                taille = sum(e.stat().st_size for e in os.scandir(dossier) if e.is_file())
+                clips.append((nom, dossier, taille))
+        clips.sort()
+        total = sum(taille for _, _, taille in clips)
+        while clips and (len(clips) > self.max_clips or total > self.disque_max):
+            _, dossier, taille = clips.pop(0)
+            shutil.rmtree(dossier, ignore_errors=True)
+            total -= taille
+            self.nb_clips_effaces += 1
+
+    def arreter(self, timeout=5.0):
+        self.arret.set()
+        self.reveil.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    # --- Statistiques ---
+    def etat(self):
+        with self.lock:
+            nb = len(self.index)
+            couverture = self.index[-1][2] - self.index[0][2] if nb else 0.0
+            octets = self.octets
+        return {
+            "images": nb,
+            "secondes": couverture,
+            "octets": octets,
+            "budget": len(self.memoire),
+            "encodees": self.nb_encodees,
+            "sautees": self.nb_sautees,
+            "trop_grandes": self.nb_trop_grandes,
+            "encodage_ms": 1000 * self.duree_encodage / self.nb_encodees if self.nb_encodees else None,
+            "encodage_max_ms": 1000 * self.max_encodage,
+            "clips": self.nb_clips,
+            "clips_vides": self.nb_clips_vides,
+            "clips_effaces": self.nb_clips_effaces,
+        }
+
+    def bilan(self):
+        e = self.etat()
+        texte = (f"Clips : {e['clips']} écrits ({e['clips_effaces']} anciens effacés), {e['encodees']} images encodées ({e['sautees']} sautées), "
+                 f"tampon {e['octets'] / 1e6:.1f} / {e['budget'] / 1e6:.1f} Mo = {e['secondes']:.0f} s")
+        if e["encodage_ms"] is not None:
+            texte += f", encodage {e['encodage_ms']:.1f} ms en moyenne (max {e['encodage_max_ms']:.1f} ms)"
+        if self.derniers_avant is not None and self.derniers_avant < self.avant - 2 * self.periode:
+            texte += f" ; budget trop petit : {self.derniers_avant:.0f} s avant au lieu de {self.avant:.0f}"
+        return texte
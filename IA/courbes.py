@@ -0,0 +1,163 @@
+from collections import deque
+import numpy as np
+
+# ==========================================
+# COURBES SUR CANVAS TK (SOUS-ECHANTILLONNEES)
+# ==========================================
+# Une semaine à 1 point/s = 604800 points pour ~700 pixels de large : on ne trace
+# jamais plus de ~2 points par pixel.
+# - lttb()    : Largest-Triangle-Three-Buckets, garde l'allure d'une courbe détaillée
+# - min_max() : min et max de chaque case (un trait vertical par pixel) -> aucun pic perdu
+# Courbe.tracer() dessine tout UNE fois ; ensuite Courbe.ajouter() ne crée qu'un petit
+# segment par pixel gagné et fait glisser les anciens (canvas.move) au lieu de tout effacer.
+
+
+def lttb(x, y, n):
+    """Réduit (x, y) à n points (premier et dernier gardés)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) <= n or n < 3:
+        return x, y
+    bords = np.linspace(1, len(x) - 1, n - 1).astype(np.intp)
+    gardes = np.empty(n, dtype=np.intp)
+    gardes[0], gardes[-1] = 0, len(x) - 1
+    a = 0
+    for i in range(n - 2):
+        debut, fin = bords[i], bords[i + 1]
+        # Moyenne de la case suivante = 3e sommet du triangle
+        suivant = slice(fin, bords[i + 2] if i + 2 < len(bords) else len(x))
+        cx, cy = x[suivant].mean(), y[suivant].mean()
+        aires = np.abs((x[a] - cx) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (cy - y[a]))
+        a = debut + int(np.argmax(aires))
+        gardes[i + 1] = a
+    return x[gardes], y[gardes]
+
+def min_max(x, y, nb_cases):
+    """Min puis max de chaque case -> 2 * nb_cases points au plus."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) <= 2 * nb_cases:
+        return x, y
+    debuts = np.linspace(0, len(x), nb_cases, endpoint=False).astype(np.intp)
+    mini = np.minimum.reduceat(y, debuts)
+    maxi = np.maximum.reduceat(y, debuts)
+    milieux = x[np.minimum(debuts + np.diff(np.append(debuts, len(x))) // 2, len(x) - 1)]
+    return np.repeat(milieux, 2), np.column_stack([mini, maxi]).ravel()
+
+
+class Courbe:
+
+    def __init__(self, canvas, largeur, hauteur, duree, couleur, marge=4, epaisseur=1,
+                 methode="lttb"):
+        """
+        duree : fenêtre affichée (s), le bord droit suit le dernier point
+        methode : "lttb" ou "min_max" pour tracer()
+        """
+        self.canvas = canvas
+        self.largeur = largeur
+        self.hauteur = hauteur
+        self.duree = duree
+        self.couleur = couleur
+        self.marge = marge
+        self.epaisseur = epaisseur
+        self.methode = methode
+        self.tag = f"courbe{id(self)}"
+        self.px_par_s = (largeur - 2 * marge) / duree
+        self.points = deque()       # (t, y) DESSINES (min/max par colonne de pixels), pour les retracés
+        self.en_attente = []        # Points bruts pas encore dessinés (< 1 pixel de temps)
+        self.t_droite = None        # Instant au bord droit
+        self.dernier_px = None      # Dernier point dessiné (x, y) en pixels
+        self.y_min = self.y_max = None
+        self.nb_traces = 0
+
+    # --- Conversions ---
+    def _x(self, t):
+        return self.largeur - self.marge - (self.t_droite - t) * self.px_par_s
+
+    def _y(self, v):
+        h = self.hauteur - 2 * self.marge
+        return self.hauteur - self.marge - (v - self.y_min) / (self.y_max - self.y_min) * h
+
+    def _echelle(self, y):
+        bas, haut = float(np.nanmin(y)), float(np.nanmax(y))
+        ecart = max(haut - bas, 1.0)
+        # 10 % de marge : un petit dépassement ne force pas un retracé complet
+        self.y_min, self.y_max = bas - 0.1 * ecart, haut + 0.1 * ecart
+
+    # --- Tracé complet ---
+    def tracer(self, t, y):
+        """Remplace tout le contenu (historique chargé, changement d'échelle)."""
+        t = np.asarray(t, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        garde = ~np.isnan(y)
+        t, y = t[garde], y[garde]
+        self.canvas.delete(self.tag)
+        self.en_attente = []
+        self.nb_traces += 1
+        if len(t) == 0:
+            self.points = deque()
+            self.t_droite = self.dernier_px = None
+            return
+        self.t_droite = float(t[-1])
+        debut = np.searchsorted(t, self.t_droite - self.duree)
+        t, y = t[debut:], y[debut:]
+        self._echelle(y)
+        n = self.largeur - 2 * self.marge
+        if self.methode == "min_max":
+            t, y = min_max(t, y, n)
+        else:
+            t, y = lttb(t, y, 2 * n)
+        # On ne garde que les points tracés : la mémoire ne dépend pas de la durée affichée
+        self.points = deque(zip(t.tolist(), y.tolist()))
+        xs = self._x(t)
+        ys = self._y(y)
+        if len(xs) == 1:
+            xs, ys = np.append(xs, xs), np.append(ys, ys)
+        coords = np.column_stack([xs, ys]).ravel().tolist()
+        self.canvas.create_line(*coords, fill=self.couleur, width=self.epaisseur, tags=self.tag)
+        self.dernier_px = (coords[-2], coords[-1])
+
+    # --- Ajout incrémental ---
+    def ajouter(self, t, v):
+        """Nouveau point en direct : au plus un petit segment par pixel gagné."""
+        if v is None or np.isnan(v):
+            return
+        if self.t_droite is None or not (self.y_min <= v <= self.y_max):
+            # Premier point ou hors échelle : retracé complet (rare)
+            self.points.extend(self.en_attente)
+            self.points.append((t, v))
+            self._oublier(t)
+            self.tracer(*zip(*self.points))
+            return
+        self.en_attente.append((t, v))
+        decalage = (t - self.t_droite) * self.px_par_s
+        if decalage < 1.0:
+            return
+        # Glissement des segments existants puis un seul nouveau segment
+        self.canvas.move(self.tag, -decalage, 0)
+        self.dernier_px = (self.dernier_px[0] - decalage, self.dernier_px[1])
+        self.t_droite = t
+        ts, vs = zip(*self.en_attente)
+        if len(ts) > 2:
+            ts, vs = min_max(ts, vs, 1)
+        # Seuls le min et le max de la colonne restent en mémoire : ~2 points par pixel
+        self.points.extend(zip(ts, vs))
+        self._oublier(t)
+        coords = list(self.dernier_px)
+        for ti, vi in zip(ts, vs):
+            coords += [float(self._x(ti)), float(self._y(vi))]
+        self.canvas.create_line(*coords, fill=self.couleur, width=self.epaisseur, tags=self.tag)
+        self.dernier_px = (coords[-2], coords[-1])
+        self.en_attente = []
+        self._nettoyer()
+
+    def _oublier(self, t):
+        while self.points and self.points[0][0] < t - self.duree:
+            self.points.popleft()
+
+    def _nettoyer(self):
+        """Supprime les segments sortis par la gauche."""
+        for item in self.canvas.find_withtag(self.tag):
+            x1, _, x2, _ = self.canvas.bbox(item)
+            if x2 < 0:
+                self.canvas.delete(item)
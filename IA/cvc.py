@@ -0,0 +1,478 @@
+import sys
+import json
+import time
+import random
+import struct
+import asyncio
+import threading
+from collections import deque, namedtuple
+
+# ==========================================
+# LIEN CVC (COMMANDES VERS LE CHAUFFAGE / LA CLIM)
+# ==========================================
+# La boucle capture appelle envoyer(consigne, ventilation, action) à CHAQUE image :
+# - envoyer() ne fait que remplacer la commande en attente (verrou + réveil) : jamais d'E/S
+# - DOUBLONS supprimés : une commande identique à celle déjà appliquée (ou déjà en attente)
+#   ne repart pas
+# - FUSION : si plusieurs commandes arrivent avant l'écriture, seule la dernière part
+# - DEBIT limité : au plus une écriture toutes les intervalle_min secondes
+# - délai max par écriture, puis nouvel essai avec attente croissante (reconnexion)
+# Le tout tourne dans une boucle asyncio sur son propre thread.
+# Pour l'écran et l'agrégateur : fonctionne() (le contrôleur a accepté la dernière
+# écriture) et puissance_estimee() (kW d'après la dernière commande APPLIQUEE).
+#
+# Transports (même interface : connecter / ecrire / fermer, tous asynchrones) :
+#   "tcp:hote:port"              -> une ligne JSON par commande, réponse "OK" (style MQTT)
+#   "modbus:hote:port[:unite]"   -> Modbus TCP, écriture de 3 registres (fonction 0x10)
+#   "serie:/dev/ttyUSB0[:9600]"  -> lignes JSON sur port série (pyserial)
+#   "simule" / "simule:modbus"   -> contrôleur simulé lancé dans le même processus
+
+Commande = namedtuple("Commande", ["consigne", "ventilation", "action"])
+
+# Registres Modbus : consigne en dixièmes de °C, ventilation en %, code d'action
+REGISTRE_CONSIGNE = 0
+VITESSES = {"OFF": 0, "MIN": 10, "ECO": 20, "BAS": 40, "MOYEN": 60, "FORT": 80, "MAX": 100}
+CODES_ACTION = {"STANDBY": 0, "CHAUFFE": 1, "CHAUFFAGE": 1, "CLIM ON": 2, "CLIM_FROID": 2,
+                "STOP (MAX)": 3, "ZONE CONFORT": 4, "VENTILATION": 5}
+EN_MARCHE = {"CHAUFFE", "CHAUFFAGE", "CLIM ON", "CLIM_FROID"}  # Compresseur / résistance allumés
+
+
+class ErreurCVC(Exception):
+    """Réponse refusée ou illisible du contrôleur."""
+
+
+def vitesse(ventilation):
+    """'MOYEN' -> 60, 45 -> 45 (pourcentage du ventilateur)."""
+    if isinstance(ventilation, str):
+        return VITESSES.get(ventilation.upper(), 0)
+    return int(ventilation)
+
+def registres(commande):
+    consigne = int(round(commande.consigne * 10)) & 0xFFFF
+    return consigne, vitesse(commande.ventilation), CODES_ACTION.get(commande.action, 0xFFFF)
+
+
+# ==========================================
+# TRANSPORTS
+# ==========================================
+class TransportTCP:
+    """Une ligne JSON par commande, le contrôleur répond OK (ou ERREUR ...)."""
+
+    def __init__(self, hote, port):
+        self.hote = hote
+        self.port = port
+        self.lecteur = self.ecrivain = None
+
+    async def connecter(self):
+        self.lecteur, self.ecrivain = await asyncio.open_connection(self.hote, self.port)
+
+    async def ecrire(self, commande):
+        self.ecrivain.write(json.dumps(commande._asdict()).encode() + b"\n")
+        await self.ecrivain.drain()
+        reponse = await self.lecteur.readline()
+        if not reponse:
+            raise ConnectionError("Contrôleur déconnecté")
+        if reponse.strip() != b"OK":
+            raise ErreurCVC(reponse.decode(errors="replace").strip())
+
+    async def fermer(self):
+        if self.ecrivain is not None:
+            self.ecrivain.close()
+            self.ecrivain = None
+
+    def __str__(self):
+        return f"tcp:{self.hote}:{self.port}"
+
+
+class TransportModbus:
+    """Modbus TCP minimal : Write Multiple Registers (0x10), sans dépendance."""
+
+    def __init__(self, hote, port=502, unite=1):
+        self.hote = hote
+        self.port = port
+        self.unite = unite
+        self.transaction = 0
+        self.lecteur = self.ecrivain = None
+
+    async def connecter(self):
+        self.lecteur, self.ecrivain = await asyncio.open_connection(self.hote, self.port)
+
+    async def ecrire(self, commande):
+        valeurs = registres(commande)
+        self.transaction = (self.transaction + 1) & 0xFFFF
+        pdu = struct.pack(f">BHHB{len(valeurs)}H", 0x10, REGISTRE_CONSIGNE, len(valeurs),
+                          2 * len(valeurs), *valeurs)
+        self.ecrivain.write(struct.pack(">HHHB", self.transaction, 0, len(pdu) + 1, self.unite) + pdu)
+        await self.ecrivain.drain()
+        transaction, _, longueur, _ = struct.unpack(">HHHB", await self.lecteur.readexactly(7))
+        reponse = await self.lecteur.readexactly(longueur - 1)
+        if transaction != self.transaction:
+            raise ErreurCVC(f"Transaction {transaction} inattendue")
+        if reponse[0] & 0x80:
+            raise ErreurCVC(f"Exception Modbus {reponse[1]}")
+
+    async def fermer(self):
+        if self.ecrivain is not None:
+            self.ecrivain.close()
+            self.ecrivain = None
+
+    def __str__(self):
+        return f"modbus:{self.hote}:{self.port}:{self.unite}"
+
+
+class TransportSerie:
+    """Lignes JSON sur port série ; pyserial est bloquant -> exécuté hors de la boucle."""
+
+    def __init__(self, port, vitesse=9600, timeout=1.0):
+        self.port = port
+        self.vitesse = vitesse
+        self.timeout = timeout
+        self.serie = None
+
+    async def connecter(self):
+        import serial
+        boucle = asyncio.get_running_loop()
+        self.serie = await boucle.run_in_executor(
+            None, lambda: serial.Serial(self.port, self.vitesse, timeout=self.timeout))
+
+    def _echanger(self, ligne):
+        self.serie.write(ligne)
+        return self.serie.readline()
+
+    async def ecrire(self, commande):
+        ligne = json.dumps(commande._asdict()).encode() + b"\n"
+        reponse = await asyncio.get_running_loop().run_in_executor(None, self._echanger, ligne)
+        if reponse.strip() != b"OK":
+            raise ErreurCVC(reponse.decode(errors="replace").strip() or "Pas de réponse")
+
+    async def fermer(self):
+        if self.serie is not None:
+            self.serie.close()
+            self.serie = None
+
+    def __str__(self):
+        return f"serie:{self.port}"
+
+
+class TransportSimule:
+    """Contrôleur simulé démarré dans la boucle du lien, puis transport TCP ou Modbus."""
+
+    def __init__(self, protocole="tcp", **options):
+        self.controleur = ControleurSimule(protocole, **options)
+        self.transport = None
+
+    async def connecter(self):
+        if self.controleur.serveur is None:
+            port = await self.controleur.demarrer()
+            if self.controleur.protocole == "modbus":
+                self.transport = TransportModbus("127.0.0.1", port)
+            else:
+                self.transport = TransportTCP("127.0.0.1", port)
+        await self.transport.connecter()
+
+    async def ecrire(self, commande):
+        await self.transport.ecrire(commande)
+
+    async def fermer(self):
+        if self.transport is not None:
+            await self.transport.fermer()
+
+    async def arreter(self):
+        await self.controleur.arreter()
+
+    def __str__(self):
+        return f"simule:{self.controleur.protocole}"
+
+
+def ouvrir_transport(spec):
+    """'tcp:hote:port', 'modbus:hote[:port[:unite]]', 'serie:/dev/ttyUSB0[:9600]', 'simule[:modbus]'"""
+    nom, _, reste = spec.partition(":")
+    args = reste.split(":") if reste else []
+    nom = nom.lower()
+    if nom == "tcp":
+        return TransportTCP(args[0], int(args[1]))
+    if nom == "modbus":
+        return TransportModbus(args[0], *(int(a) for a in args[1:]))
+    if nom == "serie":
+        return TransportSerie(args[0], *(int(a) for a in args[1:]))
+    if nom == "simule":
+        return TransportSimule(args[0] if args else "tcp")
+    raise ValueError(f"Transport CVC inconnu : {spec}")
+
+
+# ==========================================
+# LIEN (THREAD ASYNCIO)
+# ==========================================
+class LienCVC:
+
+    def __init__(self, transport, intervalle_min=1.0, timeout=2.0, attente_max=30.0):
+        """
+        intervalle_min : écart minimal entre deux écritures (s)
+        timeout : délai max d'une connexion ou d'une écriture (s)
+        attente_max : attente maximale entre deux essais quand le contrôleur ne répond plus
+        """
+        self.transport = transport
+        self.intervalle_min = intervalle_min
+        self.timeout = timeout
+        self.attente_max = attente_max
+        self.attente = None         # Commande à écrire (la plus récente)
+        self.t_demande = 0.0
+        self.appliquee = None       # Dernière commande confirmée par le contrôleur
+        self.en_panne = False       # Dernière connexion / écriture refusée ou sans réponse
+        self.lock = threading.Lock()
+        self.arret = threading.Event()
+        self.boucle = None
+        self.reveil = None
+        self.thread = None
+
+        self.nb_demandes = 0
+        self.nb_redondantes = 0     # Identiques à la commande appliquée / en attente
+        self.nb_fusionnees = 0      # Remplacées par une plus récente avant l'écriture
+        self.nb_ecritures = 0
+        self.nb_echecs = 0
+        self.latences = deque(maxlen=200)
+
+    # --- Côté boucle capture (jamais bloquant) ---
+    def envoyer(self, consigne, ventilation, action):
+        commande = Commande(round(float(consigne), 1), ventilation, action)
+        with self.lock:
+            self.nb_demandes += 1
+            reference = self.attente if self.attente is not None else self.appliquee
+            if commande == reference:
+                self.nb_redondantes += 1
+                return
+            if self.attente is not None:
+                self.nb_fusionnees += 1
+            self.attente = commande
+            self.t_demande = time.monotonic()
+        self._reveiller()
+
+    def _reveiller(self):
+        boucle = self.boucle
+        if boucle is not None and self.reveil is not None:
+            try:
+                boucle.call_soon_threadsafe(self.reveil.set)
+            except RuntimeError:
+                pass  # Boucle déjà fermée (arrêt)
+
+    # --- Thread asyncio ---
+    def demarrer(self):
+        self.thread = threading.Thread(target=self._executer, daemon=True)
+        self.thread.start()
+
+    def _executer(self):
+        self.boucle = asyncio.new_event_loop()
+        try:
+            self.boucle.run_until_complete(self._principal())
+        finally:
+            self.boucle.close()
+
+    async def _principal(self):
+        self.reveil = asyncio.Event()
+        connecte = False
+        attente = self.intervalle_min
+        prochaine = 0.0
+        try:
+            while not self.arret.is_set():
+                with self.lock:
+                    commande, t_demande = self.attente, self.t_demande
+                delai = prochaine - time.monotonic()
+                if commande is None or delai > 0:
+                    # Rien à écrire, ou limite de débit : les demandes s'accumulent (fusion)
+                    try:
+                        await asyncio.wait_for(self.reveil.wait(), delai if delai > 0 else 0.5)
+                    except asyncio.TimeoutError:
+                        pass
+                    self.reveil.clear()
+                    continue
+                try:
+                    if not connecte:
+                        await asyncio.wait_for(self.transport.connecter(), self.timeout)
+                        connecte = True
+                    await asyncio.wait_for(self.transport.ecrire(commande), self.timeout)
+                except (OSError, EOFError, asyncio.TimeoutError, ErreurCVC) as e:
+                    if not self.nb_echecs or attente == self.intervalle_min:
+                        print(f"Lien CVC {self.transport} : {e!r}")
+                    self.nb_echecs += 1
+                    self.en_panne = True
+                    if connecte:
+                        await self._fermer()
+                        connecte = False
+                    # La commande reste en attente : renvoyée (ou remplacée) au prochain essai
+                    attente = min(self.attente_max, attente * 2)
+                    prochaine = time.monotonic() + attente
+                    continue
+                fin = time.monotonic()
+                with self.lock:
+                    self.appliquee = commande
+                    if self.attente == commande:
+                        self.attente = None
+                self.nb_ecritures += 1
+                self.en_panne = False
+                self.latences.append(fin - t_demande)
+                attente = self.intervalle_min
+                prochaine = fin + self.intervalle_min
+        finally:
+            if connecte:
+                await self._fermer()
+            arreter = getattr(self.transport, "arreter", None)
+            if arreter is not None:
+                await arreter()  # Contrôleur simulé
+
+    async def _fermer(self):
+        try:
+            await self.transport.fermer()
+        except Exception:
+            pass
+
+    def arreter(self, timeout=3.0):
+        self.arret.set()
+        self._reveiller()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    # --- Etat du CVC (écran, agrégateur) ---
+    def fonctionne(self):
+        """False tant que le contrôleur ne répond plus (la commande attend d'être renvoyée)."""
+        return not self.en_panne
+
+    def puissance_estimee(self, puissance_marche, puissance_ventilation):
+        """
+        kW tirés d'après la dernière commande appliquée (None avant la 1re écriture) :
+        puissance_marche en chauffe / clim, sinon le ventilateur seul, au prorata de sa vitesse.
+        """
+        commande = self.appliquee
+        if commande is None:
+            return None
+        ventilation = vitesse(commande.ventilation) / 100
+        if commande.action in EN_MARCHE:
+            return puissance_marche * (0.7 + 0.3 * ventilation)
+        return puissance_ventilation * ventilation
+
+    # --- Bilan ---
+    def etat(self):
+        latences = sorted(self.latences)
+        return {
+            "transport": str(self.transport),
+            "demandes": self.nb_demandes,
+            "ecritures": self.nb_ecritures,
+            "redondantes": self.nb_redondantes,
+            "fusionnees": self.nb_fusionnees,
+            "echecs": self.nb_echecs,
+            "latence_ms": None if not latences else round(1000 * latences[len(latences) // 2], 1),
+            "latence_max_ms": None if not latences else round(1000 * latences[-1], 1),
+            "appliquee": self.appliquee,
+        }
+
+    def bilan(self):
+        e = self.etat()
+        evitees = e["redondantes"] + e["fusionnees"]
+        texte = (f"Lien CVC {e['transport']} : {e['ecritures']} écritures pour {e['demandes']} demandes "
+                 f"({evitees} évitées dont {e['redondantes']} doublons), {e['echecs']} échecs")
+        if e["latence_ms"] is not None:
+            texte += f", latence médiane {e['latence_ms']} ms (max {e['latence_max_ms']} ms)"
+        return texte
+
+
+# ==========================================
+# CONTROLEUR SIMULE (TEST SANS CVC)
+# ==========================================
+class ControleurSimule:
+    """Serveur asyncio local : applique les commandes, avec latence et pannes réglables."""
+
+    def __init__(self, protocole="tcp", port=0, latence=0.02, taux_pannes=0.0, graine=None):
+        """taux_pannes : fraction des commandes restées sans réponse (le lien doit réessayer)"""
+        self.protocole = protocole
+        self.port = port
+        self.latence = latence
+        self.taux_pannes = taux_pannes
+        self.rng = random.Random(graine)
+        self.serveur = None
+        self.clients = set()
+        self.commande = None
+        self.nb_ecritures = 0
+
+    async def demarrer(self):
+        client = self._client_modbus if self.protocole == "modbus" else self._client_ligne
+        self.serveur = await asyncio.start_server(client, "127.0.0.1", self.port)
+        return self.serveur.sockets[0].getsockname()[1]
+
+    async def arreter(self):
+        if self.serveur is None:
+            return
+        self.serveur.close()
+        for ecrivain in list(self.clients):
+            ecrivain.close()
+        await self.serveur.wait_closed()
+        await asyncio.sleep(0)  # Les clients voient la fin de flux et se terminent
+
+    def _appliquer(self, commande):
+        self.commande = commande
+        self.nb_ecritures += 1
+
+    async def _client_ligne(self, lecteur, ecrivain):
+        self.clients.add(ecrivain)
+        try:
+            while True:
+                ligne = await lecteur.readline()
+                if not ligne:
+                    break
+                await asyncio.sleep(self.latence)
+                if self.rng.random() < self.taux_pannes:
+                    continue
+                try:
+                    self._appliquer(Commande(**json.loads(ligne)))
+                    ecrivain.write(b"OK\n")
+                except (ValueError, TypeError) as e:
+                    ecrivain.write(f"ERREUR {e}\n".encode())
+                await ecrivain.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(ecrivain)
+            ecrivain.close()
+
+    async def _client_modbus(self, lecteur, ecrivain):
+        self.clients.add(ecrivain)
+        try:
+            while True:
+                transaction, protocole, longueur, unite = struct.unpack(">HHHB", await lecteur.readexactly(7))
+                pdu = await lecteur.readexactly(longueur - 1)
+                await asyncio.sleep(self.latence)
+                if self.rng.random() < self.taux_pannes:
+                    continue
+                fonction, adresse, nb, _ = struct.unpack_from(">BHHB", pdu)
+                if fonction != 0x10:
+                    reponse = struct.pack(">BB", fonction | 0x80, 1)  # Fonction non supportée
+                else:
+                    valeurs = struct.unpack_from(f">{nb}H", pdu, 6)
+                    consigne = struct.unpack(">h", struct.pack(">H", valeurs[0]))[0] / 10
+                    self._appliquer(Commande(consigne, valeurs[1], valeurs[2]))
+                    reponse = struct.pack(">BHH", fonction, adresse, nb)
+                ecrivain.write(struct.pack(">HHHB", transaction, protocole, len(reponse) + 1, unite) + reponse)
+                await ecrivain.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(ecrivain)
+            ecrivain.close()
+
+
+if __name__ == "__main__":
+    # Contrôleur simulé autonome : python cvc.py [port] [tcp|modbus]
+    async def servir(port, protocole):
+        controleur = ControleurSimule(protocole, port)
+        port = await controleur.demarrer()
+        print(f"Contrôleur CVC simulé ({protocole}) sur 127.0.0.1:{port} (Ctrl+C pour arrêter)")
+        derniere = None
+        while True:
+            await asyncio.sleep(1)
+            if controleur.commande != derniere:
+                derniere = controleur.commande
+                print(f"[CVC] {derniere} ({controleur.nb_ecritures} écritures)")
+
+    try:
+        asyncio.run(servir(int(sys.argv[1]) if len(sys.argv) > 1 else 5020,
+                           sys.argv[2] if len(sys.argv) > 2 else "tcp"))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,607 @@
+import os
+import json
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+# ==========================================
+# DETECTEURS (THREAD OU PROCESSUS SEPARE)
+# ==========================================
+# Tous les détecteurs ont la même interface :
+#   detecter(image) -> tableau (n, 6) float32 : x1, y1, x2, y2, confiance, classe
+#   arreter()
+# et, quand le backend sait grouper plusieurs images en une inférence :
+#   detecter_lot(images) -> liste de tableaux (n, 6), un par image
+# (la fonction detecter_lot(detecteur, images) retombe sur une boucle sinon).
+#
+# BACKENDS CPU interchangeables :
+#   "pytorch"  : ultralytics + fichier .pt (le plus lent, ~200ms sur le Pi)
+#   "onnx"     : ONNX Runtime sur le graphe exporté (personnes seules, INT8 possible)
+#   "openvino" : OpenVINO sur le même graphe (IR FP32 ou INT8)
+#   "ncnn"     : NCNN via ultralytics (souvent le plus rapide sur ARM)
+#   "auto"     : on mesure les backends disponibles et on garde le plus rapide
+# Les modèles optimisés se fabriquent avec exporter_modele.py (lot libre : fichiers
+# "_personnes_lot", pris en premier quand lot > 1). Le choix de "auto" est
+# gardé dans modeles/choix_backend.json (refait seulement si un artefact change) :
+# au démarrage on charge UN modèle déjà exporté au lieu de les essayer tous.
+# prechauffer(detecteur, forme) : premières inférences sur une image neutre, à lancer
+# pendant que la caméra démarre (la 1re vraie image ne paie plus allocations et caches).
+#
+# MODE "processus" : le modèle YOLO tourne dans un autre processus -> plus de GIL partagé
+# avec la boucle capture/dessin/imshow.
+# - Les images passent par des slots multiprocessing.shared_memory
+#   (aucun pickle du tableau, juste un memcpy).
+# - Les détections reviennent dans un petit tableau partagé par slot
+#   (MAX_BOITES x 6 float32 : x1, y1, x2, y2, confiance, classe).
+# - Le Pipe ne transporte que des entiers (slot, nb de boîtes), ou des listes
+#   d'entiers pour un lot d'images.
+
+MAX_BOITES = 100
+CHAMPS_BOITE = 6
+
+# Détections publiées : tableau structuré NumPy en LECTURE SEULE.
+# Le worker en crée un nouveau à chaque inférence et remplace la référence :
+# les lecteurs (dessin, régulation) le prennent tel quel, sans list() ni copie.
+DTYPE_DETECTION = np.dtype([
+    ("xyxy", np.float32, (4,)),
+    ("conf", np.float32),
+    ("cls", np.int16),
+    ("id", np.int32),      # Identifiant de piste (-1 sans suivi)
+])
+SEUIL_NMS = 0.45
+
+DOSSIER_MODELES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modeles")
+FICHIER_CHOIX = os.path.join(DOSSIER_MODELES, "choix_backend.json")
+BACKENDS = ("ncnn", "openvino", "onnx", "pytorch")  # Du plus rapide (en général) au plus lent
+
+
+def tableau_detections(brut, ids=None):
+    """(n, 6) float32 x1, y1, x2, y2, conf, classe -> tableau structuré figé (1 transfert par champ)."""
+    dets = np.empty(len(brut), dtype=DTYPE_DETECTION)
+    dets["xyxy"] = brut[:, :4]
+    dets["conf"] = brut[:, 4]
+    dets["cls"] = brut[:, 5]
+    dets["id"] = -1 if ids is None else ids
+    dets.flags.writeable = False
+    return dets
+
+def boites_entieres(dets):
+    """Coordonnées entières (n, 4) pour cv2.rectangle."""
+    return dets["xyxy"].astype(np.int32)
+
+AUCUNE_DETECTION = tableau_detections(np.zeros((0, CHAMPS_BOITE), dtype=np.float32))
+
+def detecter_lot(detecteur, images):
+    """Une inférence groupée si le détecteur sait le faire, sinon une image après l'autre."""
+    if hasattr(detecteur, "detecter_lot"):
+        return detecteur.detecter_lot(images)
+    return [detecteur.detecter(image) for image in images]
+
+def prechauffer(detecteur, forme, nb=2):
+    """nb inférences sur une image neutre ; retourne la durée de la dernière (s)."""
+    if hasattr(detecteur, "prechauffer"):
+        return detecteur.prechauffer(forme, nb)
+    image = np.zeros(forme, dtype=np.uint8)
+    for _ in range(nb):
+        t0 = time.perf_counter()
+        detecteur.detecter(image)
+    return time.perf_counter() - t0
+
+
+# ==========================================
+# ARTEFACTS EXPORTES
+# ==========================================
+def nom_base(model_type):
+    """'yolov8s.pt' -> 'yolov8s'"""
+    return os.path.splitext(os.path.basename(model_type))[0]
+
+def chemins_artefact(model_type, backend, lot=1):
+    """
+    Chemins candidats pour un backend, la version INT8 en premier.
+    lot > 1 : le graphe à lot libre (exporter_modele.py --dynamique) passe avant le lot fixe.
+    """
+    base = os.path.join(DOSSIER_MODELES, nom_base(model_type))
+    variantes = ["_personnes_lot", "_personnes"] if lot > 1 else ["_personnes"]
+    if backend == "onnx":
+        return [base + v + suffixe for v in variantes for suffixe in ("_int8.onnx", ".onnx")]
+    if backend == "openvino":
+        return [os.path.join(base + v + suffixe, nom_base(model_type) + ".xml")
+                for v in variantes for suffixe in ("_int8_openvino", "_openvino")]
+    if backend == "ncnn":
+        return [base + "_ncnn_model"]
+    return [model_type]
+
+def trouver_artefact(model_type, backend, lot=1):
+    if backend == "pytorch":
+        return model_type
+    for chemin in chemins_artefact(model_type, backend, lot):
+        if os.path.exists(chemin):
+            return chemin
+    return None
+
+def _module_present(nom):
+    try:
+        __import__(nom)
+        return True
+    except ImportError:
+        return False
+
+def backends_disponibles(model_type):
+    """Backends dont l'artefact existe ET dont la librairie est installée."""
+    libs = {"onnx": "onnxruntime", "openvino": "openvino", "ncnn": "ncnn", "pytorch": "ultralytics"}
+    return [b for b in BACKENDS
+            if trouver_artefact(model_type, b) is not None and _module_present(libs[b])]
+
+
+# ==========================================
+# PRE / POST-TRAITEMENT (ONNX & OPENVINO)
+# ==========================================
+class _Letterbox:
+    """Redimensionne + centre l'image dans le carré d'entrée (comme ultralytics)."""
+
+    def __init__(self, taille, entree=None):
+        """entree : vue (1, 3, taille, taille) d'un tampon de lot, None = tampon propre"""
+        self.taille = taille
+        if entree is None:
+            entree = np.full((1, 3, taille, taille), 114 / 255.0, dtype=np.float32)
+        self.entree = entree
+        self.ratio = 1.0
+        self.pad = (0, 0)
+
+    def __call__(self, image):
+        import cv2
+        h, w = image.shape[:2]
+        r = min(self.taille / h, self.taille / w)
+        nw, nh = int(round(w * r)), int(round(h * r))
+        px, py = (self.taille - nw) // 2, (self.taille - nh) // 2
+        if (r, (px, py)) != (self.ratio, self.pad):
+            self.entree.fill(114 / 255.0)
+        self.ratio, self.pad = r, (px, py)
+        img = image if (nw, nh) == (w, h) else cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        # BGR HWC uint8 -> RGB CHW float32, écrit directement dans le tampon d'entrée
+        np.multiply(img[..., ::-1].transpose(2, 0, 1), 1 / 255.0,
+                    out=self.entree[0, :, py:py + nh, px:px + nw], casting="unsafe")
+        return self.entree
+
+    def vers_image(self, boites):
+        boites[:, [0, 2]] -= self.pad[0]
+        boites[:, [1, 3]] -= self.pad[1]
+        boites[:, :4] /= self.ratio
+        return boites
+
+class _LetterboxLot:
+    """Un _Letterbox par position du lot, tous écrits dans le même tampon (lot, 3, T, T)."""
+
+    def __init__(self, taille):
+        self.taille = taille
+        self.entree = np.zeros((0, 3, taille, taille), dtype=np.float32)
+        self.letterboxes = []
+
+    def __call__(self, images):
+        n = len(images)
+        if n > len(self.entree):
+            # Agrandi une fois pour toutes au plus grand lot vu
+            self.entree = np.full((n, 3, self.taille, self.taille), 114 / 255.0, dtype=np.float32)
+            self.letterboxes = [_Letterbox(self.taille, self.entree[i:i + 1]) for i in range(n)]
+        for letterbox, image in zip(self.letterboxes, images):
+            letterbox(image)
+        return self.entree[:n]
+
+def _taille_fixe(dim, chemin):
+    """Côté (H = W) de l'entrée : doit être fixé à l'export, seul le lot peut être libre."""
+    if not isinstance(dim, int):
+        raise ValueError(f"{chemin} : taille d'entrée non fixée ({dim}), ré-exporter avec "
+                         f"exporter_modele.py (--imgsz)")
+    return dim
+
+def _decoder_personnes(sortie, confidence, letterbox, index=0):
+    """
+    Sortie YOLOv8 (lot, 4 + nb_classes, N). On ne lit QUE la ligne "personne" (classe 0) :
+    le graphe exporté par exporter_modele.py ne contient d'ailleurs que ces 5 lignes.
+    index : image du lot à décoder
+    """
+    pred = sortie[index]
+    scores = pred[4]
+    garde = scores >= confidence
+    if not garde.any():
+        return np.zeros((0, CHAMPS_BOITE), dtype=np.float32)
+    cx, cy, w, h = pred[0, garde], pred[1, garde], pred[2, garde], pred[3, garde]
+    dets = np.empty((len(cx), CHAMPS_BOITE), dtype=np.float32)
+    dets[:, 0] = cx - w / 2
+    dets[:, 1] = cy - h / 2
+    dets[:, 2] = cx + w / 2
+    dets[:, 3] = cy + h / 2
+    dets[:, 4] = scores[garde]
+    dets[:, 5] = 0
+    dets = dets[_nms(dets, SEUIL_NMS)][:MAX_BOITES]
+    return letterbox.vers_image(dets)
+
+def _nms(dets, seuil):
+    """NMS glouton NumPy, retourne les indices gardés (par confiance décroissante)."""
+    x1, y1, x2, y2, s = dets[:, 0], dets[:, 1], dets[:, 2], dets[:, 3], dets[:, 4]
+    aires = (x2 - x1) * (y2 - y1)
+    ordre = s.argsort()[::-1]
+    garde = []
+    while ordre.size:
+        i = ordre[0]
+        garde.append(i)
+        xx1 = np.maximum(x1[i], x1[ordre[1:]])
+        yy1 = np.maximum(y1[i], y1[ordre[1:]])
+        xx2 = np.minimum(x2[i], x2[ordre[1:]])
+        yy2 = np.minimum(y2[i], y2[ordre[1:]])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (aires[i] + aires[ordre[1:]] - inter + 1e-9)
+        ordre = ordre[1:][iou < seuil]
+    return np.array(garde, dtype=np.intp)
+
+
+# ==========================================
+# BACKENDS
+# ==========================================
+def _remplir_sortie(results, sortie):
+    """Copie les boîtes ultralytics dans `sortie` en bloc, retourne leur nombre."""
+    n = 0
+    for r in results:
+        boites = r.boxes
+        k = min(len(boites), len(sortie) - n)
+        if k <= 0:
+            continue
+        sortie[n:n + k, 0:4] = boites.xyxy[:k].cpu().numpy()
+        sortie[n:n + k, 4] = boites.conf[:k].cpu().numpy()
+        sortie[n:n + k, 5] = boites.cls[:k].cpu().numpy()
+        n += k
+    return n
+
+
+class DetecteurLocal:
+    """Modèle chargé par ultralytics dans le thread appelant (.pt ou dossier NCNN)."""
+
+    def __init__(self, model_type, confidence):
+        from ultralytics import YOLO
+        self.model = YOLO(model_type, task="detect")
+        self.confidence = confidence
+        self.sortie = np.zeros((MAX_BOITES, CHAMPS_BOITE), dtype=np.float32)
+        # .pt : taille d'entrée libre -> on suit l'image (multiple de 32) au lieu de
+        # l'agrandir à 640. Les modèles exportés (NCNN) gardent leur taille fixe.
+        self.libre = model_type.endswith(".pt")
+        self.imgsz = None
+
+    def detecter(self, image):
+        if self.libre and self.imgsz is None:
+            self.imgsz = -(-max(image.shape[:2]) // 32) * 32
+        options = {"imgsz": self.imgsz} if self.imgsz else {}
+        results = self.model(image, classes=[0], conf=self.confidence, verbose=False, **options)
+        n = _remplir_sortie(results, self.sortie)
+        return self.sortie[:n].copy()
+
+    def detecter_lot(self, images):
+        # Seul le .pt accepte un lot ; les modèles exportés ont un lot fixe de 1
+        if not self.libre:
+            return [self.detecter(image) for image in images]
+        if self.imgsz is None:
+            self.imgsz = -(-max(images[0].shape[:2]) // 32) * 32
+        results = self.model(list(images), classes=[0], conf=self.confidence, verbose=False,
+                             imgsz=self.imgsz)
+        dets = []
+        for r in results:
+            n = _remplir_sortie([r], self.sortie)
+            dets.append(self.sortie[:n].copy())
+        return dets
+
+    def arreter(self):
+        pass
+
+
+class DetecteurOnnx:
+    """ONNX Runtime (FP32 ou INT8) sur le graphe 'personnes seules'."""
+
+    def __init__(self, chemin, confidence):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = os.cpu_count() or 4
+        self.session = ort.InferenceSession(chemin, options, providers=["CPUExecutionProvider"])
+        entree = self.session.get_inputs()[0]
+        self.nom_entree = entree.name
+        taille = _taille_fixe(entree.shape[2], chemin)
+        self.letterbox = _Letterbox(taille)
+        # Lot variable seulement si le graphe a été exporté avec --dynamique
+        self.lot = _LetterboxLot(taille) if not isinstance(entree.shape[0], int) else None
+        self.confidence = confidence
+
+    def detecter(self, image):
+        sortie = self.session.run(None, {self.nom_entree: self.letterbox(image)})[0]
+        return _decoder_personnes(sortie, self.confidence, self.letterbox)
+
+    def detecter_lot(self, images):
+        if self.lot is None or len(images) == 1:
+            return [self.detecter(image) for image in images]
+        sortie = self.session.run(None, {self.nom_entree: self.lot(images)})[0]
+        return [_decoder_personnes(sortie, self.confidence, letterbox, i)
+                for i, letterbox in enumerate(self.lot.letterboxes[:len(images)])]
+
+    def arreter(self):
+        pass
+
+
+class DetecteurOpenVino:
+    """OpenVINO Runtime (IR FP32 ou INT8) sur le graphe 'personnes seules'."""
+
+    def __init__(self, chemin, confidence):
+        import openvino as ov
+        coeur = ov.Core()
+        modele = coeur.read_model(chemin)
+        self.compile = coeur.compile_model(modele, "CPU", {"PERFORMANCE_HINT": "LATENCY"})
+        self.requete = self.compile.create_infer_request()
+        forme = modele.inputs[0].get_partial_shape()
+        taille = _taille_fixe(forme[2].get_length() if forme[2].is_static else str(forme[2]), chemin)
+        self.letterbox = _Letterbox(taille)
+        self.lot = _LetterboxLot(taille) if forme[0].is_dynamic else None
+        self.confidence = confidence
+
+    def detecter(self, image):
+        self.requete.infer({0: self.letterbox(image)})
+        sortie = self.requete.get_output_tensor(0).data
+        return _decoder_personnes(sortie, self.confidence, self.letterbox)
+
+    def detecter_lot(self, images):
+        if self.lot is None or len(images) == 1:
+            return [self.detecter(image) for image in images]
+        self.requete.infer({0: self.lot(images)})
+        sortie = self.requete.get_output_tensor(0).data
+        return [_decoder_personnes(sortie, self.confidence, letterbox, i)
+                for i, letterbox in enumerate(self.lot.letterboxes[:len(images)])]
+
+    def arreter(self):
+        pass
+
+
+def _creer_backend(backend, model_type, confidence, lot=1):
+    chemin = trouver_artefact(model_type, backend, lot)
+    if chemin is None:
+        raise FileNotFoundError(
+            f"Pas de modèle '{backend}' pour {model_type} : lancer exporter_modele.py"
+        )
+    if backend == "onnx":
+        return DetecteurOnnx(chemin, confidence)
+    if backend == "openvino":
+        return DetecteurOpenVino(chemin, confidence)
+    if backend in ("ncnn", "pytorch"):
+        return DetecteurLocal(chemin, confidence)
+    raise ValueError(f"Backend inconnu : {backend}")
+
+def _signature(model_type, candidats, forme):
+    """Ce qui invalide un choix mis en cache : taille d'image, backends et date des artefacts."""
+    signature = [list(forme)]
+    for backend in candidats:
+        chemin = trouver_artefact(model_type, backend)
+        signature.append([backend, os.path.getmtime(chemin) if os.path.exists(chemin) else 0])
+    return signature
+
+def _lire_choix():
+    try:
+        with open(FICHIER_CHOIX) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _ecrire_choix(choix):
+    try:
+        os.makedirs(DOSSIER_MODELES, exist_ok=True)
+        with open(FICHIER_CHOIX + ".tmp", "w") as f:
+            json.dump(choix, f, indent=1)
+        os.replace(FICHIER_CHOIX + ".tmp", FICHIER_CHOIX)
+    except OSError as e:
+        print(f"Choix du backend non mémorisé : {e}")
+
+def choisir_backend(model_type, confidence, forme=(480, 640, 3), essais=3, cache=True):
+    """
+    Mesure chaque backend disponible sur une image neutre et retourne le plus rapide.
+    cache : réutilise le choix précédent tant que les artefacts n'ont pas changé.
+    """
+    candidats = backends_disponibles(model_type)
+    if len(candidats) <= 1:
+        return candidats[0] if candidats else "pytorch"
+    cle = f"{nom_base(model_type)} {forme[1]}x{forme[0]}"
+    signature = _signature(model_type, candidats, forme)
+    choix = _lire_choix() if cache else {}
+    if choix.get(cle, {}).get("signature") == signature:
+        return choix[cle]["backend"]
+    image = np.zeros(forme, dtype=np.uint8)
+    meilleur, meilleur_temps = "pytorch", float("inf")
+    for backend in candidats:
+        try:
+            det = _creer_backend(backend, model_type, confidence)
+            det.detecter(image)  # Premier appel = préchauffage
+            t0 = time.perf_counter()
+            for _ in range(essais):
+                det.detecter(image)
+            duree = (time.perf_counter() - t0) / essais
+            det.arreter()
+        except Exception as e:
+            print(f"Backend {backend} indisponible : {e}")
+            continue
+        print(f"Backend {backend} : {duree * 1000:.0f} ms/image")
+        if duree < meilleur_temps:
+            meilleur, meilleur_temps = backend, duree
+    if cache and meilleur_temps < float("inf"):
+        choix[cle] = {"backend": meilleur, "ms": round(meilleur_temps * 1000, 1), "signature": signature}
+        _ecrire_choix(choix)
+    return meilleur
+
+
+# ==========================================
+# MODE PROCESSUS
+# ==========================================
+def _boucle_processus(conn, backend, model_type, confidence, noms_slots, forme, nom_resultats, lot):
+    """Code exécuté dans le processus enfant."""
+    shms = [shared_memory.SharedMemory(name=n) for n in noms_slots]
+    images = [np.ndarray(forme, dtype=np.uint8, buffer=s.buf) for s in shms]
+    shm_res = shared_memory.SharedMemory(name=nom_resultats)
+    sortie = np.ndarray((len(shms), MAX_BOITES, CHAMPS_BOITE), dtype=np.float32, buffer=shm_res.buf)
+
+    detecteur = _creer_backend(backend, model_type, confidence, lot)
+    conn.send("pret")
+
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            if isinstance(msg, list):
+                # Lot : une inférence pour plusieurs slots, un nb de boîtes par slot
+                lot = detecter_lot(detecteur, [images[i] for i in msg])
+            else:
+                lot = [detecteur.detecter(images[msg])]
+                msg = [msg]
+            nbs = []
+            for slot, dets in zip(msg, lot):
+                n = min(len(dets), MAX_BOITES)
+                sortie[slot, :n] = dets[:n]
+                nbs.append(n)
+            conn.send(nbs if len(nbs) > 1 else nbs[0])
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        detecteur.arreter()
+        del images, sortie
+        for s in shms:
+            s.close()
+        shm_res.close()
+
+
+class DetecteurProcessus:
+
+    def __init__(self, backend, model_type, confidence, forme=(480, 640, 3), nb_slots=2, lot=1,
+                 max_relances=3):
+        """max_relances : processus enfant relancé au plus ce nombre de fois s'il meurt (OOM...)"""
+        self.backend = backend
+        self.model_type = model_type
+        self.confidence = confidence
+        self.forme = forme
+        self.nb_slots = nb_slots
+        self.lot = lot
+        self.max_relances = max_relances
+        self.nb_relances = 0
+        self.slot = 0
+        self.process = None
+        self.conn = None
+
+        taille = int(np.prod(forme))
+        self.shms = [shared_memory.SharedMemory(create=True, size=taille) for _ in range(nb_slots)]
+        self.images = [np.ndarray(forme, dtype=np.uint8, buffer=s.buf) for s in self.shms]
+        self.shm_res = shared_memory.SharedMemory(
+            create=True, size=nb_slots * MAX_BOITES * CHAMPS_BOITE * 4
+        )
+        self.resultats = np.ndarray(
+            (nb_slots, MAX_BOITES, CHAMPS_BOITE), dtype=np.float32, buffer=self.shm_res.buf
+        )
+
+    def demarrer(self, timeout=120):
+        """Lance le processus enfant et attend que le modèle soit chargé."""
+        # "spawn" : pas de fork d'un processus qui a déjà des threads / la caméra
+        ctx = mp.get_context("spawn")
+        self.conn, conn_enfant = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_boucle_processus,
+            args=(conn_enfant, self.backend, self.model_type, self.confidence,
+                  [s.name for s in self.shms], self.forme, self.shm_res.name, self.lot),
+            daemon=True,
+        )
+        self.process.start()
+        conn_enfant.close()
+        try:
+            pret = self.conn.poll(timeout) and self.conn.recv() == "pret"
+        except (EOFError, OSError):
+            pret = False  # Mort pendant le chargement du modèle
+        if not pret:
+            self.arreter()
+            raise RuntimeError("Le processus d'inférence n'a pas démarré")
+
+    def detecter(self, image):
+        """
+        Envoie une image au processus et attend ses détections.
+        Retourne un tableau (n, 6) float32 : x1, y1, x2, y2, confiance, classe.
+        """
+        slot = self.slot
+        self.slot = (self.slot + 1) % self.nb_slots
+        np.copyto(self.images[slot], image)
+        n = self._echanger(slot)
+        return self.resultats[slot, :n].copy()
+
+    def detecter_lot(self, images):
+        """Au plus nb_slots images par appel (appel bloquant : tous les slots sont libres)."""
+        if len(images) > self.nb_slots:
+            raise ValueError(f"Lot de {len(images)} images pour {self.nb_slots} slots")
+        if len(images) == 1:
+            return [self.detecter(images[0])]
+        for slot, image in enumerate(images):
+            np.copyto(self.images[slot], image)
+        nbs = self._echanger(list(range(len(images))))
+        return [self.resultats[slot, :n].copy() for slot, n in enumerate(nbs)]
+
+    def _echanger(self, message):
+        """
+        send + recv. Enfant mort (OOM killer du Pi...) : EOFError / OSError sur le Pipe ->
+        relancé, puis la même demande est renvoyée (les images sont toujours dans les slots).
+        RuntimeError au-delà de max_relances : l'appelant ne doit pas continuer sur un
+        résultat figé.
+        """
+        while True:
+            try:
+                self.conn.send(message)
+                return self.conn.recv()
+            except (EOFError, OSError) as e:
+                if self.nb_relances >= self.max_relances:
+                    raise RuntimeError(f"Processus d'inférence perdu ({self.nb_relances} relances) : {e!r}") from e
+                self._relancer()
+
+    def _relancer(self):
+        self.nb_relances += 1
+        print(f"Processus d'inférence mort (code {self.process.exitcode}) : relance {self.nb_relances}")
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.process = None
+        self.demarrer()
+
+    def arreter(self, timeout=2.0):
+        """Arrêt propre : message de fin, join, puis libération de la mémoire partagée."""
+        if self.process is not None:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.conn.close()
+            self.process = None
+        if not self.shms:
+            return
+        del self.images, self.resultats
+        for s in self.shms + [self.shm_res]:
+            s.close()
+            s.unlink()
+        self.shms = []
+
+
+def creer_detecteur(mode, model_type, confidence, forme=(480, 640, 3), backend="auto", lot=1):
+    """
+    mode : "thread" (modèle dans ai_worker) ou "processus" (modèle hors GIL).
+    backend : "auto", "pytorch", "onnx", "openvino" ou "ncnn".
+    lot : nb max d'images par detecter_lot() (taille des slots partagés en mode "processus")
+    """
+    if backend == "auto":
+        backend = choisir_backend(model_type, confidence, forme)
+        print(f"Backend retenu : {backend}")
+    if mode == "processus":
+        detecteur = DetecteurProcessus(backend, model_type, confidence, forme, nb_slots=max(2, lot), lot=lot)
+        detecteur.demarrer()
+        return detecteur
+    if mode == "thread":
+        return _creer_backend(backend, model_type, confidence, lot)
+    raise ValueError(f"Mode d'inférence inconnu : {mode}")
@@ -0,0 +1,92 @@
+import threading
+import numpy as np
+
+# ==========================================
+# ECHANGE D'IMAGES CAPTURE -> IA
+# ==========================================
+# Anneau de tampons préalloués + numéro de séquence + Condition.
+# - La capture publie une image (seq += 1) et réveille l'IA.
+# - L'IA attend une image PLUS RECENTE que la dernière traitée :
+#   plus jamais deux inférences sur la même image.
+# - L'IA lit directement le tampon (aucun .copy()), le slot est
+#   "épinglé" pendant l'inférence pour que la capture ne l'écrase pas.
+
+class TamponImages:
+
+    def __init__(self, forme=(480, 640, 3), nb_slots=3, dtype=np.uint8):
+        """forme : taille des images (H, W, C). 3 slots suffisent pour 1 lecteur."""
+        if nb_slots < 2:
+            raise ValueError("Il faut au moins 2 slots")
+        self.slots = [np.empty(forme, dtype=dtype) for _ in range(nb_slots)]
+        self.seq_slot = [0] * nb_slots      # Séquence contenue dans chaque slot
+        self.lecteurs = [0] * nb_slots      # Nb de lecteurs qui épinglent le slot
+        self.seq = 0                        # Dernière séquence publiée
+        self.dernier_slot = -1
+        self.ferme = False
+        self.images_perdues = 0             # Publications sans slot libre
+        self.cond = threading.Condition()
+
+    def _slot_libre(self):
+        for i in range(len(self.slots)):
+            if self.lecteurs[i] == 0 and i != self.dernier_slot:
+                return i
+        return None
+
+    def publier(self, image, copie=True):
+        """
+        Publie une nouvelle image, retourne son numéro de séquence (ou None).
+        copie=False : l'appelant cède l'image (ex: capture_array() qui alloue
+        une nouvelle image à chaque appel et qu'on ne redessine pas) -> zéro copie.
+        """
+        with self.cond:
+            i = self._slot_libre()
+            if i is None:
+                self.images_perdues += 1
+                return None
+            # On réserve le slot le temps de la copie (faite HORS du verrou)
+            self.lecteurs[i] += 1
+
+        if copie:
+            if self.slots[i].shape != image.shape or self.slots[i].dtype != image.dtype:
+                self.slots[i] = np.empty_like(image)
+            np.copyto(self.slots[i], image)
+        else:
+            self.slots[i] = image
+
+        with self.cond:
+            self.lecteurs[i] -= 1
+            self.seq += 1
+            self.seq_slot[i] = self.seq
+            self.dernier_slot = i
+            self.cond.notify_all()
+            return self.seq
+
+    def attendre(self, dernier_seq=0, timeout=None):
+        """
+        Bloque jusqu'à ce qu'une image plus récente que dernier_seq existe.
+        Retourne (seq, image) avec le slot épinglé -> appeler liberer(seq) après usage.
+        Retourne (None, None) si timeout ou fermeture.
+        """
+        with self.cond:
+            ok = self.cond.wait_for(
+                lambda: self.ferme or self.seq > dernier_seq, timeout=timeout
+            )
+            if not ok or self.ferme or self.dernier_slot < 0:
+                return None, None
+            i = self.dernier_slot
+            self.lecteurs[i] += 1
+            return self.seq_slot[i], self.slots[i]
+
+    def liberer(self, seq):
+        """Désépingle le slot lu par attendre()."""
+        with self.cond:
+            for i, s in enumerate(self.seq_slot):
+                if s == seq and self.lecteurs[i] > 0:
+                    self.lecteurs[i] -= 1
+                    return
+
+    def fermer(self):
+        """Réveille tous les lecteurs (arrêt propre)."""
+        with self.cond:
+            self.ferme = True
+            self.cond.notify_all()
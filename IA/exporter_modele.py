@@ -0,0 +1,190 @@
+import os
+import glob
+import shutil
+import argparse
+import numpy as np
+
+from detection import DOSSIER_MODELES, nom_base, _Letterbox
+
+# ==========================================
+# EXPORT / QUANTIFICATION DU MODELE (A LANCER UNE FOIS)
+# ==========================================
+# Fabrique dans IA/modeles/ les artefacts utilisés par detection.py :
+#   yolov8s_personnes.onnx            graphe ONNX réduit à la classe "personne"
+#   yolov8s_personnes_int8.onnx       même graphe quantifié INT8 (ONNX Runtime)
+#   yolov8s_personnes_openvino/       IR OpenVINO FP32
+#   yolov8s_personnes_int8_openvino/  IR OpenVINO INT8 (NNCF)
+#   yolov8s_ncnn_model/               modèle NCNN (FP16)
+# Avec --dynamique, les fichiers ONNX / OpenVINO s'appellent yolov8s_personnes_lot...
+# (lot libre, H et W fixés à --imgsz) et ne remplacent pas ceux à lot fixe.
+# La calibration INT8 utilise NOS images (dossier de .jpg/.png pris par la caméra
+# de la salle), pas COCO : la quantification colle à la scène réelle.
+#
+# Exemple :
+#   python exporter_modele.py --modele yolov8s.pt --capturer 200 --calibration calib/
+#   python exporter_modele.py --modele yolov8s.pt --formats onnx openvino ncnn --int8 --calibration calib/
+#   python exporter_modele.py --modele yolov8n.pt --formats onnx --dynamique   (lots multi-caméras)
+
+
+def capturer_calibration(dossier, nb, intervalle=0.5):
+    """Prend `nb` images avec la caméra du Pi pour la calibration INT8."""
+    import time
+    import cv2
+    from picamera2 import Picamera2
+
+    os.makedirs(dossier, exist_ok=True)
+    picam2 = Picamera2()
+    picam2.configure(picam2.create_video_configuration(main={"size": (640, 480), "format": "RGB888"}))
+    picam2.start()
+    try:
+        for i in range(nb):
+            cv2.imwrite(os.path.join(dossier, f"calib_{i:04d}.jpg"), picam2.capture_array())
+            time.sleep(intervalle)
+    finally:
+        picam2.stop()
+    print(f"{nb} images de calibration dans {dossier}")
+
+
+def images_calibration(dossier, imgsz, nb_max):
+    """Générateur d'entrées (1, 3, imgsz, imgsz) prétraitées comme en production."""
+    import cv2
+    fichiers = sorted(glob.glob(os.path.join(dossier, "*.jpg")) + glob.glob(os.path.join(dossier, "*.png")))
+    if not fichiers:
+        raise FileNotFoundError(f"Aucune image de calibration dans {dossier}")
+    letterbox = _Letterbox(imgsz)
+    for f in fichiers[:nb_max]:
+        yield letterbox(cv2.imread(f)).copy()
+
+
+def garder_personnes(onnx_entree, onnx_sortie, imgsz):
+    """
+    Ajoute un Slice sur la sortie (1, 84, N) -> (1, 5, N) : boîte + score "personne".
+    Les 79 autres classes ne sont plus ni copiées ni transposées à chaque image.
+    imgsz : H et W de l'entrée, fixés même si l'export a rendu tous les axes libres.
+    """
+    import onnx
+    from onnx import helper, TensorProto
+
+    modele = onnx.load(onnx_entree)
+    graphe = modele.graph
+    # ultralytics (dynamic=True) libère lot, H et W : seul le lot doit rester libre,
+    # les détecteurs lisent la taille du letterbox sur l'entrée
+    for axe in (2, 3):
+        graphe.input[0].type.tensor_type.shape.dim[axe].dim_value = imgsz
+    sortie = graphe.output[0]
+    consts = {
+        "pers_debut": [0], "pers_fin": [5], "pers_axe": [1],
+    }
+    for nom, val in consts.items():
+        graphe.initializer.append(helper.make_tensor(nom, TensorProto.INT64, [1], val))
+    graphe.node.append(helper.make_node(
+        "Slice", [sortie.name, "pers_debut", "pers_fin", "pers_axe"], ["personnes"]
+    ))
+    # dim_param : axe du lot symbolique quand le graphe est exporté avec --dynamique
+    dims = [d.dim_param or d.dim_value for d in sortie.type.tensor_type.shape.dim]
+    del graphe.output[:]
+    graphe.output.append(helper.make_tensor_value_info(
+        "personnes", TensorProto.FLOAT, [dims[0], 5, dims[2]]
+    ))
+    onnx.checker.check_model(modele)
+    onnx.save(modele, onnx_sortie)
+
+
+def suffixe(dynamique):
+    """Le graphe à lot libre a ses propres fichiers (detection.chemins_artefact)."""
+    return "_personnes_lot" if dynamique else "_personnes"
+
+def exporter_onnx(modele_pt, imgsz, dynamique=False):
+    """dynamique : taille de lot libre (inférence groupée de plusieurs caméras, multi_cameras.py)"""
+    from ultralytics import YOLO
+    brut = YOLO(modele_pt).export(format="onnx", imgsz=imgsz, simplify=True, opset=13, dynamic=dynamique)
+    chemin = os.path.join(DOSSIER_MODELES, nom_base(modele_pt) + suffixe(dynamique) + ".onnx")
+    garder_personnes(brut, chemin, imgsz)
+    os.remove(brut)
+    print(f"ONNX : {chemin}")
+    return chemin
+
+
+def quantifier_onnx(chemin_onnx, calibration, imgsz, nb_max):
+    from onnxruntime.quantization import (
+        quantize_static, CalibrationDataReader, QuantFormat, QuantType
+    )
+
+    class Lecteur(CalibrationDataReader):
+        def __init__(self):
+            import onnxruntime as ort
+            nom = ort.InferenceSession(chemin_onnx, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+            self.iter = ({nom: x} for x in images_calibration(calibration, imgsz, nb_max))
+
+        def get_next(self):
+            return next(self.iter, None)
+
+    sortie = os.path.splitext(chemin_onnx)[0] + "_int8.onnx"
+    quantize_static(chemin_onnx, sortie, Lecteur(), quant_format=QuantFormat.QDQ,
+                    per_channel=True, activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8)
+    print(f"ONNX INT8 : {sortie}")
+
+
+def exporter_openvino(modele_pt, chemin_onnx, int8, calibration, imgsz, nb_max, dynamique=False):
+    import openvino as ov
+
+    modele = ov.convert_model(chemin_onnx)
+    dossier = os.path.join(DOSSIER_MODELES, nom_base(modele_pt) + suffixe(dynamique) + "_openvino")
+    os.makedirs(dossier, exist_ok=True)
+    ov.save_model(modele, os.path.join(dossier, nom_base(modele_pt) + ".xml"))
+    print(f"OpenVINO : {dossier}")
+
+    if int8:
+        import nncf
+        donnees = nncf.Dataset(list(images_calibration(calibration, imgsz, nb_max)))
+        quantifie = nncf.quantize(modele, donnees, preset=nncf.QuantizationPreset.MIXED)
+        dossier = os.path.join(DOSSIER_MODELES, nom_base(modele_pt) + suffixe(dynamique) + "_int8_openvino")
+        os.makedirs(dossier, exist_ok=True)
+        ov.save_model(quantifie, os.path.join(dossier, nom_base(modele_pt) + ".xml"))
+        print(f"OpenVINO INT8 : {dossier}")
+
+
+def exporter_ncnn(modele_pt, imgsz):
+    from ultralytics import YOLO
+    brut = YOLO(modele_pt).export(format="ncnn", imgsz=imgsz, half=True)
+    dossier = os.path.join(DOSSIER_MODELES, nom_base(modele_pt) + "_ncnn_model")
+    if os.path.exists(dossier):
+        shutil.rmtree(dossier)
+    shutil.move(brut, dossier)
+    print(f"NCNN : {dossier}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / quantification du modèle YOLO")
+    parser.add_argument("--modele", default="yolov8s.pt")
+    parser.add_argument("--formats", nargs="+", default=["onnx", "openvino", "ncnn"],
+                        choices=["onnx", "openvino", "ncnn"])
+    parser.add_argument("--imgsz", type=int, default=640, help="Taille d'entrée du réseau")
+    parser.add_argument("--int8", action="store_true", help="Quantification INT8 (ONNX + OpenVINO)")
+    parser.add_argument("--dynamique", action="store_true",
+                        help="Taille de lot libre (ONNX + OpenVINO) pour l'inférence multi-caméras")
+    parser.add_argument("--calibration", default="calibration", help="Dossier d'images de la salle")
+    parser.add_argument("--nb-calibration", type=int, default=200)
+    parser.add_argument("--capturer", type=int, default=0,
+                        help="Prendre d'abord N images de calibration avec la caméra")
+    args = parser.parse_args()
+
+    os.makedirs(DOSSIER_MODELES, exist_ok=True)
+    if args.capturer:
+        capturer_calibration(args.calibration, args.capturer)
+
+    chemin_onnx = None
+    if "onnx" in args.formats or "openvino" in args.formats:
+        chemin_onnx = exporter_onnx(args.modele, args.imgsz, args.dynamique)
+    if "onnx" in args.formats and args.int8:
+        quantifier_onnx(chemin_onnx, args.calibration, args.imgsz, args.nb_calibration)
+    if "openvino" in args.formats:
+        exporter_openvino(args.modele, chemin_onnx, args.int8, args.calibration,
+                          args.imgsz, args.nb_calibration, args.dynamique)
+    if "ncnn" in args.formats:
+        exporter_ncnn(args.modele, args.imgsz)
+
+
+if __name__ == "__main__":
+    main()
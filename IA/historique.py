@@ -0,0 +1,227 @@
+import os
+import time
+import datetime
+import threading
+from collections import deque
+import numpy as np
+
+# ==========================================
+# HISTORIQUE (SERIES TEMPORELLES SUR DISQUE)
+# ==========================================
+# Une ligne binaire de taille fixe par inférence : occupation, mesure, seuils, décision.
+# - 1 fichier par jour (AAAA-MM-JJ.bin) = tableau NumPy memmap, ajout seulement
+#   (le fichier grandit par blocs de BLOC_FICHIER lignes, les lignes vides ont t = 0)
+# - ajouter() ne fait qu'un deque.append : rien ne touche le disque dans la boucle capture
+# - un thread écrit les lignes PAR LOTS toutes les periode_flush secondes, puis un seul
+#   flush (msync) : quelques écritures par minute au lieu de 10 par seconde -> carte SD épargnée
+# - agrégats automatiques min / moyenne / max à la minute et à l'heure
+#   (AAAA-MM-JJ.min.bin : 1440 cases, AAAA-MM-JJ.h.bin : 24 cases), tenus à jour par lot
+# - lecture : lire(debut, fin) et agregats(debut, fin, pas) -> tableaux NumPy
+
+DTYPE_LIGNE = np.dtype([
+    ("t", np.float64),           # time.time()
+    ("personnes", np.int16),
+    ("action", np.int8),         # Indice dans ACTIONS (-1 = inconnue)
+    ("temperature", np.float32), # NaN = pas de mesure
+    ("humidite", np.float32),
+    ("cible", np.float32),
+    ("seuil_on", np.float32),
+    ("seuil_off", np.float32),
+])
+
+ACTIONS = ("STANDBY", "CHAUFFE", "CLIM ON", "STOP (MAX)", "ZONE CONFORT")
+CHAMPS_AGREGES = ("personnes", "temperature", "humidite")
+PAS = {"minute": (60, 1440, ".min.bin"), "heure": (3600, 24, ".h.bin")}
+BLOC_FICHIER = 16384
+
+DTYPE_AGREGAT = np.dtype(
+    [("n", np.int32)]
+    + [(f"{c}_n", np.int32) for c in CHAMPS_AGREGES]
+    + [(f"{c}_{s}", np.float32) for c in CHAMPS_AGREGES for s in ("min", "max", "somme")]
+)
+
+
+def _jour(t):
+    return datetime.date.fromtimestamp(t)
+
+def _minuit(jour):
+    return time.mktime(jour.timetuple())
+
+def code_action(action):
+    return ACTIONS.index(action) if action in ACTIONS else -1
+
+
+class _Segment:
+    """Fichiers d'un jour : lignes brutes + agrégats minute / heure."""
+
+    def __init__(self, dossier, jour, ecriture):
+        self.jour = jour
+        self.minuit = _minuit(jour)
+        base = os.path.join(dossier, jour.isoformat())
+        self.chemin = base + ".bin"
+        mode = "r+" if ecriture else "r"
+        if ecriture and not os.path.exists(self.chemin):
+            self._agrandir(BLOC_FICHIER)
+        self.lignes = np.memmap(self.chemin, dtype=DTYPE_LIGNE, mode=mode)
+        # Nombre de lignes écrites = première ligne vide
+        vides = np.flatnonzero(self.lignes["t"] == 0)
+        self.nb = int(vides[0]) if len(vides) else len(self.lignes)
+
+        self.agregats = {}
+        for pas, (_, nb_cases, suffixe) in PAS.items():
+            chemin = base + suffixe
+            if ecriture and not os.path.exists(chemin):
+                vide = np.zeros(nb_cases, dtype=DTYPE_AGREGAT)
+                for c in CHAMPS_AGREGES:
+                    vide[f"{c}_min"] = np.inf
+                    vide[f"{c}_max"] = -np.inf
+                vide.tofile(chemin)
+            if os.path.exists(chemin):
+                self.agregats[pas] = np.memmap(chemin, dtype=DTYPE_AGREGAT, mode=mode)
+
+    def _agrandir(self, nb_lignes):
+        with open(self.chemin, "ab") as f:
+            f.truncate(nb_lignes * DTYPE_LIGNE.itemsize)
+
+    def ecrire(self, lot):
+        fin = self.nb + len(lot)
+        if fin > len(self.lignes):
+            taille = -(-fin // BLOC_FICHIER) * BLOC_FICHIER
+            self.lignes.flush()
+            del self.lignes
+            self._agrandir(taille)
+            self.lignes = np.memmap(self.chemin, dtype=DTYPE_LIGNE, mode="r+")
+        self.lignes[self.nb:fin] = lot
+        self.nb = fin
+
+        secondes = lot["t"] - self.minuit
+        for pas, (duree, nb_cases, _) in PAS.items():
+            cases = np.clip((secondes // duree).astype(np.intp), 0, nb_cases - 1)
+            ag = self.agregats[pas]
+            np.add.at(ag["n"], cases, 1)
+            for c in CHAMPS_AGREGES:
+                v = lot[c].astype(np.float32)
+                ok = ~np.isnan(v)
+                # n / min / max / somme par case (NaN ignorés)
+                np.add.at(ag[f"{c}_n"], cases[ok], 1)
+                np.minimum.at(ag[f"{c}_min"], cases[ok], v[ok])
+                np.maximum.at(ag[f"{c}_max"], cases[ok], v[ok])
+                np.add.at(ag[f"{c}_somme"], cases[ok], v[ok])
+
+    def flush(self):
+        self.lignes.flush()
+        for ag in self.agregats.values():
+            ag.flush()
+
+
+class Historique:
+
+    def __init__(self, dossier, periode_flush=10.0, max_attente=100000):
+        """
+        periode_flush : secondes entre deux écritures groupées sur la carte SD
+        max_attente : lignes gardées en mémoire au plus (disque bloqué -> les plus vieilles sont perdues)
+        """
+        self.dossier = dossier
+        os.makedirs(dossier, exist_ok=True)
+        self.periode_flush = periode_flush
+        self.attente = deque(maxlen=max_attente)
+        self.segment = None
+        self.nb_ecrites = 0
+        self.nb_lots = 0
+        self.arret = threading.Event()
+        self.thread = None
+
+    # --- Ecriture (boucle capture) ---
+    def ajouter(self, personnes, temperature, humidite, cible, seuil_on, seuil_off, action, t=None):
+        """Non bloquant : un tuple dans un deque (thread-safe)."""
+        self.attente.append((
+            time.time() if t is None else t, personnes, code_action(action),
+            np.nan if temperature is None else temperature,
+            np.nan if humidite is None else humidite,
+            cible, seuil_on, seuil_off,
+        ))
+
+    # --- Thread d'écriture ---
+    def demarrer(self):
+        self.thread = threading.Thread(target=self._boucle, daemon=True)
+        self.thread.start()
+
+    def _boucle(self):
+        while not self.arret.wait(self.periode_flush):
+            self.vider()
+        self.vider()
+
+    def vider(self):
+        """Écrit toutes les lignes en attente (un lot par jour touché) puis flush."""
+        n = len(self.attente)
+        if not n:
+            return
+        lot = np.array([self.attente.popleft() for _ in range(n)], dtype=DTYPE_LIGNE)
+        jours = np.array([_jour(t).toordinal() for t in lot["t"][[0, -1]]])
+        if jours[0] == jours[1]:
+            morceaux = [lot]
+        else:
+            # Lot à cheval sur minuit : on le coupe par jour
+            ordinaux = np.array([_jour(t).toordinal() for t in lot["t"]])
+            morceaux = [lot[ordinaux == j] for j in np.unique(ordinaux)]
+        for morceau in morceaux:
+            jour = _jour(morceau["t"][0])
+            if self.segment is None or self.segment.jour != jour:
+                if self.segment is not None:
+                    self.segment.flush()
+                self.segment = _Segment(self.dossier, jour, ecriture=True)
+            self.segment.ecrire(morceau)
+        self.segment.flush()
+        self.nb_ecrites += n
+        self.nb_lots += 1
+
+    def arreter(self, timeout=5.0):
+        self.arret.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    # --- Lecture ---
+    def _segments(self, debut, fin):
+        jour, dernier = _jour(debut), _jour(fin)
+        while jour <= dernier:
+            if os.path.exists(os.path.join(self.dossier, jour.isoformat() + ".bin")):
+                yield _Segment(self.dossier, jour, ecriture=False)
+            jour += datetime.timedelta(days=1)
+
+    def lire(self, debut, fin):
+        """Lignes brutes avec debut <= t < fin (copie, tableau DTYPE_LIGNE)."""
+        morceaux = []
+        for seg in self._segments(debut, fin):
+            t = seg.lignes["t"][:seg.nb]
+            a, b = np.searchsorted(t, [debut, fin])
+            morceaux.append(np.array(seg.lignes[a:b]))
+        return np.concatenate(morceaux) if morceaux else np.zeros(0, dtype=DTYPE_LIGNE)
+
+    def agregats(self, debut, fin, pas="minute"):
+        """
+        Cases non vides entre debut et fin : tableau structuré avec t (début de case),
+        n, et <champ>_min / _moy / _max pour personnes, temperature, humidite.
+        """
+        duree = PAS[pas][0]
+        champs = [("t", np.float64), ("n", np.int32)] + [
+            (f"{c}_{s}", np.float32) for c in CHAMPS_AGREGES for s in ("min", "moy", "max")
+        ]
+        morceaux = []
+        for seg in self._segments(debut, fin):
+            if pas not in seg.agregats:
+                continue
+            ag = np.array(seg.agregats[pas])
+            t = seg.minuit + np.arange(len(ag)) * duree
+            garde = (ag["n"] > 0) & (t + duree > debut) & (t < fin)
+            sortie = np.zeros(int(garde.sum()), dtype=champs)
+            sortie["t"] = t[garde]
+            sortie["n"] = ag["n"][garde]
+            for c in CHAMPS_AGREGES:
+                nb = ag[f"{c}_n"][garde]
+                valide = nb > 0
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    sortie[f"{c}_moy"] = np.where(valide, ag[f"{c}_somme"][garde] / nb, np.nan)
+                sortie[f"{c}_min"] = np.where(valide, ag[f"{c}_min"][garde], np.nan)
+                sortie[f"{c}_max"] = np.where(valide, ag[f"{c}_max"][garde], np.nan)
+            morceaux.append(sortie)
+        return np.concatenate(morceaux) if morceaux else np.zeros(0, dtype=champs)
@@ -0,0 +1,317 @@
+import time
+import bisect
+import threading
+
+# ==========================================
+# INSTRUMENTATION DU CHEMIN CRITIQUE
+# ==========================================
+# Où passe le temps ? Chaque étape (capture, copie, inférence, dessin, imshow...) est
+# chronométrée sur l'horloge monotone :
+#     t = time.perf_counter()
+#     image = source.lire()
+#     t = mesures.noter("capture", t)     # renvoie l'instant de fin -> étape suivante
+# - un HISTOGRAMME par étape, cases fixes (10 µs -> 10 s, 3 par octave) : un échantillon
+#   = une recherche dichotomique + 3 additions, aucune allocation (ni liste, ni deque)
+# - VerrouMesure remplace threading.Lock : attente quand le verrou est pris (contention)
+#   et durée de détention
+# - "part" d'une étape = temps passé dedans / durée de la fenêtre -> pour "inference",
+#   c'est le taux d'occupation (duty cycle) de l'IA
+# - sorties : calque à l'écran (dessiner_mesures), une ligne de log périodique,
+#   et un petit serveur HTTP local (texte sur /, format Prometheus sur /metrics)
+# - JALONS du démarrage (secondes depuis le lancement du script) : modèle chargé,
+#   préchauffage, caméra prête, 1re détection -> une ligne à chaque démarrage + /metrics
+# - JAUGES étiquetées (ex. personnes et chaleur par zone de zones.py) : dernière valeur
+#   seulement, remplacée d'un bloc -> /metrics et la page texte
+# Pas de verrou par échantillon : une étape a en principe un seul thread écrivain (au pire
+# un échantillon perdu quand les deux threads notent la même étape au même instant).
+
+BORNES = [1e-5 * 2 ** (k / 3) for k in range(61)]
+
+
+class Histogramme:
+    __slots__ = ("comptes", "nb", "somme", "max")
+
+    def __init__(self):
+        self.comptes = [0] * (len(BORNES) + 1)
+        self.nb = 0
+        self.somme = 0.0
+        self.max = 0.0
+
+    def ajouter(self, duree):
+        self.comptes[bisect.bisect_left(BORNES, duree)] += 1
+        self.nb += 1
+        self.somme += duree
+        if duree > self.max:
+            self.max = duree
+
+
+def quantile(comptes, q):
+    """Borne haute de la case contenant le quantile q (None si vide)."""
+    total = sum(comptes)
+    if not total:
+        return None
+    cible = q * total
+    cumul = 0
+    for i, c in enumerate(comptes):
+        cumul += c
+        if cumul >= cible:
+            return BORNES[min(i, len(BORNES) - 1)]
+    return BORNES[-1]
+
+
+class Instrumentation:
+
+    def __init__(self, nom="smarttherm", t_lancement=None):
+        """t_lancement : instant perf_counter() du lancement (avant les imports), origine des jalons"""
+        self.nom = nom
+        self.etapes = {}            # nom -> Histogramme (ordre d'apparition)
+        self.verrous = []
+        self.lock = threading.Lock()  # Création d'étape et photos seulement
+        self.photos = {}            # Fenêtre -> (instant, {étape: (comptes, nb, somme)})
+        self.resume = {}            # Dernier résumé de la fenêtre "ecran" (calque, HTTP)
+        self.version = 0
+        self.t_debut = time.perf_counter()
+        self.t_lancement = self.t_debut if t_lancement is None else t_lancement
+        self.jalons = {}            # nom -> secondes depuis le lancement (ordre d'apparition)
+        self.jauges = {}            # nom -> (étiquette, {valeur d'étiquette: valeur})
+        self.arret = threading.Event()
+        self.thread = None
+        self.serveur = None
+
+    # --- Chemin critique ---
+    def noter(self, etape, debut):
+        """Ajoute (maintenant - debut) à l'étape et renvoie maintenant."""
+        fin = time.perf_counter()
+        h = self.etapes.get(etape)
+        if h is None:
+            with self.lock:
+                h = self.etapes.setdefault(etape, Histogramme())
+        h.ajouter(fin - debut)
+        return fin
+
+    def verrou(self, nom="lock"):
+        v = VerrouMesure(self, nom)
+        self.verrous.append(v)
+        return v
+
+    # --- Démarrage ---
+    def jalon(self, nom):
+        """Note l'instant du jalon (au premier passage seulement) ; retourne ses secondes."""
+        if nom not in self.jalons:
+            self.jalons[nom] = time.perf_counter() - self.t_lancement
+        return self.jalons[nom]
+
+    def ligne_demarrage(self):
+        return "[demarrage] " + " | ".join(f"{nom} {t:.2f} s" for nom, t in self.jalons.items())
+
+    # --- Jauges ---
+    def jauge(self, nom, etiquette, valeurs):
+        """Remplace la série nom{etiquette="..."} (un seul dict affecté : pas de verrou)."""
+        self.jauges[nom] = (etiquette, dict(valeurs))
+
+    # --- Fenêtres ---
+    def fenetre(self, cle):
+        """Statistiques depuis le précédent appel avec la même clé."""
+        maintenant = time.perf_counter()
+        with self.lock:
+            etapes = list(self.etapes.items())
+            avant_t, avant = self.photos.get(cle, (self.t_debut, {}))
+            photo = {nom: (list(h.comptes), h.nb, h.somme) for nom, h in etapes}
+            self.photos[cle] = (maintenant, photo)
+        duree = max(maintenant - avant_t, 1e-9)
+        resume = {"duree": duree, "etapes": {}, "verrous": {}}
+        for nom, (comptes, nb, somme) in photo.items():
+            c0, n0, s0 = avant.get(nom, ([0] * len(comptes), 0, 0.0))
+            nb_f = nb - n0
+            if not nb_f:
+                continue
+            diff = [a - b for a, b in zip(comptes, c0)]
+            resume["etapes"][nom] = {
+                "nb": nb_f,
+                "moy_ms": 1000 * (somme - s0) / nb_f,
+                "p50_ms": 1000 * quantile(diff, 0.5),
+                "p95_ms": 1000 * quantile(diff, 0.95),
+                "part": (somme - s0) / duree,
+            }
+        for v in self.verrous:
+            resume["verrous"][v.nom] = v.fenetre(cle)
+        return resume
+
+    def duty_cycle(self, resume=None):
+        """Part du temps passée à inférer (étape "inference") sur la fenêtre."""
+        etape = (resume or self.resume).get("etapes", {}).get("inference")
+        return 0.0 if etape is None else min(1.0, etape["part"])
+
+    # --- Sorties ---
+    def ligne(self, resume):
+        morceaux = [f"{nom} {e['p50_ms']:.1f}/{e['p95_ms']:.1f}ms" for nom, e in resume["etapes"].items()]
+        for nom, v in resume["verrous"].items():
+            morceaux.append(f"{nom} contention {v['contention']:.0%} attente {v['attente_ms']:.2f}ms")
+        morceaux.append(f"IA occupée {self.duty_cycle(resume):.0%}")
+        return "[mesures] " + " | ".join(morceaux)
+
+    def texte(self):
+        """Tableau lisible (page / du serveur HTTP)."""
+        resume = self.resume
+        lignes = [f"{self.nom} - fenêtre {resume.get('duree', 0):.1f} s",
+                  f"{'etape':<16}{'nb':>8}{'moy ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'part':>8}"]
+        for nom, e in resume.get("etapes", {}).items():
+            lignes.append(f"{nom:<16}{e['nb']:>8}{e['moy_ms']:>10.2f}{e['p50_ms']:>10.2f}"
+                          f"{e['p95_ms']:>10.2f}{e['part']:>8.1%}")
+        for nom, v in resume.get("verrous", {}).items():
+            lignes.append(f"verrou {nom}: {v['acquisitions']} prises, contention {v['contention']:.1%}, "
+                          f"attente moy {v['attente_ms']:.3f} ms, détention moy {v['detention_ms']:.3f} ms")
+        lignes.append(f"duty cycle IA: {self.duty_cycle(resume):.1%}")
+        if self.jalons:
+            lignes.append(self.ligne_demarrage())
+        for nom, (_, valeurs) in list(self.jauges.items()):
+            lignes.append(f"{nom}: " + ", ".join(f"{k} {v:g}" for k, v in valeurs.items()))
+        return "\n".join(lignes) + "\n"
+
+    def metriques(self):
+        """Format texte Prometheus : cumuls depuis le démarrage + fenêtre récente."""
+        p = self.nom
+        lignes = []
+        with self.lock:
+            etapes = [(nom, h.nb, h.somme, h.max) for nom, h in self.etapes.items()]
+        for nom, nb, somme, maxi in etapes:
+            lignes.append(f'{p}_etape_total{{etape="{nom}"}} {nb}')
+            lignes.append(f'{p}_etape_secondes_total{{etape="{nom}"}} {somme:.6f}')
+            lignes.append(f'{p}_etape_max_secondes{{etape="{nom}"}} {maxi:.6f}')
+        for nom, e in self.resume.get("etapes", {}).items():
+            lignes.append(f'{p}_etape_p95_secondes{{etape="{nom}"}} {e["p95_ms"] / 1000:.6f}')
+        for v in self.verrous:
+            lignes.append(f'{p}_verrou_acquisitions_total{{verrou="{v.nom}"}} {v.nb_acquisitions}')
+            lignes.append(f'{p}_verrou_contentions_total{{verrou="{v.nom}"}} {v.nb_contentions}')
+            lignes.append(f'{p}_verrou_attente_secondes_total{{verrou="{v.nom}"}} {v.attente:.6f}')
+        lignes.append(f"{p}_duty_cycle_inference {self.duty_cycle():.4f}")
+        for nom, t in list(self.jalons.items()):
+            lignes.append(f'{p}_demarrage_secondes{{jalon="{nom}"}} {t:.3f}')
+        for nom, (etiquette, valeurs) in list(self.jauges.items()):
+            for k, v in valeurs.items():
+                lignes.append(f'{p}_{nom}{{{etiquette}="{k}"}} {v:g}')
+        return "\n".join(lignes) + "\n"
+
+    # --- Thread de rapport ---
+    def demarrer(self, periode=2.0, periode_log=None, port=None):
+        """
+        periode : rafraîchissement du résumé (calque, HTTP)
+        periode_log : une ligne de log toutes les periode_log s (None = aucune)
+        port : serveur HTTP sur 127.0.0.1:port (None = aucun)
+        """
+        if port is not None:
+            from http.server import ThreadingHTTPServer  # Seulement si on sert les mesures
+            try:
+                self.serveur = ThreadingHTTPServer(("127.0.0.1", port), _gestionnaire(self))
+            except OSError as e:
+                print(f"Serveur de mesures indisponible sur le port {port} : {e}")
+            else:
+                self.serveur.daemon_threads = True
+                threading.Thread(target=self.serveur.serve_forever, daemon=True).start()
+        self.thread = threading.Thread(target=self._boucle, args=(periode, periode_log), daemon=True)
+        self.thread.start()
+
+    def _boucle(self, periode, periode_log):
+        prochain_log = time.monotonic() + (periode_log or 0)
+        while not self.arret.wait(periode):
+            self.resume = self.fenetre("ecran")
+            self.version += 1
+            if periode_log and time.monotonic() >= prochain_log:
+                prochain_log += periode_log
+                print(self.ligne(self.fenetre("log")))
+
+    def arreter(self):
+        self.arret.set()
+        if self.serveur is not None:
+            self.serveur.shutdown()
+            self.serveur.server_close()
+
+
+class VerrouMesure:
+    """threading.Lock qui compte la contention (with verrou: ... comme avant)."""
+
+    def __init__(self, instrumentation, nom):
+        self.instrumentation = instrumentation
+        self.nom = nom
+        self.verrou = threading.Lock()
+        self.nb_acquisitions = 0
+        self.nb_contentions = 0
+        self.attente = 0.0
+        self.detention = 0.0
+        self.t_acquis = 0.0
+        self.photos = {}
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.verrou.acquire(False):
+            t = time.perf_counter()
+        else:
+            # Déjà pris par l'autre thread : c'est ici que la contention se paie
+            t0 = time.perf_counter()
+            if not self.verrou.acquire(blocking, timeout):
+                return False
+            t = self.instrumentation.noter(f"attente {self.nom}", t0)
+            self.nb_contentions += 1
+            self.attente += t - t0
+        self.nb_acquisitions += 1
+        self.t_acquis = t
+        return True
+
+    def release(self):
+        self.detention += time.perf_counter() - self.t_acquis
+        self.verrou.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def fenetre(self, cle):
+        actuel = (self.nb_acquisitions, self.nb_contentions, self.attente, self.detention)
+        n0, c0, a0, d0 = self.photos.get(cle, (0, 0, 0.0, 0.0))
+        self.photos[cle] = actuel
+        n = actuel[0] - n0
+        return {
+            "acquisitions": n,
+            "contention": (actuel[1] - c0) / n if n else 0.0,
+            "attente_ms": 1000 * (actuel[2] - a0) / n if n else 0.0,
+            "detention_ms": 1000 * (actuel[3] - d0) / n if n else 0.0,
+        }
+
+
+def _gestionnaire(instrumentation):
+    from http.server import BaseHTTPRequestHandler
+
+    class Gestionnaire(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics"):
+                corps = instrumentation.metriques()
+            else:
+                corps = instrumentation.texte()
+            donnees = corps.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(donnees)))
+            self.end_headers()
+            self.wfile.write(donnees)
+
+        def log_message(self, *args):
+            pass  # Pas de ligne par requête dans la console
+    return Gestionnaire
+
+
+# ==========================================
+# CALQUE A L'ECRAN
+# ==========================================
+def dessiner_mesures(image, mesures):
+    """Une ligne par étape (p50 / p95 / part), pour un CalqueCache non opaque."""
+    import cv2  # Seulement avec un écran : les mesures n'en ont pas besoin
+    resume = mesures.resume
+    lignes = [f"{nom[:14]:<14} {e['p50_ms']:6.1f} {e['p95_ms']:6.1f} ms {e['part']:4.0%}"
+              for nom, e in resume.get("etapes", {}).items()]
+    for nom, v in resume.get("verrous", {}).items():
+        lignes.append(f"verrou {nom}: {v['contention']:.0%} contention")
+    lignes.append(f"IA occupee {mesures.duty_cycle():.0%}")
+    for i, texte in enumerate(lignes):
+        cv2.putText(image, texte, (4, 14 + 14 * i), cv2.FONT_HERSHEY_PLAIN, 0.9, (0, 255, 255), 1)
@@ -0,0 +1,71 @@
+import time
+import numpy as np
+
+# ==========================================
+# PORTE "MOUVEMENT" DEVANT L'IA
+# ==========================================
+# Dans une salle vide ou immobile, YOLO n'a rien de nouveau à dire.
+# On compare une vignette en niveaux de gris (1 pixel sur 8 -> 80x60)
+# à celle de la DERNIERE image réellement analysée :
+# - si assez de pixels ont changé -> on lance l'IA
+# - sinon on garde latest_boxes tel quel
+# - toutes les REFRESH_FORCE secondes on relance quand même l'IA
+#   (quelqu'un d'immobile ne doit pas "disparaître")
+# - forcer=True relance l'IA sans attendre (ex. piste du suivi plus vue : la personne
+#   est peut-être partie, le comptage ne doit pas attendre le prochain refresh)
+# Coût : quelques dizaines de µs par image, contre ~200 ms pour YOLO.
+
+class PorteMouvement:
+
+    def __init__(self, pas=8, seuil_pixel=18, seuil_fraction=0.004, refresh_force=10.0):
+        """
+        pas : sous-échantillonnage (8 -> 640x480 devient 80x60)
+        seuil_pixel : écart de niveau de gris (0-255) pour dire qu'un pixel a bougé
+        seuil_fraction : part des pixels qui doivent bouger pour relancer l'IA
+        refresh_force : secondes max entre deux inférences
+        """
+        self.pas = pas
+        self.seuil_pixel = seuil_pixel
+        self.seuil_fraction = seuil_fraction
+        self.refresh_force = refresh_force
+        self.reference = None          # Vignette de la dernière image analysée
+        self.derniere_analyse = 0.0
+        self.nb_analyses = 0
+        self.nb_sautees = 0
+        self.derniere_fraction = 0.0   # Pour le réglage des seuils
+
+    def _vignette(self, image):
+        petite = image[::self.pas, ::self.pas]
+        # Gris approché (B + 2G + R) / 4 en entiers : pas de float, pas de cv2
+        gris = petite[..., 0].astype(np.int16)
+        gris += petite[..., 1]
+        gris += petite[..., 1]
+        gris += petite[..., 2]
+        gris >>= 2
+        return gris
+
+    def doit_analyser(self, image, maintenant=None, forcer=False):
+        """True si l'IA doit tourner sur cette image."""
+        if maintenant is None:
+            maintenant = time.monotonic()
+        vignette = self._vignette(image)
+
+        if forcer or self.reference is None or maintenant - self.derniere_analyse >= self.refresh_force:
+            changement = True
+        else:
+            diff = np.abs(vignette - self.reference)
+            self.derniere_fraction = np.count_nonzero(diff > self.seuil_pixel) / diff.size
+            changement = self.derniere_fraction >= self.seuil_fraction
+
+        if changement:
+            self.reference = vignette
+            self.derniere_analyse = maintenant
+            self.nb_analyses += 1
+        else:
+            self.nb_sautees += 1
+        return changement
+
+    def taux_saut(self):
+        """Part des images pour lesquelles on a évité YOLO."""
+        total = self.nb_analyses + self.nb_sautees
+        return self.nb_sautees / total if total else 0.0
@@ -0,0 +1,299 @@
+import time
+import argparse
+import threading
+import numpy as np
+
+from echange_images import TamponImages
+from detection import (creer_detecteur, detecter_lot, tableau_detections, boites_entieres,
+                       AUCUNE_DETECTION)
+from cascade import creer_cascade, DetecteurCascade
+from mouvement import PorteMouvement
+from sources import ouvrir_source, Cadrage
+from suivi import SuiviPersonnes
+
+# ==========================================
+# PLUSIEURS CAMERAS, UN SEUL DETECTEUR (INFERENCE PAR LOTS)
+# ==========================================
+# Une grande salle (ou plusieurs petites) sur UN Pi :
+#   python multi_cameras.py picamera:0 picamera:1 webcam:0 videos/couloir.mp4 --noms nord sud ...
+# - chaque source a son thread de capture et son TamponImages (comme main() + tampon)
+# - UN thread d'inférence prend la dernière image NOUVELLE de chaque source et les passe
+#   toutes au détecteur en un seul appel (detecter_lot) : un seul modèle en mémoire,
+#   et le coût fixe d'un appel (préparation, lancement du graphe, threads du runtime)
+#   est partagé par toutes les caméras
+# - les détections repartent vers leur zone : cadrage, porte mouvement et suivi propres
+#   à chaque caméra -> un comptage par zone
+# Avec N ai_worker indépendants, on charge N modèles qui se disputent les mêmes coeurs
+# (et le GIL) : le débit par caméra s'effondre. --independant lance ce montage pour comparer.
+# Le lot n'est réellement groupé que par les backends qui le permettent : .pt (pytorch),
+# ONNX / OpenVINO exportés avec --dynamique (exporter_modele.py, fichiers "_personnes_lot"
+# choisis dès que lot > 1) ; les autres bouclent.
+
+
+class Zone:
+    """Une caméra et ce qui lui est propre (tampon, cadrage, porte, suivi, résultats)."""
+
+    def __init__(self, nom, source, cadrage, suivi=None, porte=None):
+        self.nom = nom
+        self.source = source
+        self.cadrage = cadrage
+        self.suivi = suivi
+        self.porte = porte
+        self.tampon = TamponImages(cadrage.forme_ia)
+        self.dernier_seq = 0
+        self.image = None                   # Dernière image d'affichage (None sans écran)
+        self.detections = AUCUNE_DETECTION  # Tableau figé, remplacé à chaque inférence
+        self.nb_personnes = 0
+        self.nb_images = 0
+        self.nb_inferences = 0
+        self.finie = False                  # Fin du rejeu (vidéo, dossier)
+
+
+class InferenceGroupee:
+
+    def __init__(self, zones, detecteur, lot_max=None):
+        """lot_max : nb max d'images par appel au détecteur (None = toutes les zones)"""
+        self.zones = zones
+        self.detecteur = detecteur
+        self.lot_max = lot_max or len(zones)
+        self.nouvelle = threading.Event()   # Une capture a publié (réveille l'inférence)
+        self.lock = threading.Lock()        # Résultats et images d'affichage des zones
+        self.arret = threading.Event()
+        self.threads = []
+        self.nb_lots = 0
+        self.nb_images_ia = 0
+        self.temps_inference = 0.0
+        self.t_debut = None
+
+    # --- Threads ---
+    def demarrer(self):
+        self.t_debut = time.monotonic()
+        for zone in self.zones:
+            zone.source.demarrer()
+            self.threads.append(threading.Thread(target=self._capturer, args=(zone,), daemon=True))
+        self.threads.append(threading.Thread(target=self._inferer, daemon=True))
+        for t in self.threads:
+            t.start()
+
+    def _capturer(self, zone):
+        while not self.arret.is_set():
+            image_ia, image = zone.source.lire_double()
+            if image_ia is None:
+                zone.finie = True
+                self.nouvelle.set()
+                return
+            zone.tampon.publier(image_ia, copie=False)
+            zone.nb_images += 1
+            if image is not None:
+                with self.lock:
+                    zone.image = image
+            self.nouvelle.set()
+
+    def _collecter(self):
+        """Dernière image nouvelle de chaque zone (slots épinglés), sans attendre."""
+        lot = []
+        for zone in self.zones:
+            seq, image = zone.tampon.attendre(zone.dernier_seq, timeout=0)
+            if image is None:
+                continue
+            if zone.porte is not None and not zone.porte.doit_analyser(
+                    image, forcer=zone.suivi is not None and zone.suivi.a_verifier()):
+                # Scène inchangée : les détections de la zone restent valables
+                zone.tampon.liberer(seq)
+                zone.dernier_seq = seq
+                continue
+            lot.append((zone, seq, image, time.monotonic()))
+        return lot
+
+    def _inferer(self):
+        try:
+            while not self.arret.is_set():
+                if not self.nouvelle.wait(0.5):
+                    continue
+                # Effacé AVANT la collecte : une image publiée pendant le lot relance un tour
+                self.nouvelle.clear()
+                lot = self._collecter()
+                for debut in range(0, len(lot), self.lot_max):
+                    self._traiter(lot[debut:debut + self.lot_max])
+        finally:
+            self.detecteur.arreter()
+
+    def _traiter(self, lot):
+        images = [image for _, _, image, _ in lot]
+        t0 = time.perf_counter()
+        try:
+            if isinstance(self.detecteur, DetecteurCascade):
+                # Le "désaccord" de la cascade se juge contre le suivi de CHAQUE caméra
+                references = [z.suivi.nb_vues() if z.suivi is not None else None
+                              for z, _, _, _ in lot]
+                resultats = self.detecteur.detecter_lot(images, references)
+            else:
+                resultats = detecter_lot(self.detecteur, images)
+        finally:
+            for zone, seq, _, _ in lot:
+                zone.tampon.liberer(seq)
+                zone.dernier_seq = seq
+        self.temps_inference += time.perf_counter() - t0
+        self.nb_lots += 1
+        self.nb_images_ia += len(lot)
+
+        for (zone, _, _, t_image), brut in zip(lot, resultats):
+            detections = tableau_detections(zone.cadrage.vers_affichage(brut))
+            if zone.suivi is not None:
+                detections = zone.suivi.mettre_a_jour(detections, t_image)
+            with self.lock:
+                zone.detections = detections
+                zone.nb_personnes = len(detections)
+            zone.nb_inferences += 1
+
+    def arreter(self):
+        self.arret.set()
+        for zone in self.zones:
+            zone.tampon.fermer()
+        for t in self.threads:
+            t.join(timeout=5)
+        for zone in self.zones:
+            zone.source.arreter()
+
+    # --- Résultats ---
+    def comptages(self):
+        """{zone: nb de personnes} (suivi si actif, sinon dernière inférence)."""
+        with self.lock:
+            return {z.nom: z.nb_personnes for z in self.zones}
+
+    def resultats(self, zone):
+        """(image d'affichage, détections) de la zone, sans copie."""
+        with self.lock:
+            return zone.image, zone.detections
+
+    def finie(self):
+        return all(z.finie for z in self.zones)
+
+    def etat(self):
+        duree = max(time.monotonic() - self.t_debut, 1e-9) if self.t_debut else 0.0
+        return {
+            "lots": self.nb_lots,
+            "images_par_lot": round(self.nb_images_ia / self.nb_lots, 2) if self.nb_lots else 0.0,
+            "ms_par_lot": round(1000 * self.temps_inference / self.nb_lots, 1) if self.nb_lots else 0.0,
+            "inferences_par_s": {z.nom: round(z.nb_inferences / duree, 2) if duree else 0.0
+                                 for z in self.zones},
+        }
+
+    def bilan(self):
+        e = self.etat()
+        par_camera = ", ".join(f"{nom} {hz:.1f} Hz" for nom, hz in e["inferences_par_s"].items())
+        return (f"Inférence groupée : {e['lots']} lots, {e['images_par_lot']:.1f} images/lot, "
+                f"{e['ms_par_lot']:.0f} ms/lot -> {par_camera}")
+
+
+# ==========================================
+# PROGRAMME PRINCIPAL
+# ==========================================
+def creer(args, forme, lot):
+    if args.modele_rapide:
+        return creer_cascade(args.mode, args.modele_rapide, args.modele, args.confidence,
+                             forme=forme, backend=args.backend, lot=lot)
+    return creer_detecteur(args.mode, args.modele, args.confidence, forme, args.backend, lot)
+
+def mosaique(groupes, zones, largeur=320, hauteur=240):
+    """Une vignette par caméra (boîtes + comptage), assemblées en grille de 2 colonnes."""
+    import cv2
+    vignettes = []
+    for zone in zones:
+        groupe = groupes[zone.nom]
+        image, detections = groupe.resultats(zone)
+        if image is None:
+            vignette = np.zeros((hauteur, largeur, 3), dtype=np.uint8)
+        else:
+            vignette = image.copy()
+            for (x1, y1, x2, y2) in boites_entieres(detections).tolist():
+                cv2.rectangle(vignette, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            vignette = cv2.resize(vignette, (largeur, hauteur), interpolation=cv2.INTER_AREA)
+        cv2.putText(vignette, f"{zone.nom}: {zone.nb_personnes}", (8, 24),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        vignettes.append(vignette)
+    if len(vignettes) % 2:
+        vignettes.append(np.zeros_like(vignettes[0]))
+    lignes = [np.hstack(vignettes[i:i + 2]) for i in range(0, len(vignettes), 2)]
+    return np.vstack(lignes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Comptage multi-caméras avec un seul détecteur")
+    parser.add_argument("sources", nargs="+",
+                        help="picamera:0, webcam:1, simulee:3, vidéo ou dossier d'images")
+    parser.add_argument("--noms", nargs="+", help="Nom de zone par source (défaut : zone1, zone2...)")
+    parser.add_argument("--modele", default="yolov8s.pt")
+    parser.add_argument("--modele-rapide", help="Active la cascade : ce modèle d'abord, --modele si doute")
+    parser.add_argument("--confidence", type=float, default=0.6)
+    parser.add_argument("--mode", default="thread", choices=["thread", "processus"])
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--largeur-ia", type=int, default=640)
+    parser.add_argument("--lot-max", type=int, help="Images max par inférence (défaut : nb de sources)")
+    parser.add_argument("--cadence", default="reel", choices=["max", "reel"])
+    parser.add_argument("--sans-porte", action="store_true", help="Désactive la porte mouvement")
+    parser.add_argument("--sans-suivi", action="store_true")
+    parser.add_argument("--headless", action="store_true", help="Pas de fenêtre : comptages dans la console")
+    parser.add_argument("--duree", type=float, help="Arrêt au bout de N secondes")
+    parser.add_argument("--independant", action="store_true",
+                        help="Comparaison : un détecteur et un thread d'inférence par caméra")
+    args = parser.parse_args()
+
+    noms = args.noms or [f"zone{i + 1}" for i in range(len(args.sources))]
+    if len(noms) != len(args.sources):
+        parser.error("--noms : un nom par source")
+
+    zones = []
+    for nom, spec in zip(noms, args.sources):
+        cadrage = Cadrage((640, 480), args.largeur_ia)
+        source = ouvrir_source(spec, cadence=args.cadence, cadrage=cadrage, affichage=not args.headless)
+        zones.append(Zone(nom, source, cadrage,
+                          suivi=None if args.sans_suivi else SuiviPersonnes(),
+                          porte=None if args.sans_porte else PorteMouvement()))
+
+    print(f"Chargement du modèle {args.modele} ({len(zones)} caméras)...")
+    if args.independant:
+        groupes = [InferenceGroupee([zone], creer(args, zone.cadrage.forme_ia, 1)) for zone in zones]
+    else:
+        lot = args.lot_max or len(zones)
+        groupes = [InferenceGroupee(zones, creer(args, zones[0].cadrage.forme_ia, lot), lot)]
+    par_zone = {zone.nom: g for g in groupes for zone in g.zones}
+    for g in groupes:
+        g.demarrer()
+
+    WINDOW_NAME = "Smart Energy - Multi-caméras"
+    if not args.headless:
+        import cv2
+        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+    t_fin = time.monotonic() + args.duree if args.duree else None
+    prochain_log = time.monotonic()
+    try:
+        while not all(g.finie() for g in groupes):
+            if t_fin is not None and time.monotonic() >= t_fin:
+                break
+            if args.headless:
+                time.sleep(0.1)
+            else:
+                cv2.imshow(WINDOW_NAME, mosaique(par_zone, zones))
+                if cv2.waitKey(30) & 0xFF == ord('q'):
+                    break
+            if time.monotonic() >= prochain_log:
+                prochain_log += 1.0
+                comptes = {}
+                for g in groupes:
+                    comptes.update(g.comptages())
+                print(" | ".join(f"{nom}: {n}" for nom, n in comptes.items())
+                      + f" | total: {sum(comptes.values())}")
+    except KeyboardInterrupt:
+        print("Arrêt...")
+    finally:
+        for g in groupes:
+            g.arreter()
+            print(g.bilan())
+            if isinstance(g.detecteur, DetecteurCascade):
+                print(g.detecteur.bilan())
+        if not args.headless:
+            cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
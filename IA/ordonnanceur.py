@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+from collections import deque
+
+# ==========================================
+# ORDONNANCEUR ADAPTATIF DE L'IA
+# ==========================================
+# Au lieu d'enchaîner les inférences aussi vite que possible, on choisit une
+# cadence (Hz) selon ce dont les consommateurs ont VRAIMENT besoin :
+# - la régulation : 2 inférences par période de régulation suffisent
+# - l'écran : s'il est allumé, on monte à CADENCE_AFFICHAGE
+# - l'activité : si le comptage vient de changer, on monte à cadence_max
+# ... puis on freine selon l'état du Pi (sysfs) :
+# - température CPU entre temp_debut et temp_max -> cadence réduite jusqu'à cadence_min
+#   (le Pi 5 commence à brider son CPU vers 80-85°C)
+# - charge moyenne > nb de coeurs -> cadence réduite
+# La cadence monte vite (x2) et redescend doucement (x0.8) pour éviter le pompage.
+
+FICHIER_TEMP = "/sys/class/thermal/thermal_zone0/temp"
+
+
+def lire_temperature_cpu():
+    """Température CPU en °C, None hors Raspberry Pi."""
+    try:
+        with open(FICHIER_TEMP) as f:
+            return int(f.read().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+def lire_charge():
+    """Charge moyenne sur 1 min rapportée au nombre de coeurs (1.0 = CPU plein)."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return None
+
+
+class Ordonnanceur:
+
+    def __init__(self, periode_regulation=None, affichage=True, cadence_affichage=5.0,
+                 cadence_min=0.2, cadence_max=10.0, fenetre_activite=30.0,
+                 temp_debut=70.0, temp_max=80.0, periode_capteurs=5.0):
+        self.periode_regulation = periode_regulation
+        self.affichage = affichage
+        self.cadence_affichage = cadence_affichage
+        self.cadence_min = cadence_min
+        self.cadence_max = cadence_max
+        self.fenetre_activite = fenetre_activite
+        self.temp_debut = temp_debut
+        self.temp_max = temp_max
+        self.periode_capteurs = periode_capteurs
+
+        self.cadence = cadence_max          # Cadence courante (Hz)
+        self.cadence_cible = cadence_max
+        self.temperature = None
+        self.charge = None
+        self.dernier_compte = None
+        self.changements = deque()          # Instants des changements de comptage
+        self.inferences = deque()           # (début, fin) sur la fenêtre de mesure
+        self.fenetre_duty = 10.0
+        self.prochain = 0.0
+        self.derniere_lecture = 0.0
+        self.lock = threading.Lock()
+
+    # --- Besoins des consommateurs ---
+    def _besoin(self, maintenant):
+        besoins = [self.cadence_min]
+        if self.periode_regulation:
+            besoins.append(2.0 / self.periode_regulation)
+        if self.affichage:
+            besoins.append(self.cadence_affichage)
+        while self.changements and maintenant - self.changements[0] > self.fenetre_activite:
+            self.changements.popleft()
+        if self.changements:
+            # Plus le comptage bouge, plus on se rapproche de cadence_max
+            activite = min(1.0, len(self.changements) / 5.0)
+            besoins.append(self.cadence_min + activite * (self.cadence_max - self.cadence_min))
+        return min(max(besoins), self.cadence_max)
+
+    # --- Contraintes du Pi ---
+    def _frein(self, maintenant):
+        if maintenant - self.derniere_lecture >= self.periode_capteurs:
+            self.temperature = lire_temperature_cpu()
+            self.charge = lire_charge()
+            self.derniere_lecture = maintenant
+        frein = 1.0
+        if self.temperature is not None and self.temperature > self.temp_debut:
+            frein = max(0.0, (self.temp_max - self.temperature) / (self.temp_max - self.temp_debut))
+        if self.charge is not None and self.charge > 1.0:
+            frein = min(frein, 1.0 / self.charge)
+        return frein
+
+    def _recalculer(self, maintenant):
+        besoin = self._besoin(maintenant)
+        frein = self._frein(maintenant)
+        self.cadence_cible = max(self.cadence_min, besoin * frein)
+        if self.cadence_cible > self.cadence:
+            self.cadence = min(self.cadence_cible, self.cadence * 2.0)
+        else:
+            self.cadence = max(self.cadence_cible, self.cadence * 0.8)
+
+    # --- API pour ai_worker ---
+    def attendre_creneau(self, arret=None):
+        """Bloque jusqu'au prochain créneau d'inférence (réveillé si `arret` est posé)."""
+        with self.lock:
+            self._recalculer(time.monotonic())
+            attente = self.prochain - time.monotonic()
+        if attente > 0:
+            if arret is not None:
+                arret.wait(attente)
+            else:
+                time.sleep(attente)
+
+    def noter_inference(self, debut, fin, compte):
+        """A appeler après chaque inférence (instants time.monotonic())."""
+        with self.lock:
+            self.inferences.append((debut, fin))
+            while self.inferences and fin - self.inferences[0][0] > self.fenetre_duty:
+                self.inferences.popleft()
+            if self.dernier_compte is not None and compte != self.dernier_compte:
+                self.changements.append(fin)
+            self.dernier_compte = compte
+            self.prochain = debut + 1.0 / self.cadence
+
+    def noter_affichage(self, actif):
+        with self.lock:
+            self.affichage = actif
+
+    def duty_cycle(self):
+        """Part du temps passée à inférer sur la fenêtre récente (0-1)."""
+        with self.lock:
+            if not self.inferences:
+                return 0.0
+            occupe = sum(f - d for d, f in self.inferences)
+            duree = max(time.monotonic() - self.inferences[0][0], 1e-6)
+            return min(1.0, occupe / duree)
+
+    def etat(self):
+        return {
+            "cadence": round(self.cadence, 2),
+            "cadence_cible": round(self.cadence_cible, 2),
+            "duty_cycle": round(self.duty_cycle(), 3),
+            "temperature_cpu": self.temperature,
+            "charge": None if self.charge is None else round(self.charge, 2),
+        }
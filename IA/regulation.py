@@ -0,0 +1,150 @@
+import json
+import time
+from collections import namedtuple
+import numpy as np
+
+from historique import ACTIONS
+
+# ==========================================
+# MOTEUR DE REGULATION (TABLE + HYSTERESIS)
+# ==========================================
+# - TABLE : saison x tranche d'occupation -> cible, ventilation, marge, état, couleur.
+#   La config (dict du script ou fichier JSON) est dépliée UNE fois en tableaux NumPy
+#   indexés par [saison, nb de personnes] : plus de chaîne de if/elif à chaque image.
+# - HYSTERESIS avec mémoire : entre les deux seuils on GARDE l'état précédent du CVC
+#   (avant : "ZONE CONFORT" = arrêt immédiat, donc marche/arrêt en rafale autour du seuil),
+#   plus des durées minimales de marche et d'arrêt (protection du compresseur).
+# - Plusieurs pièces en un seul pas NumPy : pas(saisons, personnes, températures).
+#
+# Format d'une saison dans la config :
+#   "ETE": {"sens": "FROID", "bandes": [(personnes_min, cible, ventilation, marge[, etat[, couleur]]), ...]}
+#   sens : "FROID" (clim), "CHAUD" (chauffage) ou "VENTILATION" (jamais de marche)
+
+Consigne = namedtuple("Consigne", ["cible", "seuil_on", "seuil_off", "ventilation", "etat", "couleur"])
+SENS = {"FROID": 1, "CHAUD": -1, "VENTILATION": 0}
+ACTION = {nom: i for i, nom in enumerate(ACTIONS)}
+
+
+class TableRegulation:
+
+    def __init__(self, config, nb_max=50):
+        """nb_max : au-delà, l'occupation est comptée comme nb_max personnes"""
+        self.saisons = list(config)
+        self.index = {s: i for i, s in enumerate(self.saisons)}
+        self.nb_max = nb_max
+        forme = (len(self.saisons), nb_max + 1)
+        self.cible = np.zeros(forme, dtype=np.float64)
+        self.marge = np.zeros(forme, dtype=np.float64)
+        self.ventilation = np.empty(forme, dtype=object)
+        self.etat = np.empty(forme, dtype=object)
+        self.couleur = np.empty(forme, dtype=object)
+        self.sens = np.zeros(len(self.saisons), dtype=np.int8)
+
+        for i, saison in enumerate(self.saisons):
+            self.sens[i] = SENS[config[saison]["sens"]]
+            bandes = sorted(config[saison]["bandes"], key=lambda b: b[0])
+            if bandes[0][0] != 0:
+                raise ValueError(f"{saison} : la première tranche doit commencer à 0 personne")
+            for j, bande in enumerate(bandes):
+                debut = int(bande[0])
+                fin = int(bandes[j + 1][0]) if j + 1 < len(bandes) else nb_max + 1
+                etat = bande[4] if len(bande) > 4 else ""
+                couleur = tuple(bande[5]) if len(bande) > 5 else (255, 255, 255)
+                self.cible[i, debut:fin] = bande[1]
+                self.marge[i, debut:fin] = bande[3]
+                for n in range(debut, min(fin, nb_max + 1)):
+                    self.ventilation[i, n] = bande[2]
+                    self.etat[i, n] = etat
+                    self.couleur[i, n] = couleur
+        # Seuils précalculés : clim -> marche au-dessus de cible + marge, chauffage en dessous
+        sens = self.sens[:, None].astype(np.float64)
+        self.seuil_on = np.round(self.cible + sens * self.marge, 2)
+        self.seuil_off = np.round(self.cible - sens * self.marge, 2)
+
+    def indices(self, saisons, personnes):
+        """(saisons, personnes) -> indices de lignes et colonnes de la table (scalaires ou tableaux)."""
+        if isinstance(saisons, str):
+            s = self.index[saisons]
+        elif isinstance(saisons, np.ndarray) and saisons.dtype.kind in "iu":
+            s = saisons             # Déjà des indices (simulation de nombreuses pièces)
+        else:
+            s = np.array([self.index[x] for x in saisons])
+        n = np.clip(np.asarray(personnes, dtype=np.intp), 0, self.nb_max)
+        return s, n
+
+    def consigne(self, saison, personnes):
+        """Ligne de la table pour une pièce."""
+        s, n = self.indices(saison, personnes)
+        return Consigne(round(float(self.cible[s, n]), 2), float(self.seuil_on[s, n]),
+                        float(self.seuil_off[s, n]), self.ventilation[s, n],
+                        self.etat[s, n], self.couleur[s, n])
+
+
+def charger_table(source, nb_max=50):
+    """source : dict de config, ou chemin d'un fichier JSON du même format."""
+    if isinstance(source, str):
+        with open(source) as f:
+            source = json.load(f)
+    return TableRegulation(source, nb_max)
+
+
+def basculer(marche, t_bascule, t, temperatures, sens, seuil_on, seuil_off,
+             duree_min_marche, duree_min_arret):
+    """
+    Règle commune au régulateur et au simulateur (simulation.py), sur des tableaux :
+    retourne (bascule, depasse) -> les pièces qui changent d'état, et celles au-delà
+    du seuil d'arrêt.
+    """
+    connue = ~np.isnan(temperatures)
+    with np.errstate(invalid="ignore"):
+        demande_on = connue & (sens * (temperatures - seuil_on) > 0)
+        depasse = connue & (sens * (temperatures - seuil_off) < 0)
+    # Entre les seuils : l'état précédent est conservé (vraie hystérésis)
+    voulu = np.where(marche, connue & (sens != 0) & ~depasse, demande_on)
+    ecoule = t - t_bascule
+    autorise = np.where(marche, ecoule >= duree_min_marche, ecoule >= duree_min_arret)
+    # Capteur muet ou mode ventilation : arrêt sans attendre
+    bascule = (voulu != marche) & (autorise | ~connue | (sens == 0))
+    return bascule, depasse
+
+
+class Hysteresis:
+    """Contrôleurs marche/arrêt de nb_pieces pièces, mis à jour ensemble."""
+
+    def __init__(self, table, nb_pieces=1, duree_min_marche=180.0, duree_min_arret=180.0):
+        """duree_min_marche / duree_min_arret : secondes avant de pouvoir rebasculer"""
+        self.table = table
+        self.duree_min_marche = duree_min_marche
+        self.duree_min_arret = duree_min_arret
+        self.marche = np.zeros(nb_pieces, dtype=bool)
+        self.t_bascule = np.full(nb_pieces, -np.inf)
+        self.nb_cycles = np.zeros(nb_pieces, dtype=np.int64)   # Démarrages du CVC
+
+    def pas(self, saisons, personnes, temperatures, t=None):
+        """
+        Un pas pour toutes les pièces (température NaN = capteur muet -> arrêt).
+        Retourne (marche, actions) : booléens et indices dans ACTIONS.
+        """
+        t = time.monotonic() if t is None else t
+        s, n = self.table.indices(saisons, personnes)
+        sens = self.table.sens[s]
+        temperatures = np.asarray(temperatures, dtype=np.float64)
+        connue = ~np.isnan(temperatures)
+        bascule, depasse = basculer(self.marche, self.t_bascule, t, temperatures, sens,
+                                    self.table.seuil_on[s, n], self.table.seuil_off[s, n],
+                                    self.duree_min_marche, self.duree_min_arret)
+        self.nb_cycles += bascule & ~self.marche
+        self.marche = self.marche ^ bascule
+        self.t_bascule = np.where(bascule, t, self.t_bascule)
+
+        actions = np.full(self.marche.shape, ACTION["ZONE CONFORT"], dtype=np.int8)
+        actions[depasse & ~self.marche] = ACTION["STOP (MAX)"]
+        actions[self.marche & (sens < 0)] = ACTION["CHAUFFE"]
+        actions[self.marche & (sens > 0)] = ACTION["CLIM ON"]
+        actions[~connue] = ACTION["STANDBY"]
+        return self.marche.copy(), actions
+
+    def decider(self, saison, personnes, temperature, t=None):
+        """Une seule pièce : (Consigne, texte de l'action)."""
+        _, actions = self.pas([saison], [personnes], [np.nan if temperature is None else temperature], t)
+        return self.table.consigne(saison, personnes), ACTIONS[actions[0]]
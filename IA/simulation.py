@@ -0,0 +1,298 @@
+import csv
+import json
+import time
+import argparse
+import datetime
+import itertools
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from regulation import TableRegulation, basculer
+
+# ==========================================
+# SIMULATEUR DE POLITIQUES DE REGULATION
+# ==========================================
+# Évalue des réglages (ETE_VIDE, HIVER_CONFORT, MARGE, tranches d'occupation...) sur
+# des mois de données en quelques secondes, sans toucher au vrai CVC :
+# - TRACES : occupation + température extérieure, synthétiques (climat type Toulon),
+#   relues de l'historique du régulateur (occupation), ou d'un CSV "t,personnes,exterieur"
+# - PIECE : modèle thermique 1R1C (déperditions vers l'extérieur, 100 W par personne,
+#   puissance du CVC) intégré pas à pas
+# - POLITIQUES : grille de paramètres -> une table de régulation chacune ; les cibles et
+#   seuils de TOUS les pas de temps sont calculés d'un coup (indexation NumPy), puis la
+#   boucle temporelle avance toutes les politiques ensemble (une colonne par politique),
+#   avec la même règle d'hystérésis que le régulateur (regulation.basculer)
+# - sortie par politique : énergie (kWh), minutes d'inconfort (salle occupée hors de la
+#   zone de confort), nombre de démarrages du CVC
+#
+# Exemples :
+#   python simulation.py --jours 365 --grille MARGE=0.3,0.5,1.0 ETE_VIDE=27,28,29 HIVER_CONFORT=19,20
+#   python simulation.py --famille essaie --grille BAISSE_PAR_PERSONNE=0,0.1,0.2 --processus 4
+#   python simulation.py --historique "../Reglage IA/historique" --jours 30 --grille MARGE=0.5,1.0
+
+# Réglages actuels de Reglage IA/regulateur.py (point de départ de la grille)
+PARAMETRES_REGULATEUR = {
+    "ETE_VIDE": 29.0, "ETE_CONFORT": 25.0, "ETE_COMPENS": 24.0, "ETE_FOULE": 23.0,
+    "HIVER_VIDE": 15.0, "HIVER_CONFORT": 19.0, "HIVER_COMPENS": 18.0, "HIVER_FOULE": 17.0,
+    "MARGE": 0.5, "BANDE_CONFORT": 1, "BANDE_COMPENS": 5, "BANDE_FOULE": 10,
+}
+# Réglages actuels de Reglage IA/essaie.py (PARAMS + 1 personne = -0.1 °C)
+PARAMETRES_ESSAIE = {"ETE": 25.0, "HIVER": 20.0, "BAISSE_PAR_PERSONNE": 0.1, "MARGE": 0.5}
+
+MODELE_PIECE = {
+    "tau_h": 8.0,               # Constante de temps de la pièce (isolation x inertie)
+    "capacite_kj_k": 8000.0,    # Inertie thermique (air + murs + mobilier)
+    "puissance_w": 5000.0,      # Puissance thermique du CVC en marche
+    "gain_personne_w": 100.0,   # 1 personne = ~100 W (cf. essaie.py)
+    "cop": 3.0,                 # Électricité consommée = chaleur déplacée / COP
+}
+ZONES_CONFORT = {"HIVER": (19.0, 24.0), "ETE": (20.0, 26.0)}
+NB_MAX = 50
+
+
+def saison_du_mois(mois):
+    """Même règle que get_saison_automatique() du régulateur."""
+    return "ETE" if 5 <= mois <= 9 else "HIVER"
+
+
+# ==========================================
+# POLITIQUES
+# ==========================================
+def table_regulateur(p):
+    """Config au format de TABLE_REGULATION (regulateur.py) à partir de paramètres."""
+    bandes = lambda s: [
+        (0, p[f"{s}_VIDE"], "ECO", p["MARGE"]),
+        (p["BANDE_CONFORT"], p[f"{s}_CONFORT"], "MOYEN", p["MARGE"]),
+        (p["BANDE_COMPENS"], p[f"{s}_COMPENS"], "FORT", p["MARGE"]),
+        (p["BANDE_FOULE"], p[f"{s}_FOULE"], "MAX", p["MARGE"]),
+    ]
+    return {"ETE": {"sens": "FROID", "bandes": bandes("ETE")},
+            "HIVER": {"sens": "CHAUD", "bandes": bandes("HIVER")}}
+
+def table_essaie(p):
+    """Config au format de TABLE_REGULATION (essaie.py) : une tranche par occupant."""
+    return {s: {"sens": sens, "bandes": [
+        (n, p[s] - n * p["BAISSE_PAR_PERSONNE"], 0, p["MARGE"]) for n in range(NB_MAX + 1)]}
+        for s, sens in (("ETE", "FROID"), ("HIVER", "CHAUD"))}
+
+FAMILLES = {"regulateur": (PARAMETRES_REGULATEUR, table_regulateur),
+            "essaie": (PARAMETRES_ESSAIE, table_essaie)}
+
+
+def grille(famille, valeurs):
+    """valeurs : {param: [v1, v2...]} -> liste de (paramètres, config), produit cartésien."""
+    defauts, fabrique = FAMILLES[famille]
+    noms = list(valeurs)
+    politiques = []
+    for combinaison in itertools.product(*(valeurs[n] for n in noms)):
+        p = dict(defauts, **dict(zip(noms, combinaison)))
+        politiques.append(({n: p[n] for n in noms}, fabrique(p)))
+    return politiques
+
+
+# ==========================================
+# TRACES
+# ==========================================
+def traces_synthetiques(jours=365, pas=300.0, debut=None, graine=0):
+    """Climat méditerranéen + salle occupée en semaine (8h-18h, creux à midi)."""
+    rng = np.random.default_rng(graine)
+    if debut is None:
+        debut = time.mktime(datetime.date(datetime.date.today().year, 1, 1).timetuple())
+    t = debut + np.arange(int(jours * 86400 / pas)) * pas
+    local = t - time.timezone
+    jour_an = (local % (365.25 * 86400)) / 86400.0
+    heure = local % 86400 / 3600.0
+    # Extérieur : 16 °C de moyenne, ±8 °C sur l'année (creux mi-janvier), ±4 °C dans la journée (max 15h)
+    journee = max(1, int(86400 / pas))
+    bruit = np.cumsum(rng.normal(0, 0.05, len(t)))
+    bruit -= np.convolve(bruit, np.ones(journee) / journee, mode="same")    # Dérive lente retirée
+    exterieur = (16 - 8 * np.cos(2 * np.pi * (jour_an - 15) / 365.25)
+                 - 4 * np.cos(2 * np.pi * (heure - 15) / 24) + bruit)
+    # Occupation : Poisson autour d'un profil horaire, rien le week-end (epoch = jeudi)
+    ouvre = (local // 86400 + 3) % 7 < 5
+    profil = np.where((heure >= 8) & (heure < 18), 8.0, 0.0) * np.where((heure >= 12) & (heure < 14), 0.4, 1.0)
+    personnes = np.where(ouvre, rng.poisson(profil), 0)
+    return {"t": t, "personnes": personnes, "exterieur": exterieur, "interieur": None}
+
+def traces_csv(chemin, pas=300.0):
+    """CSV avec en-tête t,personnes,exterieur[,interieur] (t = secondes epoch)."""
+    with open(chemin, newline="") as f:
+        lignes = list(csv.DictReader(f))
+    colonnes = {k: np.array([float(l[k]) for l in lignes]) for k in lignes[0]}
+    return reechantillonner(colonnes, pas)
+
+def traces_historique(dossier, debut, fin, pas=300.0, graine=0):
+    """
+    Occupation (et température intérieure de départ) relues de l'historique du régulateur.
+    L'extérieur n'y est pas enregistré : climat synthétique aux mêmes dates.
+    """
+    from historique import Historique
+    lignes = Historique(dossier).lire(debut, fin)
+    if len(lignes) == 0:
+        raise ValueError(f"Historique vide entre {debut} et {fin}")
+    traces = reechantillonner({"t": lignes["t"], "personnes": lignes["personnes"].astype(np.float64),
+                               "interieur": lignes["temperature"].astype(np.float64)}, pas)
+    climat = traces_synthetiques((traces["t"][-1] - traces["t"][0]) / 86400 + 1, pas,
+                                 debut=traces["t"][0], graine=graine)
+    traces["exterieur"] = climat["exterieur"][:len(traces["t"])]
+    return traces
+
+def reechantillonner(colonnes, pas):
+    """Moyenne par case de pas secondes ; cases vides = valeur précédente."""
+    t = colonnes["t"]
+    cases = ((t - t[0]) // pas).astype(np.intp)
+    nb = cases[-1] + 1
+    sortie = {"t": t[0] + np.arange(nb) * pas}
+    for nom, v in colonnes.items():
+        if nom == "t":
+            continue
+        ok = ~np.isnan(v)
+        somme = np.bincount(cases[ok], v[ok], minlength=nb)
+        compte = np.bincount(cases[ok], minlength=nb)
+        moyenne = np.where(compte > 0, somme / np.maximum(compte, 1), np.nan)
+        # Trou dans les données : on prolonge la dernière valeur connue
+        idx = np.where(compte > 0, np.arange(nb), 0)
+        np.maximum.accumulate(idx, out=idx)
+        sortie[nom] = moyenne[idx]
+    sortie["personnes"] = np.rint(np.nan_to_num(sortie["personnes"])).astype(np.intp)
+    sortie.setdefault("interieur", None)
+    return sortie
+
+
+# ==========================================
+# SIMULATION
+# ==========================================
+def simuler(traces, configs, pas=300.0, modele=MODELE_PIECE, zones=ZONES_CONFORT,
+            duree_min_marche=180.0, duree_min_arret=180.0):
+    """
+    Toutes les politiques (configs) avancent ensemble dans le temps.
+    Retourne une liste de dicts : energie_kwh, minutes_inconfort, cycles, heures_marche.
+    """
+    t = traces["t"]
+    personnes = np.clip(traces["personnes"], 0, NB_MAX)
+    exterieur = traces["exterieur"]
+    nb_pas, nb_pol = len(t), len(configs)
+    mois = (t - time.timezone).astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) % 12
+    saisons = np.array([saison_du_mois(m) for m in range(1, 13)])[mois]
+    noms = sorted(set(saisons))
+    s_t = np.searchsorted(noms, saisons)
+
+    # Cibles / seuils / sens de chaque pas pour chaque politique : (nb_pas, nb_pol), sans boucle sur t
+    seuil_on = np.empty((nb_pas, nb_pol))
+    seuil_off = np.empty((nb_pas, nb_pol))
+    sens = np.empty((nb_pas, nb_pol))
+    for p, config in enumerate(configs):
+        table = TableRegulation(config, NB_MAX)
+        lignes = np.array([table.index[s] for s in noms])[s_t]
+        seuil_on[:, p] = table.seuil_on[lignes, personnes]
+        seuil_off[:, p] = table.seuil_off[lignes, personnes]
+        sens[:, p] = table.sens[lignes]
+    bas = np.array([zones[s][0] for s in noms])[s_t]
+    haut = np.array([zones[s][1] for s in noms])[s_t]
+    occupe = personnes > 0
+
+    # Modèle 1R1C : dT = pas * ((Text - T) / tau + (gains + P_cvc) / C)
+    k_pertes = pas / (modele["tau_h"] * 3600)
+    k_chaleur = pas / (modele["capacite_kj_k"] * 1000)
+    gains = modele["gain_personne_w"] * personnes
+    puissance = modele["puissance_w"]
+
+    depart = traces["interieur"][0] if traces["interieur"] is not None else np.nan
+    interieur = np.full(nb_pol, depart if not np.isnan(depart) else 20.0)
+    marche = np.zeros(nb_pol, dtype=bool)
+    t_bascule = np.full(nb_pol, -np.inf)
+    pas_marche = np.zeros(nb_pol, dtype=np.int64)
+    pas_inconfort = np.zeros(nb_pol, dtype=np.int64)
+    cycles = np.zeros(nb_pol, dtype=np.int64)
+
+    for i in range(nb_pas):
+        bascule, _ = basculer(marche, t_bascule, t[i], interieur, sens[i], seuil_on[i], seuil_off[i],
+                              duree_min_marche, duree_min_arret)
+        if bascule.any():
+            cycles += bascule & ~marche
+            marche ^= bascule
+            t_bascule[bascule] = t[i]
+        pas_marche += marche
+        if occupe[i]:
+            pas_inconfort += (interieur < bas[i]) | (interieur > haut[i])
+        # Clim (sens +1) retire de la chaleur, chauffage (sens -1) en ajoute
+        interieur += k_pertes * (exterieur[i] - interieur) + k_chaleur * (gains[i] - sens[i] * puissance * marche)
+
+    heures = pas_marche * pas / 3600
+    return [{"energie_kwh": round(float(h * puissance / modele["cop"] / 1000), 1),
+             "minutes_inconfort": int(m * pas / 60),
+             "cycles": int(c),
+             "heures_marche": round(float(h), 1)}
+            for h, m, c in zip(heures, pas_inconfort, cycles)]
+
+
+def simuler_en_parallele(traces, configs, processus=1, **options):
+    """Découpe les politiques en paquets, un processus par paquet."""
+    if processus <= 1 or len(configs) < 2 * processus:
+        return simuler(traces, configs, **options)
+    paquets = [configs[i::processus] for i in range(processus)]
+    with ProcessPoolExecutor(processus) as pool:
+        resultats = list(pool.map(partial(simuler, traces, **options), paquets))
+    # Remise dans l'ordre d'origine (paquet i = politiques i, i + processus, ...)
+    sortie = [None] * len(configs)
+    for i, res in enumerate(resultats):
+        sortie[i::processus] = res
+    return sortie
+
+
+def lire_grille(textes):
+    """['MARGE=0.3,0.5', 'ETE_VIDE=28'] -> {'MARGE': [0.3, 0.5], 'ETE_VIDE': [28.0]}"""
+    valeurs = {}
+    for texte in textes:
+        nom, _, liste = texte.partition("=")
+        valeurs[nom.upper()] = [float(v) if "." in v else int(v) for v in liste.split(",")]
+    return valeurs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulateur de politiques de régulation")
+    parser.add_argument("--famille", default="regulateur", choices=list(FAMILLES))
+    parser.add_argument("--grille", nargs="*", default=[], help="PARAM=v1,v2,... (produit cartésien)")
+    parser.add_argument("--jours", type=float, default=365)
+    parser.add_argument("--pas", type=float, default=300.0, help="Pas de simulation (s)")
+    parser.add_argument("--csv", help="Traces CSV t,personnes,exterieur[,interieur]")
+    parser.add_argument("--historique", help="Dossier d'historique du régulateur (occupation réelle)")
+    parser.add_argument("--duree-min", type=float, default=180.0, help="Durée min de marche / d'arrêt (s)")
+    parser.add_argument("--processus", type=int, default=1)
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--sortie", help="Fichier JSON (sinon stdout)")
+    args = parser.parse_args()
+
+    if args.csv:
+        traces = traces_csv(args.csv, args.pas)
+    elif args.historique:
+        fin = time.time()
+        traces = traces_historique(args.historique, fin - args.jours * 86400, fin, args.pas, args.graine)
+    else:
+        traces = traces_synthetiques(args.jours, args.pas, graine=args.graine)
+    politiques = grille(args.famille, lire_grille(args.grille))
+
+    t0 = time.perf_counter()
+    resultats = simuler_en_parallele(traces, [c for _, c in politiques], args.processus, pas=args.pas,
+                                     duree_min_marche=args.duree_min, duree_min_arret=args.duree_min)
+    duree = time.perf_counter() - t0
+
+    lignes = [dict(parametres=p, **r) for (p, _), r in zip(politiques, resultats)]
+    lignes.sort(key=lambda l: (l["minutes_inconfort"], l["energie_kwh"]))
+    texte = json.dumps({
+        "famille": args.famille,
+        "jours": round(len(traces["t"]) * args.pas / 86400, 1),
+        "pas": args.pas,
+        "nb_politiques": len(lignes),
+        "duree_s": round(duree, 2),
+        "politiques": lignes,
+    }, indent=2, ensure_ascii=False)
+    if args.sortie:
+        with open(args.sortie, "w") as f:
+            f.write(texte)
+    print(texte)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import os
+import glob
+import time
+import numpy as np
+
+# ==========================================
+# SOURCES D'IMAGES
+# ==========================================
+# Même interface pour la caméra du Pi, une webcam, une vidéo enregistrée
+# ou un dossier d'images :
+#   source.demarrer()
+#   image = source.lire()     -> tableau HxWx3 (BGR), None = fin de la source
+#   source.arreter()
+# cadence="reel" : on respecte le FPS de l'enregistrement (comme une caméra)
+# cadence="max"  : on débite aussi vite que possible (benchmark)
+# Les sources enregistrées (vidéo, dossier) et les webcams rendent TOUJOURS des images
+# à `taille` : une vidéo 1280x720 est réduite sans déformation, avec des bandes noires
+# (mettre_a_taille) -> boîtes, zones et suivi restent dans le repère du Cadrage.
+#
+# DOUBLE FLUX (IA + affichage) :
+#   image_ia, image_affichage = source.lire_double()
+# - image_ia : petite image à la taille d'entrée du modèle, limitée à la zone
+#   d'intérêt (ROI) -> YOLO ne redimensionne plus une image 640x480 entière
+# - image_affichage : flux complet, None si pas d'écran (HEADLESS)
+# La caméra du Pi produit les deux flux directement (flux "lores" de l'ISP) ;
+# les autres sources dérivent l'image IA de l'image complète (SourceDouble).
+
+
+# ==========================================
+# CADRAGE IA (TAILLE + ZONE D'INTERET)
+# ==========================================
+class Cadrage:
+
+    def __init__(self, taille_affichage=(640, 480), largeur_ia=640, roi=None):
+        """
+        taille_affichage : (largeur, hauteur) du flux complet
+        largeur_ia : largeur de l'image IA (= imgsz du modèle exporté)
+        roi : (x, y, largeur, hauteur) en fractions du champ (0-1), None = tout le champ
+        La hauteur IA suit les proportions de la ROI (pas de déformation des silhouettes).
+        """
+        self.taille_affichage = taille_affichage
+        self.roi = roi or (0.0, 0.0, 1.0, 1.0)
+        rx, ry, rl, rh = self.roi
+        la, ha = taille_affichage
+        self.largeur_ia = largeur_ia
+        self.hauteur_ia = max(2, int(round(largeur_ia * (rh * ha) / (rl * la) / 2)) * 2)
+        # Image IA -> coordonnées de l'affichage
+        self.echelle = np.array([rl * la / self.largeur_ia, rh * ha / self.hauteur_ia], dtype=np.float32)
+        self.decalage = np.array([rx * la, ry * ha], dtype=np.float32)
+
+    @property
+    def forme_ia(self):
+        return (self.hauteur_ia, self.largeur_ia, 3)
+
+    def taille_capture_ia(self):
+        """Taille du flux "champ complet" dont la ROI fait exactement la taille IA."""
+        _, _, rl, rh = self.roi
+        return (int(round(self.largeur_ia / rl / 2)) * 2, int(round(self.hauteur_ia / rh / 2)) * 2)
+
+    def recadrer(self, image):
+        """Découpe la ROI (vue, sans copie) puis redimensionne seulement si nécessaire."""
+        h, w = image.shape[:2]
+        rx, ry, rl, rh = self.roi
+        x0, y0 = int(rx * w), int(ry * h)
+        zone = image[y0:y0 + int(round(rh * h)), x0:x0 + int(round(rl * w))]
+        if zone.shape[:2] != (self.hauteur_ia, self.largeur_ia):
+            import cv2
+            return cv2.resize(zone, (self.largeur_ia, self.hauteur_ia), interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(zone)
+
+    def vers_affichage(self, dets):
+        """Détections (n, >=4) de l'image IA -> coordonnées du flux complet (en place)."""
+        dets[:, 0:4:2] = dets[:, 0:4:2] * self.echelle[0] + self.decalage[0]
+        dets[:, 1:4:2] = dets[:, 1:4:2] * self.echelle[1] + self.decalage[1]
+        return dets
+
+    def rectangle_roi(self):
+        """ROI en pixels de l'affichage : (x1, y1), (x2, y2)."""
+        la, ha = self.taille_affichage
+        rx, ry, rl, rh = self.roi
+        return (int(rx * la), int(ry * ha)), (int((rx + rl) * la) - 1, int((ry + rh) * ha) - 1)
+
+
+# ==========================================
+# SOURCES
+# ==========================================
+def mettre_a_taille(image, taille):
+    """Image -> (largeur, hauteur) = taille, proportions gardées (bandes noires) ; telle quelle si déjà bonne."""
+    la, ha = taille
+    h, w = image.shape[:2]
+    if (w, h) == (la, ha):
+        return image
+    import cv2
+    echelle = min(la / w, ha / h)
+    nw, nh = max(1, int(round(w * echelle))), max(1, int(round(h * echelle)))
+    sortie = np.zeros((ha, la) + image.shape[2:], dtype=image.dtype)
+    x0, y0 = (la - nw) // 2, (ha - nh) // 2
+    sortie[y0:y0 + nh, x0:x0 + nw] = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_AREA)
+    return sortie
+
+
+class SourcePicamera:
+
+    def __init__(self, taille=(640, 480), cadrage=None, affichage=True, camera=0):
+        """camera : numéro du module caméra (Pi 5 / Compute Module : 0 ou 1)"""
+        self.taille = taille
+        self.cadrage = cadrage or Cadrage(taille)
+        self.affichage = affichage
+        self.camera = camera
+        self.double = False
+        self.picam2 = None
+
+    def demarrer(self):
+        from picamera2 import Picamera2
+        self.picam2 = Picamera2(self.camera)
+        taille_ia = self.cadrage.taille_capture_ia()
+        if not self.affichage:
+            # Sans écran : un seul flux, directement à la taille IA
+            config = self.picam2.create_video_configuration(
+                main={"size": taille_ia, "format": "RGB888"}
+            )
+        elif taille_ia != self.taille:
+            # Flux "lores" de l'ISP pour l'IA (YUV420 : seul format lores sur Pi 4)
+            self.double = True
+            taille_ia = (min(taille_ia[0], self.taille[0]), min(taille_ia[1], self.taille[1]))
+            config = self.picam2.create_video_configuration(
+                main={"size": self.taille, "format": "RGB888"},
+                lores={"size": taille_ia, "format": "YUV420"},
+            )
+        else:
+            config = self.picam2.create_video_configuration(
+                main={"size": self.taille, "format": "RGB888"}
+            )
+        self.picam2.configure(config)
+        self.picam2.start()
+
+    def lire(self):
+        return self.picam2.capture_array()
+
+    def lire_double(self):
+        if not self.double:
+            image = self.picam2.capture_array()
+            return self.cadrage.recadrer(image), (image if self.affichage else None)
+        import cv2
+        # Les deux flux d'une même requête : images synchrones
+        (image, yuv), _ = self.picam2.capture_arrays(["main", "lores"])
+        return self.cadrage.recadrer(cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420)), image
+
+    def arreter(self):
+        if self.picam2 is not None:
+            self.picam2.stop()
+
+
+class SourceDouble:
+    """Donne lire_double() à une source à flux unique (vidéo, dossier, webcam, simulée)."""
+
+    def __init__(self, source, cadrage, affichage=True):
+        self.source = source
+        self.cadrage = cadrage
+        self.affichage = affichage
+
+    def demarrer(self):
+        self.source.demarrer()
+
+    def lire(self):
+        return self.source.lire()
+
+    def lire_double(self):
+        image = self.source.lire()
+        if image is None:
+            return None, None
+        return self.cadrage.recadrer(image), (image if self.affichage else None)
+
+    def arreter(self):
+        self.source.arreter()
+
+
+class _SourceRythmee:
+    """Base des sources enregistrées : gère la cadence "reel" / "max"."""
+
+    def __init__(self, fps, cadence):
+        self.fps = fps
+        self.cadence = cadence
+        self.prochaine = None
+
+    def _attendre_cadence(self):
+        if self.cadence != "reel" or not self.fps:
+            return
+        maintenant = time.monotonic()
+        if self.prochaine is None:
+            self.prochaine = maintenant
+        elif self.prochaine > maintenant:
+            time.sleep(self.prochaine - maintenant)
+        self.prochaine += 1.0 / self.fps
+
+
+class SourceVideo(_SourceRythmee):
+    """Fichier vidéo (ou webcam si chemin est un entier) via cv2.VideoCapture."""
+
+    def __init__(self, chemin, cadence="reel", taille=(640, 480), boucle=False):
+        super().__init__(None, cadence)
+        self.chemin = chemin
+        self.taille = taille
+        self.boucle = boucle
+        self.cap = None
+
+    def demarrer(self):
+        import cv2
+        self.cap = cv2.VideoCapture(self.chemin)
+        if not self.cap.isOpened():
+            raise IOError(f"Impossible d'ouvrir la source {self.chemin}")
+        if isinstance(self.chemin, int):
+            # Webcam : c'est elle qui impose le rythme
+            self.cap.set(3, self.taille[0])
+            self.cap.set(4, self.taille[1])
+            self.cadence = "max"
+        else:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    def lire(self):
+        import cv2
+        self._attendre_cadence()
+        ok, image = self.cap.read()
+        if not ok and self.boucle and not isinstance(self.chemin, int):
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, image = self.cap.read()
+        # Vidéo à une autre taille, ou webcam qui ignore la taille demandée
+        return mettre_a_taille(image, self.taille) if ok else None
+
+    def arreter(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class SourceDossier(_SourceRythmee):
+    """Dossier d'images .jpg/.png lues dans l'ordre alphabétique."""
+
+    def __init__(self, dossier, fps=15.0, cadence="reel", boucle=False, taille=(640, 480)):
+        super().__init__(fps, cadence)
+        self.taille = taille
+        self.fichiers = sorted(
+            glob.glob(os.path.join(dossier, "*.jpg")) + glob.glob(os.path.join(dossier, "*.png"))
+        )
+        if not self.fichiers:
+            raise FileNotFoundError(f"Aucune image dans {dossier}")
+        self.boucle = boucle
+        self.index = 0
+
+    def demarrer(self):
+        self.index = 0
+
+    def lire(self):
+        import cv2
+        if self.index >= len(self.fichiers):
+            if not self.boucle:
+                return None
+            self.index = 0
+        self._attendre_cadence()
+        image = cv2.imread(self.fichiers[self.index])
+        self.index += 1
+        return mettre_a_taille(image, self.taille)
+
+    def arreter(self):
+        pass
+
+
+class SourceSimulee(_SourceRythmee):
+    """
+    Caméra simulée (PC sans caméra) : fond fixe + "personnes" rectangulaires
+    qui traversent la pièce. Sert à tester le pipeline (capture, double flux,
+    porte mouvement, affichage) ; YOLO n'y verra évidemment personne.
+    """
+
+    def __init__(self, nb_personnes=3, taille=(640, 480), fps=30.0, cadence="reel", graine=0):
+        super().__init__(fps, cadence)
+        self.taille = taille
+        self.nb_personnes = nb_personnes
+        self.graine = graine
+        la, ha = taille
+        # Fond : dégradé vertical (sol plus sombre)
+        degrade = np.linspace(170, 90, ha, dtype=np.float32)[:, None, None]
+        self.fond = np.broadcast_to(degrade, (ha, la, 3)).astype(np.uint8)
+        self.index = 0
+
+    def demarrer(self):
+        rng = np.random.default_rng(self.graine)
+        la, ha = self.taille
+        n = self.nb_personnes
+        self.tailles = np.stack([rng.uniform(0.08, 0.14, n) * la, rng.uniform(0.35, 0.6, n) * ha], axis=1)
+        self.positions = np.stack([rng.uniform(0, la, n), ha * 0.9 - self.tailles[:, 1]], axis=1)
+        self.vitesses = rng.uniform(-3, 3, n)
+        self.couleurs = rng.integers(0, 255, (n, 3)).tolist()
+        self.index = 0
+
+    def boites(self):
+        """Vérité terrain de l'image courante : (n, 4) x1, y1, x2, y2 (parties visibles)."""
+        la, ha = self.taille
+        b = np.hstack([self.positions, self.positions + self.tailles])
+        b[:, 0::2] = np.clip(b[:, 0::2], 0, la)
+        b[:, 1::2] = np.clip(b[:, 1::2], 0, ha)
+        return b[b[:, 2] - b[:, 0] > 1]
+
+    def lire(self):
+        import cv2
+        self._attendre_cadence()
+        la, _ = self.taille
+        # Déplacement, et retour de l'autre côté une fois sorti du champ
+        self.positions[:, 0] += self.vitesses
+        largeur = self.tailles[:, 0]
+        self.positions[:, 0] = (self.positions[:, 0] + largeur) % (la + 2 * largeur) - largeur
+        image = self.fond.copy()
+        for (x1, y1, x2, y2), couleur in zip(self.boites().astype(int).tolist(), self.couleurs):
+            cv2.rectangle(image, (x1, y1), (x2, y2), couleur, -1)
+        self.index += 1
+        return image
+
+    def arreter(self):
+        pass
+
+
+def ouvrir_source(spec, cadence="reel", taille=(640, 480), cadrage=None, affichage=True):
+    """
+    "picamera" / "picamera:1" -> caméra du Pi (double flux natif), n° du module
+    "webcam" / "webcam:1" -> cv2.VideoCapture(index)
+    "simulee" / "simulee:5" -> caméra simulée (nb de personnes)
+    chemin dossier  -> SourceDossier
+    chemin fichier  -> SourceVideo
+    cadrage : taille IA + ROI pour lire_double() (défaut : image complète) ; sa
+              taille_affichage remplace alors taille (images de la source = repère des boîtes)
+    affichage : False -> lire_double() ne retourne pas le flux complet
+    """
+    if cadrage is None:
+        cadrage = Cadrage(taille)
+    taille = cadrage.taille_affichage
+    if spec.startswith("picamera"):
+        camera = int(spec.split(":")[1]) if ":" in spec else 0
+        return SourcePicamera(taille, cadrage, affichage, camera)
+    if spec.startswith("webcam"):
+        index = int(spec.split(":")[1]) if ":" in spec else 0
+        source = SourceVideo(index, taille=taille)
+    elif spec.startswith("simulee"):
+        nb = int(spec.split(":")[1]) if ":" in spec else 3
+        source = SourceSimulee(nb, taille=taille, cadence=cadence)
+    elif os.path.isdir(spec):
+        source = SourceDossier(spec, cadence=cadence, taille=taille)
+    elif os.path.isfile(spec):
+        source = SourceVideo(spec, cadence=cadence, taille=taille)
+    else:
+        raise ValueError(f"Source inconnue : {spec}")
+    return SourceDouble(source, cadrage, affichage)
@@ -0,0 +1,229 @@
+import threading
+import numpy as np
+
+from detection import DTYPE_DETECTION
+
+# ==========================================
+# SUIVI MULTI-PERSONNES (STYLE SORT / BYTETRACK)
+# ==========================================
+# Entre le détecteur et les variables partagées :
+# - chaque personne devient une "piste" avec un identifiant stable
+# - filtre de Kalman à vitesse constante, vectorisé sur toutes les pistes
+#   (état : cx, cy, w, h, vx, vy, vw, vh)
+# - association par IoU (matrice NumPy, appariement glouton), en 2 passes
+#   comme ByteTrack : d'abord les détections sûres, puis les faibles
+# - une piste ratée par le détecteur survit MAX_RATES passages -> le comptage
+#   ne clignote plus quand YOLO rate une personne sur une image
+# - boites_predites(t) extrapole les boîtes entre deux passages de l'IA
+#
+# Les "ratés" se comptent en passages du détecteur (une image sautée par la porte
+# mouvement n'est pas un raté), MAIS une piste ratée disparaît aussi après duree_max
+# secondes sans détection : sinon, porte mouvement + refresh de 10 s = une personne
+# partie reste comptée ~50 s. a_verifier() dit à la porte de relancer l'IA tout de
+# suite tant qu'une piste n'est plus vue.
+
+def iou_matrice(a, b):
+    """IoU entre toutes les boîtes xyxy de a (n, 4) et b (m, 4) -> (n, m)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    aire_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    aire_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (aire_a[:, None] + aire_b[None, :] - inter + 1e-9)
+
+def appariement_glouton(iou, seuil):
+    """Paires (i, j) par IoU décroissante, chaque ligne/colonne utilisée une fois."""
+    paires = []
+    if iou.size == 0:
+        return paires
+    lignes, colonnes = np.nonzero(iou >= seuil)
+    ordre = np.argsort(-iou[lignes, colonnes])
+    prises_i, prises_j = set(), set()
+    for k in ordre:
+        i, j = lignes[k], colonnes[k]
+        if i in prises_i or j in prises_j:
+            continue
+        prises_i.add(i)
+        prises_j.add(j)
+        paires.append((i, j))
+    return paires
+
+def _xyxy_vers_cxcywh(b):
+    return np.stack([(b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2,
+                     b[:, 2] - b[:, 0], b[:, 3] - b[:, 1]], axis=1)
+
+def _cxcywh_vers_xyxy(b):
+    return np.stack([b[:, 0] - b[:, 2] / 2, b[:, 1] - b[:, 3] / 2,
+                     b[:, 0] + b[:, 2] / 2, b[:, 1] + b[:, 3] / 2], axis=1)
+
+
+class SuiviPersonnes:
+
+    H = np.hstack([np.eye(4), np.zeros((4, 4))]).astype(np.float32)
+
+    def __init__(self, seuil_iou=0.3, seuil_haut=0.6, min_touches=2, max_rates=5, duree_max=2.0,
+                 horizon_max=1.0, bruit_pos=1.0, bruit_vit=10.0, bruit_mesure=4.0):
+        """
+        seuil_haut : confiance séparant détections "sûres" et "faibles" (ByteTrack)
+        min_touches : détections nécessaires avant de compter une piste
+        max_rates : passages du détecteur sans détection avant de supprimer une piste
+        duree_max : secondes max depuis la dernière détection d'une piste ratée
+        horizon_max : extrapolation max (s) des boîtes entre deux détections
+        """
+        self.seuil_iou = seuil_iou
+        self.seuil_haut = seuil_haut
+        self.min_touches = min_touches
+        self.max_rates = max_rates
+        self.duree_max = duree_max
+        self.horizon_max = horizon_max
+        self.bruit_pos = bruit_pos
+        self.bruit_vit = bruit_vit
+        self.R = np.eye(4, dtype=np.float32) * bruit_mesure ** 2
+
+        self.X = np.zeros((0, 8), dtype=np.float32)      # États
+        self.P = np.zeros((0, 8, 8), dtype=np.float32)   # Covariances
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.touches = np.zeros(0, dtype=np.int32)
+        self.rates = np.zeros(0, dtype=np.int32)
+        self.t_vue = np.zeros(0, dtype=np.float64)       # Instant de la dernière détection
+        self.confiances = np.zeros(0, dtype=np.float32)
+        self.prochain_id = 1
+        self.t = None
+        self.lock = threading.Lock()
+
+    # --- Kalman vectorisé ---
+    def _F_Q(self, dt):
+        F = np.eye(8, dtype=np.float32)
+        F[:4, 4:] = np.eye(4) * dt
+        q = np.array([self.bruit_pos] * 4 + [self.bruit_vit] * 4, dtype=np.float32)
+        Q = np.diag((q * max(dt, 1e-3)) ** 2)
+        return F, Q
+
+    def _predire(self, dt):
+        if len(self.X) == 0 or dt <= 0:
+            return
+        F, Q = self._F_Q(dt)
+        self.X = self.X @ F.T
+        self.X[:, 2:4] = np.maximum(self.X[:, 2:4], 1.0)
+        self.P = F @ self.P @ F.T + Q
+
+    def _corriger(self, idx, mesures):
+        H = self.H
+        P = self.P[idx]
+        S = H @ P @ H.T + self.R                        # (k, 4, 4)
+        K = P @ H.T @ np.linalg.inv(S)                  # (k, 8, 4)
+        innovation = mesures - self.X[idx] @ H.T        # (k, 4)
+        self.X[idx] += np.einsum("kij,kj->ki", K, innovation)
+        self.P[idx] = (np.eye(8, dtype=np.float32) - K @ H) @ P
+
+    # --- API ---
+    def mettre_a_jour(self, detections, t):
+        """
+        detections : tableau structuré DTYPE_DETECTION
+        t : instant (time.monotonic()) de l'image analysée
+        Retourne les pistes confirmées (DTYPE_DETECTION, champ "id" rempli).
+        """
+        with self.lock:
+            dt = 0.0 if self.t is None else t - self.t
+            self.t = t
+            self._predire(dt)
+
+            boites = detections["xyxy"]
+            conf = detections["conf"]
+            haut = np.nonzero(conf >= self.seuil_haut)[0]
+            bas = np.nonzero(conf < self.seuil_haut)[0]
+
+            pistes_xyxy = _cxcywh_vers_xyxy(self.X[:, :4])
+            libres = np.arange(len(self.X))
+            associees, mesures = [], []
+
+            # Passe 1 : détections sûres contre toutes les pistes
+            paires = appariement_glouton(iou_matrice(pistes_xyxy, boites[haut]), self.seuil_iou)
+            for i, j in paires:
+                associees.append(i)
+                mesures.append(haut[j])
+            reste_haut = np.setdiff1d(haut, [haut[j] for _, j in paires])
+            libres = np.setdiff1d(libres, associees)
+
+            # Passe 2 : détections faibles contre les pistes restantes
+            paires = appariement_glouton(iou_matrice(pistes_xyxy[libres], boites[bas]), self.seuil_iou)
+            for i, j in paires:
+                associees.append(libres[i])
+                mesures.append(bas[j])
+
+            associees = np.array(associees, dtype=np.intp)
+            if len(associees):
+                self._corriger(associees, _xyxy_vers_cxcywh(boites[mesures]))
+                self.confiances[associees] = conf[mesures]
+            self.touches[associees] += 1
+            manquees = np.setdiff1d(np.arange(len(self.X)), associees)
+            self.rates[associees] = 0
+            self.rates[manquees] += 1
+            self.t_vue[associees] = t
+
+            # Nouvelles pistes : seulement pour les détections sûres non associées
+            if len(reste_haut):
+                n = len(reste_haut)
+                X_neuf = np.zeros((n, 8), dtype=np.float32)
+                X_neuf[:, :4] = _xyxy_vers_cxcywh(boites[reste_haut])
+                P_neuf = np.tile(np.diag([10, 10, 10, 10, 100, 100, 100, 100]).astype(np.float32), (n, 1, 1))
+                self.X = np.vstack([self.X, X_neuf])
+                self.P = np.concatenate([self.P, P_neuf])
+                self.ids = np.concatenate([self.ids, np.arange(self.prochain_id, self.prochain_id + n)])
+                self.prochain_id += n
+                self.touches = np.concatenate([self.touches, np.ones(n, dtype=np.int32)])
+                self.rates = np.concatenate([self.rates, np.zeros(n, dtype=np.int32)])
+                self.t_vue = np.concatenate([self.t_vue, np.full(n, t)])
+                self.confiances = np.concatenate([self.confiances, conf[reste_haut]])
+
+            # Pistes perdues depuis trop de passages OU trop de secondes
+            vivantes = (self.rates <= self.max_rates) & ((self.rates == 0) | (t - self.t_vue <= self.duree_max))
+            if not vivantes.all():
+                self.X, self.P, self.ids = self.X[vivantes], self.P[vivantes], self.ids[vivantes]
+                self.touches, self.rates = self.touches[vivantes], self.rates[vivantes]
+                self.t_vue, self.confiances = self.t_vue[vivantes], self.confiances[vivantes]
+
+            return self._pistes_confirmees(self.X)
+
+    def _confirmees(self):
+        return self.touches >= self.min_touches
+
+    def _pistes_confirmees(self, X):
+        """Tableau structuré figé des pistes confirmées."""
+        c = self._confirmees()
+        sortie = np.empty(int(c.sum()), dtype=DTYPE_DETECTION)
+        sortie["xyxy"] = _cxcywh_vers_xyxy(X[c, :4])
+        sortie["conf"] = self.confiances[c]
+        sortie["cls"] = 0
+        sortie["id"] = self.ids[c]
+        sortie.flags.writeable = False
+        return sortie
+
+    def a_verifier(self):
+        """True si une piste a été ratée au dernier passage (l'IA doit repasser vite)."""
+        with self.lock:
+            return bool((self.rates > 0).any())
+
+    def nb_vues(self):
+        """Pistes confirmées détectées au dernier passage (sans celles seulement extrapolées)."""
+        with self.lock:
+            return int((self._confirmees() & (self.rates == 0)).sum())
+
+    def nb_personnes(self):
+        """Comptage lissé : pistes confirmées encore vivantes."""
+        with self.lock:
+            return int(self._confirmees().sum())
+
+    def boites_predites(self, t):
+        """Pistes confirmées extrapolées à l'instant t, sans modifier l'état."""
+        with self.lock:
+            if self.t is None or len(self.X) == 0:
+                return self._pistes_confirmees(self.X)
+            dt = min(max(t - self.t, 0.0), self.horizon_max)
+            X = self.X.copy()
+            X[:, :4] += X[:, 4:] * dt
+            return self._pistes_confirmees(X)
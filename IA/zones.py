@@ -0,0 +1,172 @@
+import math
+import threading
+import numpy as np
+
+# ==========================================
+# ZONES DE LA PIECE ET CARTE D'OCCUPATION
+# ==========================================
+# La régulation ne voyait qu'un nombre (len(boîtes)) ; ici on garde OÙ sont les gens.
+# - ZONES : polygones nommés en fractions du champ (0-1), plus des zones d'EXCLUSION
+#   (porte vitrée, miroir, écran qui montre des gens...). Les polygones sont rastérisés
+#   UNE fois dans un masque d'étiquettes uint8 (0 = hors zone, 1..N = zones,
+#   255 = exclusion) : attribuer une boîte = lire masque[y, x] sous ses pieds
+#   (milieu du bord bas), en O(1) et pour toutes les boîtes d'un coup.
+# - CARTE D'OCCUPATION : grille grossière (cellules de `cellule` px) qui décroît
+#   exponentiellement (demi_vie) ; chaque inférence y ajoute le temps écoulé sous les
+#   pieds de chaque personne -> des "personnes-secondes récentes", mises à jour sur place.
+#   L'image colorée (calque) n'est refaite que quand on la redemande (version).
+# Sorties : comptes par zone sur le calque, et (regulateur.py) jauges /metrics
+# zone_personnes / zone_chaleur_secondes via Zones.comptes() et CarteOccupation.par_zone().
+# cv2 n'est importé que s'il y a des polygones à rastériser ou à dessiner (Pi sans écran).
+# Coût par inférence avec 20+ boîtes : quelques dizaines de µs, contre ~100 ms d'inférence.
+
+EXCLUSION = 255
+
+
+def pieds(detections, taille):
+    """Point des pieds (milieu du bord bas) de chaque boîte, en pixels entiers dans l'image."""
+    la, ha = taille
+    xyxy = detections["xyxy"]
+    x = np.clip(((xyxy[:, 0] + xyxy[:, 2]) * 0.5).astype(np.intp), 0, la - 1)
+    y = np.clip(xyxy[:, 3].astype(np.intp), 0, ha - 1)
+    return x, y
+
+
+class Zones:
+
+    def __init__(self, zones=None, exclusions=None, taille=(640, 480)):
+        """
+        zones : {nom: [(x, y), ...]} en fractions du champ (la dernière l'emporte si chevauchement)
+        exclusions : [[(x, y), ...], ...] personnes ignorées (priorité sur les zones)
+        taille : (largeur, hauteur) du flux d'affichage (coordonnées des détections)
+        """
+        zones = zones or {}
+        if len(zones) >= EXCLUSION:
+            raise ValueError(f"Au plus {EXCLUSION - 1} zones")
+        self.noms = list(zones)
+        self.taille = taille
+        self.polygones = [self._pixels(zones[nom]) for nom in self.noms]
+        self.exclusions = [self._pixels(p) for p in exclusions or []]
+        la, ha = taille
+        self.masque = np.zeros((ha, la), dtype=np.uint8)
+        if self.actives():
+            import cv2
+        for i, poly in enumerate(self.polygones, 1):
+            cv2.fillPoly(self.masque, [poly], i)
+        for poly in self.exclusions:
+            cv2.fillPoly(self.masque, [poly], EXCLUSION)
+        self.nb_exclus = 0          # Personnes écartées par la dernière inférence
+
+    def _pixels(self, polygone):
+        la, ha = self.taille
+        return np.round(np.asarray(polygone, dtype=np.float32) * (la - 1, ha - 1)).astype(np.int32)
+
+    def actives(self):
+        return bool(self.polygones or self.exclusions)
+
+    def etiquettes(self, detections):
+        """Zone de chaque boîte (0 = hors zone, EXCLUSION = à ignorer)."""
+        x, y = pieds(detections, self.taille)
+        return self.masque[y, x]
+
+    def filtrer(self, detections):
+        """Retire les personnes des zones d'exclusion (tableau figé, sans copie si rien à retirer)."""
+        if not self.exclusions or not len(detections):
+            self.nb_exclus = 0
+            return detections
+        garde = self.etiquettes(detections) != EXCLUSION
+        self.nb_exclus = int(len(garde) - garde.sum())
+        if not self.nb_exclus:
+            return detections
+        gardees = detections[garde]
+        gardees.flags.writeable = False
+        return gardees
+
+    def compter(self, etiquettes):
+        """Nb de personnes par zone : tableau [hors zone, zone 1, ..., zone N]."""
+        etiquettes = etiquettes[etiquettes != EXCLUSION]
+        return np.bincount(etiquettes, minlength=len(self.noms) + 1)
+
+    def comptes(self, comptes):
+        """Tableau de compter() ou de CarteOccupation.par_zone() -> {nom: valeur} (zones seulement)."""
+        return dict(zip(self.noms, comptes[1:].tolist()))
+
+
+def dessiner_zones(image, zones, comptes=None):
+    """Contours des zones (+ comptage) et des exclusions, pour un CalqueCache non opaque."""
+    import cv2
+    for i, (nom, poly) in enumerate(zip(zones.noms, zones.polygones)):
+        cv2.polylines(image, [poly], True, (255, 200, 0), 1)
+        texte = nom if comptes is None else f"{nom}: {comptes[i + 1]}"
+        x, y = poly.min(axis=0)
+        cv2.putText(image, texte, (int(x) + 4, int(y) + 16), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 200, 0), 1)
+    for poly in zones.exclusions:
+        cv2.polylines(image, [poly], True, (0, 0, 255), 1)
+        x, y = poly.min(axis=0)
+        cv2.putText(image, "exclu", (int(x) + 4, int(y) + 16), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+
+
+# ==========================================
+# CARTE D'OCCUPATION (DECROISSANCE EXPONENTIELLE)
+# ==========================================
+class CarteOccupation:
+
+    def __init__(self, taille=(640, 480), cellule=16, demi_vie=300.0, zones=None):
+        """
+        cellule : côté d'une case en pixels de l'affichage
+        demi_vie : secondes au bout desquelles une présence ne compte plus que pour moitié
+        zones : objet Zones pour par_zone()
+        """
+        la, ha = taille
+        self.taille = taille
+        self.cellule = cellule
+        self.tau = demi_vie / math.log(2)
+        self.grille = np.zeros((-(-ha // cellule), -(-la // cellule)), dtype=np.float32)
+        self.t = None
+        self.version = 0
+        self.lock = threading.Lock()    # ai_worker écrit, l'affichage et la régulation lisent
+        self.zones = zones
+        if zones is not None:
+            # Étiquette du centre de chaque case, calculée une fois
+            c = cellule
+            etiquettes = zones.masque[c // 2::c, c // 2::c]
+            manque = [(0, n - e) for n, e in zip(self.grille.shape, etiquettes.shape)]
+            self.etiquettes = np.pad(etiquettes, manque, mode="edge").ravel()
+
+    def ajouter(self, detections, t):
+        """Décroissance sur place puis dt personnes-secondes sous les pieds de chaque boîte."""
+        with self.lock:
+            dt = 0.0 if self.t is None else max(0.0, t - self.t)
+            self.t = t
+            if dt:
+                np.multiply(self.grille, np.float32(math.exp(-dt / self.tau)), out=self.grille)
+            if len(detections) and dt:
+                x, y = pieds(detections, self.taille)
+                # add.at : deux personnes dans la même case s'additionnent
+                np.add.at(self.grille, (y // self.cellule, x // self.cellule), np.float32(dt))
+            self.version += 1
+
+    def copie(self):
+        with self.lock:
+            return self.grille.copy(), self.version
+
+    def par_zone(self):
+        """Personnes-secondes récentes par zone (même ordre que Zones.compter())."""
+        with self.lock:
+            poids = self.grille.ravel().copy()
+        garde = self.etiquettes != EXCLUSION
+        return np.bincount(self.etiquettes[garde], weights=poids[garde], minlength=len(self.zones.noms) + 1)
+
+
+def dessiner_carte(image, carte, seuil=0.05):
+    """Cases au-dessus de seuil x max en fausses couleurs (le reste transparent), pour un CalqueCache."""
+    grille, _ = carte.copie()
+    maxi = float(grille.max())
+    if maxi <= 0:
+        return
+    import cv2
+    h, w = image.shape[:2]
+    niveaux = (grille * (255.0 / maxi)).astype(np.uint8)
+    couleurs = cv2.applyColorMap(cv2.resize(niveaux, (w, h), interpolation=cv2.INTER_LINEAR), cv2.COLORMAP_JET)
+    visible = cv2.resize(grille, (w, h), interpolation=cv2.INTER_NEAREST) > seuil * maxi
+    image[visible] = couleurs[visible]
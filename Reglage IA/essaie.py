@@ -1,14 +1,42 @@
+import os
+import sys
 import time
-import cv2
+T_LANCEMENT = time.perf_counter()  # Origine des jalons de démarrage (imports compris)
 import threading
 import numpy as np
-from picamera2 import Picamera2
-from ultralytics import YOLO
+
+# Modules partagés du dossier IA/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "IA"))
+from echange_images import TamponImages
+from detection import creer_detecteur, prechauffer, tableau_detections, boites_entieres, AUCUNE_DETECTION
+from cascade import creer_cascade
+from mouvement import PorteMouvement
+from sources import ouvrir_source, Cadrage
+from suivi import SuiviPersonnes
+from ordonnanceur import Ordonnanceur
+from affichage import RythmeAffichage, CalqueCache
+from cvc import LienCVC, ouvrir_transport
+from regulation import charger_table
+from mesures import Instrumentation, dessiner_mesures
 
 # --- CONFIGURATION DU PROJET ---
 MODEL_TYPE = 'yolov8s.pt'
 CONFIDENCE = 0.50
-VIDEO_FPS = 60
+VIDEO_FPS = 60             # Cadence max de l'affichage
+HEADLESS = False           # True : Pi sans écran -> ni conversion couleur, ni dessin, ni fenêtre
+MODE_INFERENCE = "thread"  # "thread" ou "processus" (YOLO hors du GIL de l'affichage)
+BACKEND = "auto"           # "auto", "pytorch", "onnx", "openvino", "ncnn" (cf. exporter_modele.py)
+PORTE_MOUVEMENT = True     # Pas d'IA si la scène n'a pas bougé (refresh forcé toutes les 10 s)
+SOURCE = "picamera"        # "picamera", "webcam", "simulee", une vidéo ou un dossier d'images (rejeu)
+SUIVI = True               # Suivi des personnes : comptage stable + boîtes extrapolées
+CASCADE = False            # yolov8n d'abord, yolov8s si le nano hésite (valider le taux d'escalade avec benchmark.py)
+MODEL_RAPIDE = 'yolov8n.pt'
+LARGEUR_IA = 640           # Largeur de l'image IA (= imgsz du modèle, ex: 320 avec exporter_modele.py --imgsz 320)
+ROI = None                 # Zone analysée (x, y, largeur, hauteur) en fractions du champ, ex: (0.1, 0.2, 0.8, 0.8)
+AFFICHER_MESURES = False   # Calque des temps par étape (p50 / p95 / part du temps)
+PERIODE_LOG_MESURES = 30.0 # Une ligne de log des temps par étape toutes les N s (None = jamais)
+PORT_MESURES = 8765        # http://127.0.0.1:8765/ (texte) et /metrics (Prometheus) ; None = pas de serveur
+CVC = "simule"             # Sortie vers le CVC : "modbus:192.168.1.50", "tcp:hote:port", "serie:/dev/ttyUSB0", "simule", None
 
 # --- CONFIGURATION CLIMATIQUE (TOULON) ---
 SAISON_ACTUELLE = "ETE"  # Choix: "HIVER", "ETE", "MI_SAISON"
@@ -20,154 +48,230 @@ PARAMS = {
     "MI_SAISON": {"target": 22.0, "mode": "VENTILATION"}
 }
 
+# Table de régulation précalculée : une tranche par occupant (1 personne = ~100 W)
+# (personnes_min, consigne, ventilateur %, marge)
+# - ETE : -1°C par 10 personnes pour compenser, ventilateur 20% + 5%/personne (10% à vide)
+# - HIVER : -1°C par 10 personnes (elles chauffent), ventilateur bas (pas de courant d'air)
+NB_MAX_PERSONNES = 50
+TABLE_REGULATION = {
+    "ETE": {"sens": "FROID", "bandes": [
+        (n, PARAMS["ETE"]["target"] - n / 10.0, min(100, 20 + n * 5) if n else 10, 0.5)
+        for n in range(NB_MAX_PERSONNES + 1)]},
+    "HIVER": {"sens": "CHAUD", "bandes": [
+        (n, PARAMS["HIVER"]["target"] - n / 10.0, 10, 0.5) for n in range(NB_MAX_PERSONNES + 1)]},
+    "MI_SAISON": {"sens": "VENTILATION", "bandes": [(0, PARAMS["MI_SAISON"]["target"], 0, 0.5)]},
+}
+table = charger_table(TABLE_REGULATION, NB_MAX_PERSONNES)
+
+if not HEADLESS:
+    import cv2  # Fenêtre, conversion couleur et dessin seulement : pas chargé sur un Pi sans écran
+
 # Variables partagées
-frame_buffer = None
-latest_boxes = []
+cadrage = Cadrage((640, 480), LARGEUR_IA, ROI)  # Flux IA (petit, ROI) vs flux d'affichage
+tampon = TamponImages(cadrage.forme_ia)  # Anneau d'images numérotées capture -> IA
+suivi = SuiviPersonnes() if SUIVI else None
+ordo = Ordonnanceur(periode_regulation=1.0)  # Régulation toutes les 1 s
+latest_boxes = AUCUNE_DETECTION
 person_count = 0
-lock = threading.Lock()
-running = True
+nb_inferences = 0          # 0 = modèle pas encore prêt : pas de régulation
+mesures = Instrumentation(t_lancement=T_LANCEMENT)  # Temps par étape (capture, inférence, dessin...), sans allocation
+mesures.jalon("imports")
+lock = mesures.verrou("lock")  # Contention mesurée
+arret = threading.Event()  # Demande d'arrêt propre
 
 # Variables de Régulation
 current_hvac_power = 0  # Puissance ventilateur (0-100%)
 adjusted_target = 0.0   # Nouvelle température cible calculée
 
-# --- FONCTION DE RÉGULATION THERMIQUE ---
-def calculate_regulation(n_personnes, saison):
-    """
-    C'est ici que l'IA décide de la température.
-    Règle : 1 personne = ~100 Watts de chaleur ajoutée.
-    """
-    base_target = PARAMS[saison]["target"]
-    mode = PARAMS[saison]["mode"]
-    
-    thermal_load = n_personnes * 100  # Charge en Watts
-    new_target = base_target
-    fan_speed = 0 # Vitesse ventilateur 0-100%
-
-    if saison == "ETE":
-        # En été, les gens chauffent la salle -> On doit refroidir plus fort.
-        # Règle : Pour chaque 1000W (10 pers), on baisse la consigne de 1°C pour compenser
-        drop = (n_personnes / 10.0) 
-        new_target = base_target - drop
-        
-        # Le ventilateur accélère s'il y a du monde
-        if n_personnes > 0:
-            fan_speed = 20 + (n_personnes * 5) # Min 20%, +5% par personne
-        else:
-            fan_speed = 10 # Mode Eco
-
-    elif saison == "HIVER":
-        # En hiver, les gens chauffent la salle -> On peut BAISSER le radiateur (économie !)
-        # Règle : Pour chaque 10 personnes, on baisse le chauffage de 1°C
-        drop = (n_personnes / 10.0)
-        new_target = base_target - drop
-        fan_speed = 10 # Basse vitesse pour ne pas créer de courant d'air froid
-
-    # Bornes de sécurité (pour ne pas geler ou cuire les gens)
-    fan_speed = min(100, max(0, fan_speed))
-    
-    return new_target, fan_speed, thermal_load
-
 # --- THREAD IA (VISION) ---
 def ai_worker():
-    global latest_boxes, person_count, frame_buffer
-    print(f"Chargement du modèle {MODEL_TYPE}...")
-    model = YOLO(MODEL_TYPE)
+    global latest_boxes, person_count, nb_inferences
+    print(f"Chargement du modèle {MODEL_TYPE} (mode {MODE_INFERENCE})...")
+    if CASCADE:
+        detecteur = creer_cascade(MODE_INFERENCE, MODEL_RAPIDE, MODEL_TYPE, CONFIDENCE,
+                                  forme=cadrage.forme_ia, backend=BACKEND,
+                                  compte_reference=suivi.nb_vues if suivi is not None else None)
+    else:
+        detecteur = creer_detecteur(MODE_INFERENCE, MODEL_TYPE, CONFIDENCE, cadrage.forme_ia, BACKEND)
+    mesures.jalon("modele charge")
+    prechauffer(detecteur, cadrage.forme_ia)  # Pendant que la caméra démarre
+    mesures.jalon("prechauffage")
     print("IA Prête.")
    
-    while running:
-        img_for_ai = None
-        with lock:
-            if frame_buffer is not None:
-                img_for_ai = frame_buffer.copy()
-       
-        if img_for_ai is not None:
-            results = model(img_for_ai, classes=[0], conf=CONFIDENCE, verbose=False)
-            temp_boxes = []
-            for r in results:
-                for box in r.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0]
-                    temp_boxes.append((int(x1), int(y1), int(x2), int(y2)))
+    porte = PorteMouvement() if PORTE_MOUVEMENT else None
+    dernier_seq = 0
+    try:
+        while not arret.is_set():
+            # L'ordonnanceur décide QUAND relancer l'IA (besoins + température du Pi)
+            ordo.attendre_creneau(arret)
+            # On attend une image NOUVELLE (pas de copie, pas de doublon)
+            t_etape = time.perf_counter()
+            seq, img_for_ai = tampon.attendre(dernier_seq, timeout=0.5)
+            t_image = time.monotonic()
+            if img_for_ai is None:
+                continue
+            t_etape = mesures.noter("attente image", t_etape)
+            if porte is not None and not porte.doit_analyser(img_for_ai, forcer=suivi is not None and suivi.a_verifier()):
+                # Scène inchangée : latest_boxes reste valable, on économise YOLO
+                tampon.liberer(seq)
+                dernier_seq = seq
+                mesures.noter("porte", t_etape)
+                continue
+            t_etape = mesures.noter("porte", t_etape)
+            t0 = time.monotonic()
+            try:
+                brut = detecteur.detecter(img_for_ai)
+            finally:
+                tampon.liberer(seq)
+            t_etape = mesures.noter("inference", t_etape)
+            dernier_seq = seq
+            detections = tableau_detections(cadrage.vers_affichage(brut))
+            if suivi is not None:
+                # Un raté isolé de YOLO ne fait plus varier le comptage
+                detections = suivi.mettre_a_jour(detections, t_image)
+            mesures.noter("post-traitement", t_etape)
            
+            # Tableau figé publié tel quel : les lecteurs n'ont rien à copier
             with lock:
-                latest_boxes = temp_boxes
-                person_count = len(temp_boxes)
-        else:
-            time.sleep(0.01)
+                latest_boxes = detections
+                person_count = len(detections)
+                nb_inferences += 1
+            if "1re detection" not in mesures.jalons:
+                mesures.jalon("1re detection"); print(mesures.ligne_demarrage())
+            ordo.noter_inference(t0, time.monotonic(), len(detections))
+    finally:
+        detecteur.arreter()
+        if CASCADE:
+            print(detecteur.bilan())
+        if porte is not None:
+            print(f"IA évitée sur {porte.taux_saut():.0%} des images (scène immobile)")
+
+# --- DASHBOARD (CALQUE EN CACHE) ---
+def dessiner_dashboard(panneau, count_now, adjusted_target, current_hvac_power):
+    """Dessine le panneau 640x90 dans son calque."""
+    # Fond du panneau
+    cv2.rectangle(panneau, (0, 0), (640, 90), (30, 30, 30), -1)
+    
+    # Colonne 1 : Détection
+    cv2.putText(panneau, f"Occupants: {count_now}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    cv2.putText(panneau, f"Apport: +{count_now * 100} W", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 1)
+
+    # Colonne 2 : Décision IA
+    cv2.putText(panneau, f"Saison: {SAISON_ACTUELLE}", (250, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1)
+    cv2.putText(panneau, f"Mode: {PARAMS[SAISON_ACTUELLE]['mode']}", (250, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+
+    # Colonne 3 : Consigne Clim (Le résultat final)
+    color_temp = (0, 0, 255) if SAISON_ACTUELLE == "ETE" else (255, 100, 0)
+    cv2.putText(panneau, f"CIBLE: {adjusted_target} C", (450, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color_temp, 2)
+    cv2.putText(panneau, f"FAN: {current_hvac_power}%", (450, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
 
 # --- PROGRAMME PRINCIPAL ---
 def main():
-    global frame_buffer, running, adjusted_target, current_hvac_power
+    global adjusted_target, current_hvac_power
    
     print(f"--- SMART COMFORT PI : Démarrage (Mode {SAISON_ACTUELLE}) ---")
-    picam2 = Picamera2()
-    config = picam2.create_video_configuration(main={"size": (640, 480), "format": "RGB888"})
-    picam2.configure(config)
-    picam2.start()
-
-    WINDOW_NAME = "Smart Comfort Dashboard"
-    cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
-
+    # Chargement + préchauffage du modèle en parallèle de l'initialisation de la caméra
     t = threading.Thread(target=ai_worker)
     t.daemon = True
     t.start()
+    source = ouvrir_source(SOURCE, cadrage=cadrage, affichage=not HEADLESS)
+    source.demarrer()
+    mesures.jalon("camera")
+
+    WINDOW_NAME = "Smart Comfort Dashboard"
+    if not HEADLESS:
+        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+    ordo.noter_affichage(not HEADLESS)
+    rythme = RythmeAffichage(VIDEO_FPS)
+    dashboard = CalqueCache((90, 640))
+    calque_mesures = CalqueCache((200, 300), position=(340, 90), opaque=False)
+    mesures.demarrer(periode_log=PERIODE_LOG_MESURES, port=PORT_MESURES)
+
+    lien = LienCVC(ouvrir_transport(CVC)) if CVC else None
+    if lien is not None:
+        lien.demarrer()  # Boucle asyncio à part : envoyer() ne bloque jamais
 
     last_regulation_time = 0
     
     try:
         while True:
-            # 1. Capture & Correction
-            frame_rgb = picam2.capture_array()
-            frame_display = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+            # 1. Capture
+            t_etape = time.perf_counter()
+            image_ia, frame_rgb = source.lire_double()  # frame_rgb = None sans écran
+            if image_ia is None: break  # Fin du rejeu
+            t_etape = mesures.noter("capture", t_etape)
+
+            # capture_array() alloue une image neuve et on dessine sur la copie BGR -> zéro copie
+            tampon.publier(image_ia, copie=False)
+            t_etape = mesures.noter("publication", t_etape)
 
             with lock:
-                frame_buffer = frame_rgb
-                boxes_to_draw = list(latest_boxes)
+                boxes_to_draw = latest_boxes
                 count_now = person_count
+                inference = nb_inferences
+            if suivi is not None:
+                # Boîtes extrapolées entre deux passages de l'IA
+                boxes_to_draw = suivi.boites_predites(time.monotonic())
+            t_etape = mesures.noter("lecture resultats", t_etape)
+            if not t.is_alive():
+                # Processus d'inférence perdu... : pas de régulation sur un comptage figé
+                print("Thread IA arrêté : arrêt de la régulation")
+                break
 
             # 2. RÉGULATION (Calcul toutes les 1 seconde pour ne pas spammer)
-            if time.time() - last_regulation_time > 1.0:
-                target, speed, load = calculate_regulation(count_now, SAISON_ACTUELLE)
-                adjusted_target = round(target, 1)
-                current_hvac_power = int(speed)
+            # Rien avant la 1re détection : "0 personne" viendrait du modèle pas encore prêt
+            if inference and time.time() - last_regulation_time > 1.0:
+                consigne = table.consigne(SAISON_ACTUELLE, count_now)
+                adjusted_target = round(consigne.cible, 1)
+                current_hvac_power = int(consigne.ventilation)
                 last_regulation_time = time.time()
                 
-                # Simulation d'envoi vers l'interface CVC (Risk R1)
-                # print(f"[CVC LINK] Envoi commande: Consigne={adjusted_target}°C, Fan={current_hvac_power}%")
+                # Envoi vers l'interface CVC (Risk R1) : doublons supprimés, débit limité
+                if lien is not None:
+                    lien.envoyer(adjusted_target, current_hvac_power, PARAMS[SAISON_ACTUELLE]["mode"])
+            t_etape = mesures.noter("regulation", t_etape)
+
+            # Sans écran, ou pas encore l'heure de redessiner : on s'arrête là
+            if HEADLESS or not rythme.doit_afficher(
+                (count_now, adjusted_target, current_hvac_power, boites_entieres(boxes_to_draw).tobytes())
+            ):
+                continue
+            frame_display = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+            t_etape = mesures.noter("couleur", t_etape)
 
             # 3. Dessin des boîtes
-            for (x1, y1, x2, y2) in boxes_to_draw:
+            for (x1, y1, x2, y2) in boites_entieres(boxes_to_draw).tolist():
                 cv2.rectangle(frame_display, (x1, y1), (x2, y2), (0, 255, 0), 2)
 
-            # 4. DASHBOARD - Overlay Visuel
-            # Fond du panneau
-            cv2.rectangle(frame_display, (0, 0), (640, 90), (30, 30, 30), -1)
-            
-            # Colonne 1 : Détection
-            cv2.putText(frame_display, f"Occupants: {count_now}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            cv2.putText(frame_display, f"Apport: +{count_now * 100} W", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 1)
-
-            # Colonne 2 : Décision IA
-            cv2.putText(frame_display, f"Saison: {SAISON_ACTUELLE}", (250, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1)
-            cv2.putText(frame_display, f"Mode: {PARAMS[SAISON_ACTUELLE]['mode']}", (250, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
-
-            # Colonne 3 : Consigne Clim (Le résultat final)
-            color_temp = (0, 0, 255) if SAISON_ACTUELLE == "ETE" else (255, 100, 0)
-            cv2.putText(frame_display, f"CIBLE: {adjusted_target} C", (450, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color_temp, 2)
-            cv2.putText(frame_display, f"FAN: {current_hvac_power}%", (450, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+            # 4. DASHBOARD - Overlay Visuel (rendu seulement quand une valeur change, puis 1 copie)
+            infos = (count_now, adjusted_target, current_hvac_power)
+            dashboard.mettre_a_jour(infos, dessiner_dashboard, *infos)
+            dashboard.composer(frame_display)
+            if AFFICHER_MESURES:
+                calque_mesures.mettre_a_jour(mesures.version, dessiner_mesures, mesures)
+                calque_mesures.composer(frame_display)
+            t_etape = mesures.noter("dessin", t_etape)
 
             cv2.imshow(WINDOW_NAME, frame_display)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
-                running = False
                 break
+            mesures.noter("imshow", t_etape)
 
     except KeyboardInterrupt:
-        running = False
+        pass
     finally:
-        picam2.stop()
-        cv2.destroyAllWindows()
-        t.join(timeout=1)
+        arret.set()
+        tampon.fermer()
+        t.join(timeout=5)
+        if lien is not None:
+            lien.arreter()
+            print(lien.bilan())
+        mesures.arreter()
+        print(mesures.ligne(mesures.fenetre("bilan")))
+        source.arreter()
+        if not HEADLESS:
+            cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
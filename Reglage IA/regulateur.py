@@ -1,18 +1,70 @@
+import os
+import sys
 import time
-import cv2
+T_LANCEMENT = time.perf_counter()  # Origine des jalons de démarrage (imports compris)
+import signal
 import threading
-import board
 import datetime
-import adafruit_dht
-from picamera2 import Picamera2
-from ultralytics import YOLO
+
+# Modules partagés du dossier IA/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "IA"))
+from echange_images import TamponImages
+from detection import creer_detecteur, prechauffer, tableau_detections, boites_entieres, AUCUNE_DETECTION
+from cascade import creer_cascade
+from mouvement import PorteMouvement
+from sources import ouvrir_source, Cadrage
+from suivi import SuiviPersonnes
+from ordonnanceur import Ordonnanceur
+from affichage import RythmeAffichage, CalqueCache
+from capteurs import creer_piece
+from historique import Historique, code_action
+from canal import Publieur
+from cvc import LienCVC, ouvrir_transport
+from regulation import charger_table, Hysteresis
+from mesures import Instrumentation, dessiner_mesures
+from zones import Zones, CarteOccupation, dessiner_zones, dessiner_carte
 
 # ==========================================
 # 1. CONFIGURATION
 # ==========================================
 MODEL_TYPE = 'yolov8s.pt'
 CONFIDENCE = 0.50
-DHT_PIN = board.D4
+MODE_INFERENCE = "thread"  # "thread" ou "processus" (YOLO hors du GIL de l'affichage)
+BACKEND = "auto"           # "auto", "pytorch", "onnx", "openvino", "ncnn" (cf. exporter_modele.py)
+PORTE_MOUVEMENT = True     # Pas d'IA si la scène n'a pas bougé (refresh forcé toutes les 10 s)
+SOURCE = "picamera"        # "picamera", "webcam", "simulee", une vidéo ou un dossier d'images (rejeu)
+SUIVI = True               # Suivi des personnes : comptage stable + boîtes extrapolées
+CASCADE = False            # yolov8n d'abord, yolov8s si le nano hésite (valider le taux d'escalade avec benchmark.py)
+MODEL_RAPIDE = 'yolov8n.pt'
+LARGEUR_IA = 640           # Largeur de l'image IA (= imgsz du modèle, ex: 320 avec exporter_modele.py --imgsz 320)
+ROI = None                 # Zone analysée (x, y, largeur, hauteur) en fractions du champ, ex: (0.1, 0.2, 0.8, 0.8)
+HEADLESS = False           # True : Pi sans écran -> ni conversion couleur, ni dessin, ni fenêtre
+VIDEO_FPS = 30             # Cadence max de l'affichage
+CAPTEURS = ["dht11:D4"]    # Un ou plusieurs capteurs fusionnés : "dht11:D4", "dht22:D17", "simule", "rejeu:x.csv"
+AGE_MAX_MESURE = 30.0      # Mesure plus vieille (capteur muet) -> température inconnue
+CANAL = True               # Publie les valeurs vers l'écran Tkinter (socket Unix, cf. canal.py)
+AGREGATEUR = None          # ("192.168.1.10", 9870) : état de la pièce poussé à l'agrégateur du bâtiment (cf. batiment.py)
+NUMERO_PIECE = 1           # Numéro de la pièce, unique dans le bâtiment
+NOM_PIECE = "Salle 1"
+CVC = "simule"             # Sortie vers le CVC : "modbus:192.168.1.50", "tcp:hote:port", "serie:/dev/ttyUSB0", "simule", None
+PUISSANCE_CVC = 2.5        # kW en chauffe / clim (plaque du CVC) -> consommation estimée sur l'écran
+PUISSANCE_VENTILATION = 0.15  # kW du ventilateur seul à 100 %
+AFFICHER_MESURES = False   # Calque des temps par étape (p50 / p95 / part du temps)
+PERIODE_LOG_MESURES = 30.0 # Une ligne de log des temps par étape toutes les N s (None = jamais)
+PORT_MESURES = 8765        # http://127.0.0.1:8765/ (texte) et /metrics (Prometheus) ; None = pas de serveur
+ZONES = {}                 # Zones nommées (fractions du champ), ex: {"fenetre": [(0, 0), (0.3, 0), (0.3, 1), (0, 1)]}
+EXCLUSIONS = []            # Polygones dont les personnes sont ignorées (porte vitrée, miroir...)
+DEMI_VIE_CARTE = 300.0     # Carte d'occupation : une présence compte moitié moins au bout de 5 min
+AFFICHER_CARTE = False     # Calque de la carte d'occupation (redessiné toutes les 2 s)
+CLIPS = None               # Dossier des clips avant/après événement (images des occupants) ; None = aucun
+                           # ex: os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+MAX_CLIPS = 50             # Clips gardés sur disque au plus : les plus vieux sont effacés
+DISQUE_CLIPS = 200 * 1024 * 1024  # Octets de clips sur disque au plus
+BUDGET_CLIPS = 4 * 1024 * 1024  # Octets de JPEG gardés en mémoire (~40 s en 320x240 à 5 im/s)
+SECONDES_AVANT_CLIP = 10.0
+SECONDES_APRES_CLIP = 10.0
+SAUT_COMPTAGE = 3          # Clip si le comptage varie d'au moins N personnes d'une inférence à l'autre
+HISTORIQUE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historique")  # None = pas d'enregistrement
 
 # MARGE (Le "Tunnel")
 # Si on vise 20°C avec une marge de 0.5 :
@@ -30,14 +82,50 @@ HIVER_VIDE = 15.0
 HIVER_CONFORT = 19.0 
 HIVER_FOULE = 17.0   
 
+# TABLE DE REGULATION : saison -> tranches d'occupation (à partir de N personnes)
+# (personnes_min, cible, ventilateur, marge, état affiché, couleur BGR)
+TABLE_REGULATION = {
+    "ETE": {"sens": "FROID", "bandes": [
+        (0,  ETE_VIDE,    "ECO",   MARGE, "VEILLE",   (0, 255, 0)),
+        (1,  ETE_CONFORT, "MOYEN", MARGE, "CONFORT",  (0, 255, 255)),
+        (5,  24.0,        "FORT",  MARGE, "COMPENS.", (0, 165, 255)),
+        (10, ETE_FOULE,   "MAX",   MARGE, "FOULE",    (0, 0, 255)),
+    ]},
+    "HIVER": {"sens": "CHAUD", "bandes": [
+        (0,  HIVER_VIDE,    "ECO",   MARGE, "VEILLE",   (0, 255, 0)),
+        (1,  HIVER_CONFORT, "MOYEN", MARGE, "CONFORT",  (0, 255, 255)),
+        (5,  18.0,          "BAS",   MARGE, "COMPENS.", (0, 165, 255)),
+        (10, HIVER_FOULE,   "MIN",   MARGE, "ARRET",    (0, 0, 255)),
+    ]},
+}
+FICHIER_REGULATION = None  # Fichier JSON au même format (remplace la table ci-dessus)
+DUREE_MIN_MARCHE = 180.0   # Le CVC reste au moins 3 min en marche...
+DUREE_MIN_ARRET = 180.0    # ... et au moins 3 min à l'arrêt (pas de cycles courts)
+COULEURS_ACTION = {"STANDBY": (100, 100, 100), "CHAUFFE": (0, 0, 255), "CLIM ON": (255, 0, 0),
+                   "STOP (MAX)": (0, 255, 0), "ZONE CONFORT": (0, 255, 255),
+                   "DEMARRAGE": (200, 200, 200)}  # Modèle pas encore prêt : aucune décision
+
+if not HEADLESS:
+    import cv2  # Fenêtre, conversion couleur et dessin seulement : pas chargé sur un Pi sans écran
+
 # Variables partagées
-frame_buffer = None
-latest_boxes = []
+cadrage = Cadrage((640, 480), LARGEUR_IA, ROI)  # Flux IA (petit, ROI) vs flux d'affichage
+tampon = TamponImages(cadrage.forme_ia)  # Anneau d'images numérotées capture -> IA
+suivi = SuiviPersonnes() if SUIVI else None
+ordo = Ordonnanceur(periode_regulation=2.0)  # Décision suivant le DHT (1 lecture / 2 s)
+latest_boxes = AUCUNE_DETECTION
 person_count = 0
-current_temp = None
-current_hum = None
-lock = threading.Lock()
-running = True
+nb_inferences = 0          # Numéro du dernier résultat de l'IA (1 ligne d'historique par résultat)
+zones = Zones(ZONES, EXCLUSIONS, cadrage.taille_affichage)  # Masque d'étiquettes précalculé
+carte = CarteOccupation(cadrage.taille_affichage, demi_vie=DEMI_VIE_CARTE, zones=zones)
+comptes_zones = zones.compter(zones.etiquettes(AUCUNE_DETECTION))  # [hors zone, zone 1, ...]
+piece = creer_piece(CAPTEURS, AGE_MAX_MESURE)  # Mesures lues sans verrou
+regulation = Hysteresis(charger_table(FICHIER_REGULATION or TABLE_REGULATION),
+                        duree_min_marche=DUREE_MIN_MARCHE, duree_min_arret=DUREE_MIN_ARRET)
+mesures = Instrumentation(t_lancement=T_LANCEMENT)  # Temps par étape (capture, inférence, dessin...), sans allocation
+mesures.jalon("imports")
+lock = mesures.verrou("lock")  # Contention mesurée
+arret = threading.Event()  # Demande d'arrêt propre
 
 # ==========================================
 # 2. LOGIQUE INTELLIGENTE
@@ -47,126 +135,145 @@ def get_saison_automatique():
     if 5 <= mois <= 9: return "ETE"
     else: return "HIVER"
 
-def calculer_seuils(nb_personnes, saison):
-    """
-    Retourne 3 valeurs : Cible, Seuil Allumage, Seuil Extinction
-    """
-    cible = 0.0
-    fan = "OFF"
-    etat_ia = ""
-    color = (255, 255, 255)
-
-    # 1. D'ABORD ON TROUVE LA CIBLE
-    if saison == "ETE":
-        if nb_personnes == 0:
-            cible = ETE_VIDE
-            fan = "ECO"
-            etat_ia = "VEILLE"
-            color = (0, 255, 0)
-        elif nb_personnes < 5:
-            cible = ETE_CONFORT
-            fan = "MOYEN"
-            etat_ia = "CONFORT"
-            color = (0, 255, 255)
-        elif nb_personnes < 10:
-            cible = 24.0
-            fan = "FORT"
-            etat_ia = "COMPENS."
-            color = (0, 165, 255)
-        else:
-            cible = ETE_FOULE
-            fan = "MAX"
-            etat_ia = "FOULE"
-            color = (0, 0, 255)
-        
-        # EN ETE (CLIM) : 
-        # On allume si T > Cible + Marge (Il fait trop chaud)
-        # On coupe si T < Cible - Marge (Il fait assez frais)
-        seuil_allumage = cible + MARGE
-        seuil_extinction = cible - MARGE
-
-    elif saison == "HIVER":
-        if nb_personnes == 0:
-            cible = HIVER_VIDE
-            fan = "ECO"
-            etat_ia = "VEILLE"
-            color = (0, 255, 0)
-        elif nb_personnes < 5:
-            cible = HIVER_CONFORT
-            fan = "MOYEN"
-            etat_ia = "CONFORT"
-            color = (0, 255, 255)
-        elif nb_personnes < 10:
-            cible = 18.0
-            fan = "BAS"
-            etat_ia = "COMPENS."
-            color = (0, 165, 255)
-        else:
-            cible = HIVER_FOULE
-            fan = "MIN"
-            etat_ia = "ARRET"
-            color = (0, 0, 255)
-
-        # EN HIVER (CHAUFFAGE) :
-        # On allume si T < Cible - Marge (Il fait trop froid)
-        # On coupe si T > Cible + Marge (Il fait assez chaud -> C'est ton Seuil Max)
-        seuil_allumage = cible - MARGE
-        seuil_extinction = cible + MARGE
-            
-    return cible, seuil_allumage, seuil_extinction, fan, etat_ia, color
-
 # ==========================================
 # 3. WORKERS (TACHES DE FOND)
 # ==========================================
 def ai_worker():
-    global latest_boxes, person_count, frame_buffer
-    model = YOLO(MODEL_TYPE)
-    while running:
-        img_copy = None
-        with lock:
-            if frame_buffer is not None: img_copy = frame_buffer.copy()
-        if img_copy is not None:
-            results = model(img_copy, classes=[0], conf=CONFIDENCE, verbose=False)
-            temp_boxes = []
-            for r in results:
-                for box in r.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0]
-                    temp_boxes.append((int(x1), int(y1), int(x2), int(y2)))
+    global latest_boxes, person_count, nb_inferences, comptes_zones
+    if CASCADE:
+        # Le nano voit aussi les personnes exclues : on les rajoute au comptage de référence
+        detecteur = creer_cascade(MODE_INFERENCE, MODEL_RAPIDE, MODEL_TYPE, CONFIDENCE,
+                                  forme=cadrage.forme_ia, backend=BACKEND,
+                                  compte_reference=(lambda: suivi.nb_vues() + zones.nb_exclus)
+                                  if suivi is not None else None)
+    else:
+        detecteur = creer_detecteur(MODE_INFERENCE, MODEL_TYPE, CONFIDENCE, cadrage.forme_ia, BACKEND)
+    mesures.jalon("modele charge")
+    # Pendant que la caméra démarre : la 1re vraie image ne paiera plus le 1er appel
+    prechauffer(detecteur, cadrage.forme_ia)
+    mesures.jalon("prechauffage")
+    porte = PorteMouvement() if PORTE_MOUVEMENT else None
+    dernier_seq = 0
+    try:
+        while not arret.is_set():
+            # L'ordonnanceur décide QUAND relancer l'IA (besoins + température du Pi)
+            ordo.attendre_creneau(arret)
+            # On attend une image NOUVELLE (pas de copie, pas de doublon)
+            t_etape = time.perf_counter()
+            seq, img = tampon.attendre(dernier_seq, timeout=0.5)
+            t_image = time.monotonic()
+            if img is None: continue
+            t_etape = mesures.noter("attente image", t_etape)
+            if porte is not None and not porte.doit_analyser(img, forcer=suivi is not None and suivi.a_verifier()):
+                # Scène inchangée : latest_boxes reste valable
+                tampon.liberer(seq); dernier_seq = seq; mesures.noter("porte", t_etape); continue
+            t_etape = mesures.noter("porte", t_etape)
+            t0 = time.monotonic()
+            try: brut = detecteur.detecter(img)
+            finally: tampon.liberer(seq)
+            t_etape = mesures.noter("inference", t_etape)
+            dernier_seq = seq
+            # Porte vitrée, miroir... : retirés AVANT le suivi, jamais comptés
+            detections = zones.filtrer(tableau_detections(cadrage.vers_affichage(brut)))
+            if suivi is not None:
+                # Un raté isolé de YOLO ne fait plus varier le comptage
+                detections = suivi.mettre_a_jour(detections, t_image)
+            comptes = zones.compter(zones.etiquettes(detections))
+            carte.ajouter(detections, t_image)
+            mesures.noter("post-traitement", t_etape)
+            # Tableau figé publié tel quel : les lecteurs n'ont rien à copier
             with lock:
-                latest_boxes = temp_boxes
-                person_count = len(temp_boxes)
-        else:
-            time.sleep(0.01)
-
-def dht_worker():
-    global current_temp, current_hum
-    try: dht_device = adafruit_dht.DHT11(DHT_PIN)
-    except: return
-    while running:
-        try:
-            t = dht_device.temperature
-            h = dht_device.humidity
-            if t is not None:
-                with lock: current_temp = t; current_hum = h
-        except: pass
-        time.sleep(2.0)
+                latest_boxes = detections
+                person_count = len(detections)
+                comptes_zones = comptes
+                nb_inferences += 1
+            if "1re detection" not in mesures.jalons:
+                mesures.jalon("1re detection"); print(mesures.ligne_demarrage())
+            ordo.noter_inference(t0, time.monotonic(), len(detections))
+    finally:
+        detecteur.arreter()
+        if CASCADE:
+            print(detecteur.bilan())
+        if porte is not None:
+            print(f"IA évitée sur {porte.taux_saut():.0%} des images (scène immobile)")
 
 # ==========================================
 # 4. AFFICHAGE ET DECISION FINALE
 # ==========================================
-def main():
-    global frame_buffer, running
+def dessiner_dashboard(panneau, temp, nb, saison, cible, s_on, s_off, fan, color, action_txt, action_color):
+    """Dessine le panneau 640x120 (3 colonnes) dans son calque."""
+    # Fond
+    cv2.rectangle(panneau, (0, 0), (640, 120), (20, 20, 20), -1)
+
+    # 1. REEL
+    if temp is not None: t_str = f"{temp:.1f} C"
+    else: t_str = "--.- C"
+    cv2.putText(panneau, "REEL", (10, 20), 0, 0.5, (200, 200, 200), 1)
+    cv2.putText(panneau, t_str, (10, 55), 0, 1.0, (255, 255, 255), 2)
+    cv2.putText(panneau, f"{nb} Pers.", (10, 90), 0, 0.7, (0, 255, 0), 2)
+
+    # 2. STRATEGIE (Le Tunnel)
+    cv2.putText(panneau, "STRATEGIE", (200, 20), 0, 0.5, (200, 200, 200), 1)
     
-    picam2 = Picamera2()
-    config = picam2.create_video_configuration(main={"size": (640, 480), "format": "RGB888"})
-    picam2.configure(config)
-    picam2.start()
-    cv2.namedWindow("Smart Dashboard", cv2.WINDOW_NORMAL)
+    # Affichage clair : ON < CIBLE > OFF
+    # Seuil BAS (Allumage en hiver)
+    cv2.putText(panneau, f"ON : {s_on}", (200, 45), 0, 0.5, (100, 255, 255), 1)
+    # CIBLE
+    cv2.putText(panneau, f"BUT: {cible}", (200, 75), 0, 0.9, color, 2)
+    # Seuil HAUT (Extinction)
+    cv2.putText(panneau, f"OFF: {s_off}", (200, 100), 0, 0.5, (100, 255, 100), 1)
+
+    # 3. ACTION
+    cv2.putText(panneau, f"MODE {saison}", (450, 20), 0, 0.5, (200, 200, 200), 1)
+    cv2.putText(panneau, action_txt, (420, 60), 0, 0.8, action_color, 2)
+    cv2.putText(panneau, f"FAN: {fan}", (450, 90), 0, 0.5, (200, 200, 200), 1)
 
+def main():
+    # Modèle (chargement + préchauffage) en parallèle de l'initialisation de la caméra
     t1 = threading.Thread(target=ai_worker)
-    t2 = threading.Thread(target=dht_worker)
-    t1.daemon = True; t2.daemon = True
-    t1.start(); t2.start()
+    t1.daemon = True
+    t1.start()
+    source = ouvrir_source(SOURCE, cadrage=cadrage, affichage=not HEADLESS)
+    source.demarrer()
+    mesures.jalon("camera")
+    if not HEADLESS: cv2.namedWindow("Smart Dashboard", cv2.WINDOW_NORMAL)
+    ordo.noter_affichage(not HEADLESS)
+    rythme = RythmeAffichage(VIDEO_FPS)
+    dashboard = CalqueCache((120, 640))
+    calque_mesures = CalqueCache((200, 300), position=(340, 120), opaque=False)
+    calque_zones = CalqueCache((480, 640), opaque=False)
+    calque_carte = CalqueCache((480, 640), opaque=False)
+    mesures.demarrer(periode_log=PERIODE_LOG_MESURES, port=PORT_MESURES)
+
+    piece.demarrer(arret)  # Un thread par capteur
+    historique = Historique(HISTORIQUE) if HISTORIQUE else None
+    if historique is not None:
+        historique.demarrer()  # Écritures groupées toutes les 10 s
+    derniere_inference = 0
+    enregistreur = None
+    if CLIPS:
+        from clips import EnregistreurClips  # Imports des options seulement si elles servent
+        enregistreur = EnregistreurClips(CLIPS, BUDGET_CLIPS, SECONDES_AVANT_CLIP, SECONDES_APRES_CLIP,
+                                         contexte={"taille_boites": cadrage.taille_affichage, "roi": cadrage.roi,
+                                                   "flux": "ia" if HEADLESS else "affichage"},
+                                         mesures=mesures, max_clips=MAX_CLIPS, disque_max=DISQUE_CLIPS)
+        enregistreur.demarrer()  # Encodage JPEG dans son thread
+        if HEADLESS and hasattr(signal, "SIGUSR1"):
+            # Sans écran ni clavier : kill -USR1 <pid> demande un clip
+            signal.signal(signal.SIGUSR1, lambda *_: enregistreur.declencher("manuel"))
+    nb_precedent = etat_precedent = None
+    inference_clip = inference_zones = 0
+    publieur = Publieur() if CANAL else None
+    if publieur is not None:
+        publieur.demarrer()
+    noeud = None
+    if AGREGATEUR:
+        from batiment import NoeudBatiment
+        noeud = NoeudBatiment(AGREGATEUR, {NUMERO_PIECE: NOM_PIECE})
+        noeud.demarrer()  # Deltas groupés en UDP, jamais d'E/S dans la boucle
+    lien = LienCVC(ouvrir_transport(CVC)) if CVC else None
+    if lien is not None:
+        lien.demarrer()  # Boucle asyncio à part : envoyer() ne bloque jamais
 
     try:
         while True:
@@ -175,82 +282,140 @@ def main():
             # Pour tester l'hiver avec ta pièce à 22°C :
             # saison = "HIVER"
 
-            frame_rgb = picam2.capture_array()
-            frame_disp = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+            t_etape = time.perf_counter()
+            image_ia, frame_rgb = source.lire_double()  # frame_rgb = None sans écran
+            if image_ia is None: break  # Fin du rejeu
+            t_etape = mesures.noter("capture", t_etape)
+
+            # capture_array() alloue une image neuve et on dessine sur frame_disp -> zéro copie
+            tampon.publier(image_ia, copie=False)
+            t_etape = mesures.noter("publication", t_etape)
 
             with lock:
-                frame_buffer = frame_rgb
                 nb = person_count
-                temp = current_temp
-                boxes = list(latest_boxes)
-
-            # B. CALCUL DES SEUILS
-            cible, s_on, s_off, fan, etat, color = calculer_seuils(nb, saison)
-
-            # C. DECISION REELLE (ON/OFF)
-            action_txt = "STANDBY"
-            action_color = (100, 100, 100) # Gris
-
-            if temp is not None:
-                if saison == "HIVER":
-                    # Chauffage
-                    if temp < s_on:
-                        action_txt = "CHAUFFE"
-                        action_color = (0, 0, 255) # Rouge
-                    elif temp > s_off:
-                        action_txt = "STOP (MAX)"
-                        action_color = (0, 255, 0) # Vert
-                    else:
-                        action_txt = "ZONE CONFORT" # Entre les deux
-                        action_color = (0, 255, 255)
-                
-                else: # ETE
-                    # Clim
-                    if temp > s_on:
-                        action_txt = "CLIM ON"
-                        action_color = (255, 0, 0) # Bleu
-                    elif temp < s_off:
-                        action_txt = "STOP (MAX)"
-                        action_color = (0, 255, 0) # Vert
-                    else:
-                        action_txt = "ZONE CONFORT"
-
-            # D. DESSIN DASHBOARD (3 COLONNES)
-            # Fond
-            cv2.rectangle(frame_disp, (0, 0), (640, 120), (20, 20, 20), -1)
-
-            # 1. REEL
-            if temp is not None: t_str = f"{temp:.1f} C"
-            else: t_str = "--.- C"
-            cv2.putText(frame_disp, "REEL", (10, 20), 0, 0.5, (200, 200, 200), 1)
-            cv2.putText(frame_disp, t_str, (10, 55), 0, 1.0, (255, 255, 255), 2)
-            cv2.putText(frame_disp, f"{nb} Pers.", (10, 90), 0, 0.7, (0, 255, 0), 2)
-
-            # 2. STRATEGIE (Le Tunnel)
-            cv2.putText(frame_disp, "STRATEGIE", (200, 20), 0, 0.5, (200, 200, 200), 1)
-            
-            # Affichage clair : ON < CIBLE > OFF
-            # Seuil BAS (Allumage en hiver)
-            cv2.putText(frame_disp, f"ON : {s_on}", (200, 45), 0, 0.5, (100, 255, 255), 1)
-            # CIBLE
-            cv2.putText(frame_disp, f"BUT: {cible}", (200, 75), 0, 0.9, color, 2)
-            # Seuil HAUT (Extinction)
-            cv2.putText(frame_disp, f"OFF: {s_off}", (200, 100), 0, 0.5, (100, 255, 100), 1)
-
-            # 3. ACTION
-            cv2.putText(frame_disp, f"MODE {saison}", (450, 20), 0, 0.5, (200, 200, 200), 1)
-            cv2.putText(frame_disp, action_txt, (420, 60), 0, 0.8, action_color, 2)
-            cv2.putText(frame_disp, f"FAN: {fan}", (450, 90), 0, 0.5, (200, 200, 200), 1)
+                boxes = latest_boxes
+                comptes = comptes_zones
+                inference = nb_inferences
+            mesure = piece.mesure()  # Sans verrou ; None si tous les capteurs sont muets
+            temp = None if mesure is None else mesure.temperature
+            if suivi is not None:
+                # Boîtes extrapolées entre deux passages de l'IA
+                boxes = suivi.boites_predites(time.monotonic())
+            t_etape = mesures.noter("lecture resultats", t_etape)
+
+            # B + C. TABLE (cible, seuils) PUIS DECISION AVEC MEMOIRE
+            # Entre les seuils le CVC garde son état ; durées min de marche / d'arrêt respectées
+            # Thread IA mort (processus d'inférence perdu, modèle introuvable...) : nb est figé,
+            # on arrête le CVC comme pour un capteur muet au lieu de réguler dessus
+            panne_ia = not t1.is_alive()
+            demarrage = inference == 0 and not panne_ia
+            if panne_ia:
+                consigne, action_txt = regulation.decider(saison, 0, None)
+                cible, s_on, s_off, fan, _, _ = consigne
+                etat, color = "PANNE IA", COULEURS_ACTION["STANDBY"]
+            elif demarrage:
+                # Pas encore de vraie détection : "0 personne" ne veut rien dire, on ne décide
+                # rien (sinon la cible "pièce vide" partirait au CVC pendant le préchauffage)
+                cible = s_on = s_off = fan = "--"
+                etat, color, action_txt = "DEMARRAGE", COULEURS_ACTION["DEMARRAGE"], "DEMARRAGE"
+            else:
+                consigne, action_txt = regulation.decider(saison, nb, temp)
+                cible, s_on, s_off, fan, etat, color = consigne
+            action_color = COULEURS_ACTION[action_txt]
+
+            # H. CLIPS : image déposée (réf., sans copie), déclenchements = simples append
+            if enregistreur is not None:
+                enregistreur.proposer(image_ia if frame_rgb is None else frame_rgb, boxes,
+                                      {"personnes": nb, "temperature": temp, "cible": cible,
+                                       "etat": etat, "action": action_txt})
+                if inference != inference_clip:
+                    inference_clip = inference
+                    if nb_precedent is not None and abs(nb - nb_precedent) >= SAUT_COMPTAGE:
+                        enregistreur.declencher("comptage")
+                    nb_precedent = nb
+                if not demarrage:
+                    if etat_precedent is not None and etat != etat_precedent:
+                        enregistreur.declencher("tranche")
+                    etat_precedent = etat
+
+            # E. HISTORIQUE : une ligne par nouveau résultat de l'IA (simple append en mémoire)
+            if historique is not None and inference != derniere_inference:
+                derniere_inference = inference
+                historique.ajouter(nb, temp, None if mesure is None else mesure.humidite,
+                                   cible, s_on, s_off, action_txt)
+
+            # E bis. ZONES : personnes et chaleur récente par zone, sur /metrics (une fois par inférence)
+            if zones.noms and inference != inference_zones:
+                inference_zones = inference
+                mesures.jauge("zone_personnes", "zone", zones.comptes(comptes))
+                mesures.jauge("zone_chaleur_secondes", "zone", zones.comptes(carte.par_zone()))
+
+            # F. ECRAN TKINTER ET AGREGATEUR : seuls les champs modifiés partiront
+            if not demarrage and (publieur is not None or noeud is not None):
+                etat_piece = dict(temperature=temp, humidite=None if mesure is None else mesure.humidite,
+                                  personnes=None if panne_ia else nb, cible=cible,
+                                  seuil_on=s_on, seuil_off=s_off, action=code_action(action_txt))
+                if lien is not None:
+                    # Etat réel du lien CVC (pas la décision) : carte CONSOMMATION et total du bâtiment
+                    etat_piece["fonctionne"] = int(lien.fonctionne())
+                    etat_piece["consommation"] = lien.puissance_estimee(PUISSANCE_CVC, PUISSANCE_VENTILATION)
+                if publieur is not None:
+                    publieur.publier(**etat_piece)
+                if noeud is not None:
+                    noeud.publier(NUMERO_PIECE, **etat_piece)
+
+            # G. SORTIE CVC : décision recalculée à chaque image, mais les doublons ne partent pas
+            if lien is not None and not demarrage:
+                lien.envoyer(cible, fan, action_txt)
+            t_etape = mesures.noter("regulation", t_etape)
+
+            # Sans écran, ou pas encore l'heure de redessiner : la décision est prise, on s'arrête là
+            if HEADLESS or not rythme.doit_afficher((nb, temp, action_txt, saison, boites_entieres(boxes).tobytes())):
+                continue
+            frame_disp = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+            t_etape = mesures.noter("couleur", t_etape)
+
+            # Carte d'occupation puis zones, sous le dashboard
+            if AFFICHER_CARTE:
+                calque_carte.mettre_a_jour(int(time.monotonic() / 2), dessiner_carte, carte)
+                calque_carte.composer(frame_disp)
+            if zones.actives():
+                calque_zones.mettre_a_jour(comptes.tobytes(), dessiner_zones, zones, comptes)
+                calque_zones.composer(frame_disp)
+
+            # D. DASHBOARD (3 COLONNES) : rendu seulement quand une valeur change, puis 1 copie
+            infos = (temp, nb, saison, cible, s_on, s_off, fan, color, action_txt, action_color)
+            dashboard.mettre_a_jour(infos, dessiner_dashboard, *infos)
+            dashboard.composer(frame_disp)
 
             # Dessin Carrés
-            for (x1, y1, x2, y2) in boxes:
+            for (x1, y1, x2, y2) in boites_entieres(boxes).tolist():
                 cv2.rectangle(frame_disp, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            if AFFICHER_MESURES:
+                calque_mesures.mettre_a_jour(mesures.version, dessiner_mesures, mesures)
+                calque_mesures.composer(frame_disp)
+            t_etape = mesures.noter("dessin", t_etape)
 
             cv2.imshow("Smart Dashboard", frame_disp)
-            if cv2.waitKey(1) & 0xFF == ord('q'): running = False; break
+            touche = cv2.waitKey(1) & 0xFF
+            if touche == ord('q'): break
+            if touche == ord('c') and enregistreur is not None: enregistreur.declencher("manuel")
+            mesures.noter("imshow", t_etape)
 
-    except KeyboardInterrupt: running = False
-    finally: picam2.stop(); cv2.destroyAllWindows()
+    except KeyboardInterrupt: pass
+    finally:
+        arret.set(); tampon.fermer()
+        t1.join(timeout=5); piece.joindre(timeout=3)
+        if historique is not None: historique.arreter()
+        if enregistreur is not None:
+            enregistreur.arreter(); print(enregistreur.bilan())
+        if publieur is not None: publieur.arreter()
+        if noeud is not None: noeud.arreter()
+        if lien is not None:
+            lien.arreter(); print(lien.bilan())
+        mesures.arreter(); print(mesures.ligne(mesures.fenetre("bilan")))
+        source.arreter()
+        if not HEADLESS: cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
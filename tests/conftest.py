@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules partagés sont dans IA/ (comme pour les scripts de "Reglage IA")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "IA"))
@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+
+from batiment import IndexPieces, decoder_trames, encoder_trame
+from canal import ID_CHAMP
+
+I_PERSONNES = ID_CHAMP["personnes"]
+I_TEMPERATURE = ID_CHAMP["temperature"]
+
+
+def trame(piece, seq, valeurs, nom=None, t=100.0):
+    """Une trame encodée puis décodée, telle que l'agrégateur la reçoit."""
+    trames, reste = decoder_trames(encoder_trame(piece, seq, t, valeurs, nom))
+    assert reste == b""
+    return trames[0]
+
+
+# --- Format des trames ---
+def test_aller_retour_delta():
+    piece, seq, t, complete, ids, valeurs, nom = trame(12, 7, {"personnes": 4, "temperature": None})
+    assert (piece, seq, t, complete, nom) == (12, 7, 100.0, False, None)
+    assert ids == [I_PERSONNES, I_TEMPERATURE]
+    assert valeurs[0] == 4.0 and math.isnan(valeurs[1])   # None part en NaN
+
+def test_aller_retour_complete_avec_nom():
+    _, _, _, complete, ids, valeurs, nom = trame(3, 1, {"temperature": 21.5}, nom="Salle 3 é")
+    assert complete and nom == "Salle 3 é"
+    assert ids == [I_TEMPERATURE] and valeurs == [21.5]
+
+def test_plusieurs_trames_et_trame_coupee():
+    a = encoder_trame(1, 1, 1.0, {"personnes": 1})
+    b = encoder_trame(2, 1, 1.0, {"personnes": 2}, nom="B")
+    c = encoder_trame(3, 1, 1.0, {"personnes": 3})
+    trames, reste = decoder_trames(a + b + c[:-3])
+    assert [x[0] for x in trames] == [1, 2]
+    assert reste == c[:-3]                               # Gardée pour la lecture suivante (TCP)
+    trames, reste = decoder_trames(reste + c[-3:])
+    assert [x[0] for x in trames] == [3] and reste == b""
+
+def test_trame_incoherente_jetee():
+    bonne = encoder_trame(1, 1, 1.0, {"personnes": 1})
+    fausse = bytearray(encoder_trame(2, 1, 1.0, {"personnes": 2, "temperature": 20.0}))
+    fausse[0] = 4                                        # Longueur plus courte que ses champs
+    trames, reste = decoder_trames(bonne + bytes(fausse) + bonne)
+    assert [x[0] for x in trames] == [1] and reste == b""
+
+
+# --- Index de l'agrégateur ---
+def test_trous_de_sequence():
+    index = IndexPieces(nb_max=4)
+    index.appliquer([trame(12, 1, {"personnes": 2, "temperature": 20.0}, nom="Salle 12")], 0.0)
+    assert index.complet[0] and index.noms[12] == "Salle 12"
+    # Trames 2 et 3 perdues
+    index.appliquer([trame(12, 4, {"personnes": 5})], 1.0)
+    assert index.nb_pertes == 2 and not index.complet[0]
+    assert index.etat[0, I_PERSONNES] == 5 and index.etat[0, I_TEMPERATURE] == 20.0
+    # La trame complète suivante repart de zéro : un champ absent redevient inconnu
+    index.appliquer([trame(12, 5, {"personnes": 5}, nom="Salle 12")], 2.0)
+    assert index.complet[0] and np.isnan(index.etat[0, I_TEMPERATURE])
+
+def test_doublon_et_trame_en_retard_rejetes():
+    index = IndexPieces(nb_max=4)
+    index.appliquer([trame(12, 1, {"personnes": 1}, nom="A"), trame(12, 3, {"personnes": 3})], 0.0)
+    index.appliquer([trame(12, 3, {"personnes": 3}), trame(12, 2, {"personnes": 2})], 1.0)
+    assert index.nb_rejets == 2
+    assert index.etat[0, I_PERSONNES] == 3 and index.seq[0] == 3
+
+def test_redemarrage_du_noeud():
+    index = IndexPieces(nb_max=4)
+    index.appliquer([trame(12, 1, {"personnes": 1}, nom="A"), trame(12, 50, {"personnes": 6})], 0.0)
+    # Le noeud redémarre : seq repart à 1, sur une trame complète -> acceptée
+    index.appliquer([trame(12, 1, {"personnes": 0}, nom="A")], 1.0)
+    assert index.seq[0] == 1 and index.etat[0, I_PERSONNES] == 0 and index.complet[0]
+    index.appliquer([trame(12, 2, {"personnes": 1})], 2.0)
+    assert index.etat[0, I_PERSONNES] == 1 and index.nb_rejets == 0
+
+def test_index_plein_et_hors_ligne():
+    index = IndexPieces(nb_max=2, delai_perte=10.0)
+    index.appliquer([trame(p, 1, {"personnes": p}, nom=str(p)) for p in (1, 2, 3)], 0.0)
+    assert index.nb == 2 and index.nb_rejets == 1 and 3 not in index.ligne
+    index.appliquer([trame(2, 2, {"personnes": 2})], 8.0)
+    assert index.en_ligne(12.0).tolist() == [False, True]
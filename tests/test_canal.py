@@ -0,0 +1,21 @@
+from canal import ENTETE, decoder, encoder
+
+
+def test_aller_retour():
+    trames, reste = decoder(encoder(1.5, {"personnes": 3, "temperature": None}))
+    assert reste == b""
+    (t, valeurs), = trames
+    assert t == 1.5 and valeurs["personnes"] == 3.0 and valeurs["temperature"] is None
+
+def test_trame_coupee_gardee():
+    trame = encoder(1.0, {"personnes": 3})
+    trames, reste = decoder(trame + trame[:4])
+    assert len(trames) == 1 and reste == trame[:4]
+
+def test_trame_incoherente():
+    bonne = encoder(1.0, {"personnes": 1})
+    fausse = bytearray(encoder(2.0, {"personnes": 2, "temperature": 20.0}))
+    fausse[0] = ENTETE.size - 2                 # Longueur plus courte que ses champs
+    trames, reste = decoder(bonne + bytes(fausse) + bonne)
+    # Les trames valides d'avant sont gardées, le reste signale un flux à reprendre
+    assert [v for _, v in trames] == [{"personnes": 1.0}] and reste is None
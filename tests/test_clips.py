@@ -0,0 +1,96 @@
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from clips import EnregistreurClips
+
+
+def image(i):
+    """Image 64x48 différente pour chaque i (bruit -> JPEG de taille variable)."""
+    return np.random.default_rng(i).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+def jpeg(i, qualite=70):
+    return cv2.imencode(".jpg", image(i), [cv2.IMWRITE_JPEG_QUALITY, qualite])[1].ravel()
+
+def enregistreur(dossier, budget):
+    # Images déjà en BGR et plus étroites que largeur : le JPEG stocké est celui de jpeg(i)
+    return EnregistreurClips(str(dossier), budget=budget, avant=2.0, apres=1.0, fps=10.0, rgb=False)
+
+
+def test_anneau_ecrase_les_plus_vieilles(tmp_path):
+    taille = len(jpeg(0))
+    e = enregistreur(tmp_path, budget=3 * taille + taille // 2)
+    for i in range(40):
+        e._encoder(image(i), float(i), None, None)
+        budget = len(e.memoire)
+        assert 0 < e.octets <= budget
+        assert e.octets == sum(n for _, n, *_ in e.index)
+        # Les images gardées tiennent dans le dernier tour du tampon, sans chevaucher sa fin
+        for debut, n, *_ in e.index:
+            assert e.ecrit - budget <= debut and debut % budget + n <= budget
+    # Les plus récentes restent, octet pour octet
+    assert e.index[-1][2] == 39.0 and 2 <= len(e.index) <= 4
+    for debut, n, t, _, _ in e.index:
+        debut %= len(e.memoire)
+        assert bytes(e.memoire[debut:debut + n]) == jpeg(int(t)).tobytes()
+
+def test_image_plus_grande_que_le_budget(tmp_path):
+    e = enregistreur(tmp_path, budget=100)
+    e._encoder(image(0), 0.0, None, None)
+    assert e.nb_trop_grandes == 1 and not e.index and e.ecrit == 0
+
+def test_declencher_sans_reveil(tmp_path):
+    e = enregistreur(tmp_path, budget=1 << 16)
+    e.declencher("manuel", t=5.0)
+    # Gestionnaire de signal : ni verrou ni Event.set(), l'encodeur passe de lui-même
+    assert not e.reveil.is_set()
+    assert list(e.evenements) == [(5.0, "manuel")]
+
+def test_clip_avant_apres(tmp_path):
+    e = enregistreur(tmp_path, budget=1 << 16)
+    for i in range(10):
+        e._encoder(image(i), float(i), None, {"personnes": i})
+    e.declencher("comptage", t=5.0)
+    e.declencher("tranche", t=5.5)        # Pendant le clip en cours : mêmes images
+    e._evenements(5.9)                    # "apres" pas encore écoulé
+    assert e.nb_clips == 0 and e.en_cours is not None
+    e._evenements(6.0)
+    assert e.nb_clips == 1
+    dossier, = [os.path.join(tmp_path, d) for d in os.listdir(tmp_path)]
+    with open(os.path.join(dossier, "evenement.json")) as f:
+        evenement = json.load(f)
+    assert evenement["raisons"] == ["comptage", "tranche"]
+    assert [ligne["t"] for ligne in evenement["images"]] == [3.0, 4.0, 5.0, 6.0]
+    assert evenement["images"][0]["personnes"] == 3
+    with open(os.path.join(dossier, "0000.jpg"), "rb") as f:
+        assert f.read() == jpeg(3).tobytes()
+
+@pytest.mark.parametrize("budget", [1 << 12, 1 << 16])
+def test_clip_vide_si_tout_est_ecrase(tmp_path, budget):
+    e = enregistreur(tmp_path, budget=budget)
+    for i in range(30):
+        e._encoder(image(i), float(i), None, None)
+    e.declencher("manuel", t=1.0)
+    e._evenements(2.0)
+    # Images de [t - 2, t + 1] déjà écrasées avec le petit budget, présentes avec le grand
+    assert (e.nb_clips, e.nb_clips_vides) == ((0, 1) if budget == 1 << 12 else (1, 0))
+
+def test_retention_efface_les_plus_vieux(tmp_path):
+    e = EnregistreurClips(str(tmp_path), budget=1 << 16, avant=0.5, apres=0.5, fps=10.0, rgb=False,
+                          max_clips=2)
+    os.makedirs(tmp_path / "autre")            # Pas un clip : jamais effacé
+    for i in range(5):
+        e._encoder(image(i), 10.0 * i, None, None)
+        e.declencher(f"c{i}", t=10.0 * i)
+        e._evenements(10.0 * i + 1)
+    clips = sorted(d for d in os.listdir(tmp_path) if d != "autre")
+    assert e.nb_clips == 5 and e.nb_clips_effaces == 3
+    assert [d.rsplit("_", 1)[1] for d in clips] == ["c3", "c4"]
+    assert os.path.isdir(tmp_path / "autre")
+    # Budget disque : un seul clip tient
+    e.disque_max = sum(f.stat().st_size for f in os.scandir(tmp_path / clips[1]))
+    e._elaguer()
+    assert sorted(d for d in os.listdir(tmp_path) if d != "autre") == clips[1:]
@@ -0,0 +1,88 @@
+import numpy as np
+
+from regulation import Hysteresis, TableRegulation, basculer
+from historique import ACTIONS
+
+# Clim en été : marche au-dessus de 24.5, arrêt en dessous de 23.5
+# Chauffage en hiver : marche en dessous de 19.5, arrêt au-dessus de 20.5
+CONFIG = {
+    "ETE": {"sens": "FROID", "bandes": [(0, 24.0, "ECO", 0.5), (5, 22.0, "MAX", 0.5)]},
+    "HIVER": {"sens": "CHAUD", "bandes": [(0, 20.0, "ECO", 0.5)]},
+    "MI-SAISON": {"sens": "VENTILATION", "bandes": [(0, 21.0, "BAS", 0.5)]},
+}
+
+
+def regulateur(duree_min_marche=0.0, duree_min_arret=0.0):
+    return Hysteresis(TableRegulation(CONFIG), 1, duree_min_marche, duree_min_arret)
+
+def etape(h, temperature, t, saison="ETE", personnes=0):
+    return h.decider(saison, personnes, temperature, t)[1]
+
+
+# --- Table ---
+def test_seuils_selon_le_sens():
+    table = TableRegulation(CONFIG)
+    assert table.consigne("ETE", 0)[1:3] == (24.5, 23.5)
+    assert table.consigne("HIVER", 0)[1:3] == (19.5, 20.5)
+    # Tranche choisie par le nombre de personnes
+    assert table.consigne("ETE", 7).cible == 22.0
+
+
+# --- Hystérésis ---
+def test_etat_garde_entre_les_seuils():
+    h = regulateur()
+    assert etape(h, 24.0, 0) == "ZONE CONFORT"     # Entre les seuils, à l'arrêt : reste arrêté
+    assert etape(h, 25.0, 1) == "CLIM ON"
+    assert etape(h, 24.0, 2) == "CLIM ON"          # Entre les seuils, en marche : reste en marche
+    assert etape(h, 23.6, 3) == "CLIM ON"
+    assert etape(h, 23.0, 4) == "STOP (MAX)"
+    assert etape(h, 24.0, 5) == "ZONE CONFORT"
+    assert h.nb_cycles[0] == 1
+
+def test_chauffage_sens_inverse():
+    h = regulateur()
+    assert etape(h, 19.0, 0, "HIVER") == "CHAUFFE"
+    assert etape(h, 20.0, 1, "HIVER") == "CHAUFFE"
+    assert etape(h, 21.0, 2, "HIVER") == "STOP (MAX)"
+
+def test_durees_minimales_de_marche_et_d_arret():
+    h = regulateur(duree_min_marche=180.0, duree_min_arret=120.0)
+    assert etape(h, 25.0, 0) == "CLIM ON"
+    # Trop froid mais pas encore 180 s de marche : le compresseur continue
+    assert etape(h, 23.0, 100) == "CLIM ON"
+    assert etape(h, 23.0, 180) == "STOP (MAX)"
+    # Trop chaud mais pas encore 120 s d'arrêt
+    assert etape(h, 25.0, 250) == "ZONE CONFORT"
+    assert etape(h, 25.0, 300) == "CLIM ON"
+    assert h.nb_cycles[0] == 2
+
+def test_capteur_muet_arret_immediat():
+    h = regulateur(duree_min_marche=180.0)
+    assert etape(h, 25.0, 0) == "CLIM ON"
+    # NaN (ou None) : STANDBY et arrêt sans attendre la durée minimale de marche
+    assert etape(h, None, 1) == "STANDBY"
+    assert not h.marche[0]
+    assert etape(h, float("nan"), 2) == "STANDBY"
+
+def test_ventilation_jamais_en_marche():
+    h = regulateur()
+    assert etape(h, 35.0, 0, "MI-SAISON") == "ZONE CONFORT"
+    assert not h.marche[0]
+
+def test_plusieurs_pieces_en_un_pas():
+    h = Hysteresis(TableRegulation(CONFIG), 3, 0.0, 0.0)
+    marche, actions = h.pas(["ETE", "HIVER", "ETE"], [0, 0, 0], [25.0, 19.0, np.nan], t=0)
+    assert marche.tolist() == [True, True, False]
+    assert [ACTIONS[a] for a in actions] == ["CLIM ON", "CHAUFFE", "STANDBY"]
+
+
+# --- basculer() seul (partagé avec simulation.py) ---
+def test_basculer_tableaux():
+    marche = np.array([False, True, True, False])
+    t_bascule = np.array([-np.inf, 0.0, 0.0, -np.inf])
+    temperatures = np.array([25.0, 23.0, 23.0, np.nan])
+    sens = np.array([1, 1, 1, 1])
+    bascule, depasse = basculer(marche, t_bascule, np.array([10.0, 10.0, 500.0, 10.0]),
+                                temperatures, sens, 24.5, 23.5, 180.0, 180.0)
+    assert bascule.tolist() == [True, False, True, False]
+    assert depasse.tolist() == [False, True, True, False]
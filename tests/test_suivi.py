@@ -0,0 +1,93 @@
+import numpy as np
+
+from detection import DTYPE_DETECTION
+from suivi import SuiviPersonnes, iou_matrice
+
+
+def detections(*boites, conf=0.9):
+    """Boîtes xyxy -> tableau DTYPE_DETECTION (mêmes confiances)."""
+    d = np.zeros(len(boites), dtype=DTYPE_DETECTION)
+    if boites:
+        d["xyxy"] = boites
+    d["conf"] = conf
+    return d
+
+PERSONNE = (100, 100, 160, 300)
+
+
+def test_iou_matrice():
+    iou = iou_matrice(np.array([[0, 0, 10, 10]], np.float32),
+                      np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], np.float32))
+    assert np.allclose(iou, [[1.0, 1 / 3, 0.0]], atol=1e-6)
+
+def test_piste_confirmee_apres_min_touches():
+    suivi = SuiviPersonnes(min_touches=2)
+    assert len(suivi.mettre_a_jour(detections(PERSONNE), 0.0)) == 0
+    pistes = suivi.mettre_a_jour(detections(PERSONNE), 0.1)
+    assert len(pistes) == 1 and suivi.nb_personnes() == 1
+
+def test_un_rate_ne_fait_pas_varier_le_comptage():
+    suivi = SuiviPersonnes()
+    suivi.mettre_a_jour(detections(PERSONNE), 0.0)
+    piste, = suivi.mettre_a_jour(detections(PERSONNE), 0.1)
+    # YOLO rate la personne une fois : toujours comptée, mais plus "vue"
+    assert len(suivi.mettre_a_jour(detections(), 0.2)) == 1
+    assert suivi.nb_personnes() == 1 and suivi.nb_vues() == 0
+    # Retrouvée : même identifiant
+    retrouvee, = suivi.mettre_a_jour(detections(PERSONNE), 0.3)
+    assert retrouvee["id"] == piste["id"] and suivi.nb_vues() == 1
+
+def test_a_verifier_tant_qu_une_piste_est_ratee():
+    suivi = SuiviPersonnes()
+    assert not suivi.a_verifier()
+    suivi.mettre_a_jour(detections(PERSONNE), 0.0)
+    suivi.mettre_a_jour(detections(PERSONNE), 0.1)
+    assert not suivi.a_verifier()
+    suivi.mettre_a_jour(detections(), 0.2)
+    assert suivi.a_verifier()
+    suivi.mettre_a_jour(detections(PERSONNE), 0.3)
+    assert not suivi.a_verifier()
+
+def test_expiration_apres_duree_max():
+    # Porte mouvement : peu de passages du détecteur, mais espacés
+    suivi = SuiviPersonnes(max_rates=5, duree_max=2.0)
+    suivi.mettre_a_jour(detections(PERSONNE), 0.0)
+    suivi.mettre_a_jour(detections(PERSONNE), 0.1)
+    suivi.mettre_a_jour(detections(), 1.5)
+    assert suivi.nb_personnes() == 1             # 1 raté, 1.4 s sans détection
+    suivi.mettre_a_jour(detections(), 2.5)
+    assert suivi.nb_personnes() == 0             # 2 ratés seulement, mais 2.4 s > duree_max
+    assert not suivi.a_verifier()
+
+def test_expiration_apres_max_rates():
+    suivi = SuiviPersonnes(max_rates=3, duree_max=100.0)
+    suivi.mettre_a_jour(detections(PERSONNE), 0.0)
+    suivi.mettre_a_jour(detections(PERSONNE), 0.1)
+    for k in range(3):
+        suivi.mettre_a_jour(detections(), 0.2 + 0.1 * k)
+    assert suivi.nb_personnes() == 1
+    suivi.mettre_a_jour(detections(), 0.5)
+    assert suivi.nb_personnes() == 0
+
+def test_detection_faible_ne_cree_pas_de_piste():
+    suivi = SuiviPersonnes(seuil_haut=0.6)
+    for k in range(3):
+        suivi.mettre_a_jour(detections(PERSONNE, conf=0.4), 0.1 * k)
+    assert suivi.nb_personnes() == 0 and len(suivi.ids) == 0
+
+def test_deux_personnes_qui_se_croisent():
+    suivi = SuiviPersonnes(seuil_iou=0.3)
+    ids_a, ids_b = set(), set()
+    for k in range(16):
+        xa, xb = 100 + 15 * k, 400 - 15 * k     # A va à droite, B à gauche : croisement vers k = 10
+        pistes = suivi.mettre_a_jour(detections((xa, 100, xa + 60, 300), (xb, 100, xb + 60, 300)), 0.1 * k)
+        if k < 1:
+            continue
+        assert len(pistes) == 2                 # Toujours deux personnes, même superposées
+        if abs(xa - xb) < 30:
+            continue                            # Boîtes confondues : qui est qui n'a pas de sens
+        centres = (pistes["xyxy"][:, 0] + pistes["xyxy"][:, 2]) / 2
+        # Chaque identifiant reste sur SA trajectoire, même boîtes superposées
+        ids_a.add(int(pistes["id"][np.argmin(np.abs(centres - (xa + 30)))]))
+        ids_b.add(int(pistes["id"][np.argmin(np.abs(centres - (xb + 30)))]))
+    assert len(ids_a) == 1 and len(ids_b) == 1 and ids_a != ids_b